@@ -0,0 +1,181 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+import deadline
+
+
+class AdmissionRejected(Exception):
+    """A request turned away before doing any work; ``retry_after`` is in seconds"""
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class Overloaded(AdmissionRejected):
+    status_code = 503
+
+
+class RateLimited(AdmissionRejected):
+    status_code = 429
+
+
+class AdmissionController:
+    """Global limit on concurrent model work with a bounded, deadline-aware queue
+
+    Up to ``max_concurrent`` holders run at once; up to ``max_queue`` more
+    wait in FIFO order for at most ``queue_timeout`` seconds (less if the
+    request deadline is closer). Anything beyond that is rejected
+    immediately with an estimate of when to retry, so overload shows up as
+    fast 503s instead of every request timing out.
+    """
+
+    def __init__(self, max_concurrent: int = 16, max_queue: int = 64, queue_timeout: float = 10.0):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        # Smoothed time a holder keeps its slot, used for Retry-After estimates
+        self._service_time = 1.0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def saturated(self) -> bool:
+        """Whether a new request would be rejected straight away"""
+        return self.active >= self.max_concurrent and len(self._waiters) >= self.max_queue
+
+    def _retry_after(self) -> float:
+        # Time for the queue ahead to drain through the running slots
+        return self._service_time * (len(self._waiters) / self.max_concurrent + 1)
+
+    async def _acquire(self):
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.rejected_full += 1
+            raise Overloaded("Server is at capacity, try again shortly", self._retry_after())
+
+        timeout = deadline.remaining(self.queue_timeout)
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=timeout)
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            self.rejected_timeout += 1
+            raise Overloaded(f"Waited {timeout:.1f}s for capacity, try again shortly", self._retry_after())
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+
+    def _abandon(self, waiter: asyncio.Future):
+        if waiter.done() and not waiter.cancelled():
+            self._release()  # the slot was handed over just as we gave up
+        else:
+            waiter.cancel()
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+
+    def _release(self):
+        # Hand the slot straight to the next live waiter so it can't be overtaken
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one model slot for the duration of the block"""
+        queued_at = time.monotonic()
+        await self._acquire()
+        started = time.monotonic()
+        waited = started - queued_at
+        self.admitted += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        try:
+            yield
+        finally:
+            self._service_time = 0.9 * self._service_time + 0.1 * (time.monotonic() - started)
+            self._release()
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "active": self.active,
+            "queue_depth": len(self._waiters),
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected_queue_full": self.rejected_full,
+            "rejected_queue_timeout": self.rejected_timeout,
+            "wait_avg_ms": round(self.wait_total / self.admitted * 1000, 2) if self.admitted else 0.0,
+            "wait_max_ms": round(self.wait_max * 1000, 2),
+            "service_time_ms": round(self._service_time * 1000, 2),
+        }
+
+
+class ClientRateLimiter:
+    """Token bucket per client so one busy caller can't take every slot
+
+    Each client refills at ``rate`` requests per second up to ``burst``.
+    Only the most recent ``max_clients`` buckets are kept; a forgotten
+    client simply starts again with a full bucket.
+    """
+
+    def __init__(self, rate: float = 2.0, burst: float = 10.0, max_clients: int = 10_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self.allowed = 0
+        self.limited = 0
+
+    def check(self, client_id: str):
+        """Take one token for ``client_id`` or raise RateLimited"""
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(client_id, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens < 1:
+            self._buckets[client_id] = (tokens, now)
+            self.limited += 1
+            raise RateLimited("Too many requests from this client", (1 - tokens) / self.rate)
+        self._buckets[client_id] = (tokens - 1, now)
+        if len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        self.allowed += 1
+
+    def stats(self) -> dict:
+        return {
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "tracked_clients": len(self._buckets),
+            "allowed": self.allowed,
+            "rate_limited": self.limited,
+        }
@@ -1,26 +1,114 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Optional
 import asyncio
+import contextlib
+import json
+import time
 import uvicorn
+import conversations
+import deadline
+import metrics
+import tracing
+from admission import AdmissionRejected, ClientRateLimiter
 from client import MCPClient
 import os
+import tempfile
 
 app = FastAPI(title="MCP Client API", description="API wrapper for MCP Client with Bedrock")
 
 # Global client instance
 mcp_client = None
 
+# Per-caller fairness: each client (see client_id) gets a token bucket in this worker;
+# with API_WORKERS > 1 main() divides the rate and burst between the workers
+rate_limiter = ClientRateLimiter(
+    rate=float(os.getenv("ADMISSION_CLIENT_RATE", "2")),
+    burst=float(os.getenv("ADMISSION_CLIENT_BURST", "10"))
+)
+
+# Comma-separated addresses of proxies whose X-Client-ID header is believed; from anyone
+# else the header is ignored, since a caller could rotate it to dodge its bucket
+TRUSTED_PROXIES = {addr.strip() for addr in os.getenv("TRUSTED_PROXIES", "").split(",") if addr.strip()}
+
+metrics.REGISTRY.add_collector(
+    lambda samples: samples.add_stats("govlink_client_rate", rate_limiter.stats(), "Per-client rate limiting", counters=("allowed", "rate_limited"))
+)
+
+# Hard ceiling for one query; callers may ask for less with an X-Request-Timeout header (seconds)
+QUERY_TIMEOUT = float(os.getenv("QUERY_TIMEOUT", "60"))
+
+def request_budget(http_request: Request) -> float:
+    try:
+        requested = float(http_request.headers.get("x-request-timeout", QUERY_TIMEOUT))
+    except ValueError:
+        requested = QUERY_TIMEOUT
+    return max(0.1, min(requested, QUERY_TIMEOUT))
+
+def client_id(http_request: Request) -> str:
+    """Identity for rate limiting and session ownership: the peer address, or the
+    X-Client-ID a trusted proxy set on the caller's behalf"""
+    peer = http_request.client.host if http_request.client else "unknown"
+    if peer in TRUSTED_PROXIES:
+        return http_request.headers.get("x-client-id") or peer
+    return peer
+
+def rejection(e: AdmissionRejected) -> HTTPException:
+    """429/503 response telling the caller when to come back"""
+    return HTTPException(status_code=e.status_code, detail=str(e), headers={"Retry-After": e.retry_after_header})
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Open a server span per request, continuing the caller's traceparent if it sent one
+
+    The trace id comes back in X-Trace-Id so a slow response can be matched
+    to its spans, including those recorded by the MCP server.
+    """
+    if request.url.path in ("/metrics", "/ready"):
+        return await call_next(request)
+    with tracing.tracer.span(
+        f"{request.method} {request.url.path}", kind="server", traceparent=request.headers.get("traceparent")
+    ) as span:
+        span.set_attribute("client.id", client_id(request))
+        response = await call_next(request)
+        span.set_attribute("http.status_code", response.status_code)
+    response.headers["X-Trace-Id"] = span.trace_id
+    return response
+
 class QueryRequest(BaseModel):
     query: str
+    # Optional: queries with the same session_id (from the same client) form one conversation
+    session_id: Optional[str] = Field(None, min_length=1, max_length=128)
 
 class QueryResponse(BaseModel):
     response: str
+    session_id: Optional[str] = None
+
+def conversation_for(request: QueryRequest, http_request: Request) -> Optional[conversations.Conversation]:
+    if not request.session_id:
+        return None
+    return mcp_client.conversations.get(client_id(http_request), request.session_id)
+
+# Warm-up runs after startup and flips /ready when it finishes; WARMUP_TOOL="" skips the
+# canary tool call and WARMUP_MODEL_CALL=0 the canary model call
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "1") == "1"
+WARMUP_TOOL = os.getenv("WARMUP_TOOL", "pay_saman")
+WARMUP_MODEL_CALL = os.getenv("WARMUP_MODEL_CALL", "1") == "1"
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", "60"))
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize MCP client on startup"""
     global mcp_client
+    started = time.perf_counter()
+    app.state.ready = False
+    app.state.warmup = None
     mcp_client = MCPClient()
+    metrics.REGISTRY.add_collector(mcp_client.collect_metrics)
+    app.state.trace_flusher = asyncio.create_task(tracing.tracer.flush_periodically())
+    # boto3 loads its service models on a model thread while the MCP servers start
+    model_client = asyncio.create_task(mcp_client.open_model_client())
     
     # Connect to your MCP server (localhost if on same instance)
     mcp_server_url = os.getenv("MCP_SERVER_URL", "http://localhost:8000")
@@ -29,12 +117,37 @@ async def startup_event():
         print(f"✅ Connected to MCP server: {mcp_server_url}")
     except Exception as e:
         print(f"❌ Failed to connect to MCP server: {e}")
+        model_client.cancel()
         raise e
+    metrics.STARTUP_SECONDS.set(time.perf_counter() - started, phase="connect")
+    # Serve /health straight away; /ready waits for the warm-up
+    app.state.warmup_task = asyncio.create_task(warm_up(model_client, started))
+
+async def warm_up(model_client: asyncio.Task, started: float):
+    # A failure here shows up again as the warm-up's model_client step
+    with contextlib.suppress(Exception):
+        await model_client
+    report = {}
+    if WARMUP_ENABLED:
+        try:
+            report = await asyncio.wait_for(
+                mcp_client.warm_up(tool=WARMUP_TOOL or None, model_call=WARMUP_MODEL_CALL),
+                WARMUP_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            report = {"error": f"warm-up did not finish within {WARMUP_TIMEOUT}s"}
+        print(f"Warm-up finished: {report}")
+    app.state.warmup = report
+    app.state.ready = True
+    metrics.STARTUP_SECONDS.set(time.perf_counter() - started, phase="ready")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Clean up resources on shutdown"""
     global mcp_client
+    for task in (getattr(app.state, "trace_flusher", None), getattr(app.state, "warmup_task", None)):
+        if task:
+            task.cancel()
     if mcp_client:
         await mcp_client.cleanup()
 
@@ -43,6 +156,13 @@ async def root():
     """Health check endpoint"""
     return {"status": "healthy", "message": "MCP Client API is running"}
 
+@app.get("/ready")
+async def readiness():
+    """Readiness probe: 503 until the warm-up has finished (``/health`` is liveness)"""
+    if not getattr(app.state, "ready", False):
+        raise HTTPException(status_code=503, detail="Warming up", headers={"Retry-After": "1"})
+    return {"ready": True, "warmup": app.state.warmup}
+
 @app.get("/health")
 async def health_check():
     """Detailed health check"""
@@ -51,19 +171,24 @@ async def health_check():
         raise HTTPException(status_code=503, detail="MCP Client not initialized")
     
     try:
-        # Test connection by listing tools
-        tools = await mcp_client.list_tools()
+        # Test connection with a real round trip (this also refreshes the cached catalogue)
+        tools = await mcp_client.list_tools(refresh=True)
         return {
             "status": "healthy",
             "mcp_connected": True,
             "available_tools": len(tools),
-            "tools": [{"name": tool.name, "description": tool.description} for tool in tools]
+            "tools": [{"name": tool.name, "description": tool.description} for tool in tools],
+            "router": mcp_client.router.stats(),
+            "response_cache": mcp_client.response_cache.stats(),
+            "mcp_pool": mcp_client.session_pool.stats() if mcp_client.session_pool else None,
+            "admission": {**mcp_client.admission.stats(), "clients": rate_limiter.stats()},
+            "conversations": mcp_client.conversations.stats()
         }
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"MCP connection failed: {str(e)}")
 
 @app.post("/query", response_model=QueryResponse)
-async def process_query(request: QueryRequest):
+async def process_query(request: QueryRequest, http_request: Request):
     """Process a query through the MCP client"""
     global mcp_client
     
@@ -71,11 +196,78 @@ async def process_query(request: QueryRequest):
         raise HTTPException(status_code=503, detail="MCP Client not initialized")
     
     try:
-        response = await mcp_client.process_query(request.query)
-        return QueryResponse(response=response)
+        rate_limiter.check(client_id(http_request))
+        budget = request_budget(http_request)
+        # Every stage below takes its timeout from what is left of this budget
+        with deadline.scope(budget), conversations.scope(conversation_for(request, http_request)):
+            response = await asyncio.wait_for(mcp_client.process_query(request.query), budget)
+        return QueryResponse(response=response, session_id=request.session_id)
+    except AdmissionRejected as e:
+        metrics.ERRORS.inc(stage=f"rejected_{e.status_code}")
+        raise rejection(e)
+    except asyncio.TimeoutError:
+        metrics.ERRORS.inc(stage="query_timeout")
+        raise HTTPException(status_code=504, detail="Query timed out")
     except Exception as e:
+        metrics.ERRORS.inc(stage="query")
         raise HTTPException(status_code=500, detail=f"Query processing failed: {str(e)}")
 
+def sse_event(event: str, data: dict) -> str:
+    """Encode one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/query/stream")
+async def stream_query(request: QueryRequest, http_request: Request):
+    """Process a query and stream text and tool progress as Server-Sent Events"""
+    global mcp_client
+    
+    if not mcp_client:
+        raise HTTPException(status_code=503, detail="MCP Client not initialized")
+    # Reject before the stream starts while that can still be a proper status code
+    try:
+        rate_limiter.check(client_id(http_request))
+    except AdmissionRejected as e:
+        raise rejection(e)
+    if mcp_client.admission.saturated:
+        raise HTTPException(status_code=503, detail="Server is at capacity, try again shortly", headers={"Retry-After": "1"})
+    
+    budget = request_budget(http_request)
+    conversation = conversation_for(request, http_request)
+
+    async def events():
+        try:
+            with deadline.scope(budget), conversations.scope(conversation):
+                async for event, data in mcp_client.stream_query(request.query):
+                    yield sse_event(event, data)
+        except asyncio.TimeoutError:
+            yield sse_event("error", {"detail": "Query timed out"})
+        except Exception as e:
+            yield sse_event("error", {"detail": f"Query processing failed: {str(e)}"})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.delete("/sessions/{session_id}", status_code=204)
+async def end_session(session_id: str, http_request: Request):
+    """Forget a conversation and the tool results fetched in it"""
+    if not mcp_client or not mcp_client.conversations.end(client_id(http_request), session_id):
+        raise HTTPException(status_code=404, detail="No such session")
+    return Response(status_code=204)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Prometheus text exposition of this worker's metrics and its MCP servers' counters"""
+    samples = metrics.SampleSet()
+    if mcp_client:
+        try:
+            await mcp_client.collect_server_metrics(samples)
+        except Exception as e:
+            print(f"Could not collect MCP server stats: {e}")
+    return PlainTextResponse(metrics.REGISTRY.render(samples), media_type="text/plain; version=0.0.4")
+
 @app.get("/tools")
 async def list_available_tools():
     """List all available tools from the MCP server"""
@@ -99,6 +291,58 @@ async def list_available_tools():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to list tools: {str(e)}")
 
+# Limits every worker enforces on its own; main() treats the configured values as
+# totals for the whole service and hands each worker its share
+PER_WORKER_LIMITS = {
+    "BEDROCK_MAX_CONCURRENCY": "16",
+    "ADMISSION_MAX_CONCURRENT": None,  # defaults to BEDROCK_MAX_CONCURRENCY
+    "ADMISSION_MAX_QUEUE": "64",
+    "ADMISSION_CLIENT_RATE": "2",
+    "ADMISSION_CLIENT_BURST": "10",
+}
+
+def split_limits(workers: int):
+    """Divide the process-wide limits in PER_WORKER_LIMITS between ``workers`` workers"""
+    for name, default in PER_WORKER_LIMITS.items():
+        total = os.getenv(name, default)
+        if total is None:
+            continue
+        share = float(total) / workers
+        if name == "ADMISSION_CLIENT_RATE":
+            value = share  # 0 still means unlimited
+        elif name == "ADMISSION_CLIENT_BURST":
+            value = max(1.0, share)
+        else:
+            value = max(1, int(share))
+        os.environ[name] = str(value)
+
+def main():
+    """Run the API server; API_WORKERS > 1 pre-forks that many worker processes
+
+    Workers share answers through a SQLite response cache on tmpfs (override
+    with RESPONSE_CACHE_PATH) and records through the MCP server's on-disk
+    store, so adding workers does not multiply cold misses.
+
+    Admission slots, the queue and the per-client rate limit are kept in each
+    worker, so the configured values are split evenly between the workers and
+    stay service-wide totals. The kernel spreads connections across workers,
+    so a client holding one keep-alive connection sees only its worker's share
+    of ADMISSION_CLIENT_RATE.
+    """
+    host = os.getenv("API_HOST", "0.0.0.0")
+    port = int(os.getenv("API_PORT", "8080"))
+    workers = int(os.getenv("API_WORKERS", "1"))
+    if workers <= 1:
+        uvicorn.run(app, host=host, port=port)
+        return
+
+    # Workers inherit the environment, so the defaults set here apply to all of them
+    shared_dir = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    os.environ.setdefault("RESPONSE_CACHE_PATH", os.path.join(shared_dir, f"govlink-responses-{port}.db"))
+    # Every worker has its own stdio server pool; keep the total process count near the core count
+    os.environ.setdefault("MCP_POOL_SIZE", "1")
+    split_limits(workers)
+    uvicorn.run("api_server:app", host=host, port=port, workers=workers)
+
 if __name__ == "__main__":
-    # For local development
-    uvicorn.run(app, host="0.0.0.0", port=8080)
\ No newline at end of file
+    main()
\ No newline at end of file
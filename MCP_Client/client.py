@@ -1,26 +1,101 @@
+from __future__ import annotations
+
 import asyncio
+import hashlib
 import json
-import re
-from typing import Optional
-from contextlib import AsyncExitStack
-import aiohttp
-
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, AsyncIterator, Optional
+from contextlib import AsyncExitStack, contextmanager
 
-import boto3
-from botocore.exceptions import ClientError
 from dotenv import load_dotenv
 
+import conversations
+import deadline
+import metrics
+import tool_results
+import tracing
+from admission import AdmissionController
+from conversations import ConversationStore
+from fake_bedrock import FakeBedrockClient
+from formatter import ResponseFormatter
+from response_cache import ResponseCache, SharedResponseCache, normalize_query
+from router import IntentRouter, Route
+
+if TYPE_CHECKING:
+    # The MCP SDK imports all of itself (about a third of this module's import time),
+    # so it is only loaded once a server connection or result needs it
+    from mcp import types
+    from session_pool import SessionPool
+
 load_dotenv()  # load environment variables from .env
 
+tracing.tracer.name_service("govlink-api")
+
+# Add system prompt to guide the model's behavior
+SYSTEM_PROMPT = """
+        You are a helpful assistant specializing in Malaysian government services and data retrieval.
+
+        When retrieving Saman data or other official records:
+        - Always use the appropriate tools rather than generating fake data
+        - Present results in a clear, structured format
+        - Use proper Malaysian formats (MyKad numbers, phone numbers, etc.)
+        - Be accurate and only return actual tool results
+
+        Format responses professionally and clearly. Do note that if the MyKad data is not correct, still use it as a argument to pass
+        it into the tools and get appropriate data from the tools. If the users ask for anything related to paying a saman or renewing
+        their license, simply call the tool as we dont need their mykad number or any details to provide them with the information.
+        When the user gives several MyKad numbers, use the batch tools once with the whole list instead of one call per number.
+        """
+
+class QueryTools:
+    """What the tool calls of one query returned, to decide how long its answer may be cached"""
+
+    def __init__(self):
+        self.lookups: set[str] = set()
+        self.unavailable: set[str] = set()
+        self.not_found = False
+
+    def record(self, tool_name: str, result):
+        # get_license_data, get_saman_data and their _batch variants read citizen records
+        if tool_name.startswith("get_"):
+            self.lookups.add(tool_name)
+        if tool_results.unavailable(result):
+            self.unavailable.add(tool_name)
+        if tool_results.not_found(result):
+            self.not_found = True
+
+
+# Tool calls of the query being served. Set per query by track_tools; the object is
+# shared with the tool-call tasks the query spawns.
+_query_tools: ContextVar[Optional[QueryTools]] = ContextVar("query_tools", default=None)
+
+
+@contextmanager
+def track_tools():
+    """Record the tool calls made while the block runs"""
+    tools = QueryTools()
+    token = _query_tools.set(tools)
+    try:
+        yield tools
+    finally:
+        _query_tools.reset(token)
+
+
 class HTTPMCPTransport:
     """Simple HTTP transport for MCP over HTTP (REST-style)"""
-    def __init__(self, base_url: str):
+    def __init__(self, base_url: str, timeout: float = 30.0):
         self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
         self.session = None
     
     async def __aenter__(self):
+        # Imported here so stdio deployments never pay for it
+        import aiohttp
         self.session = aiohttp.ClientSession()
         return self
     
@@ -33,190 +108,501 @@ class HTTPMCPTransport:
         if not self.session:
             raise RuntimeError("Transport not initialized")
         
-        async with self.session.get(f"{self.base_url}/tools") as response:
-            if response.status == 200:
-                return await response.json()
-            else:
-                raise Exception(f"HTTP {response.status}: {await response.text()}")
+        import aiohttp
+        timeout = aiohttp.ClientTimeout(total=deadline.remaining(self.timeout))
+        with metrics.STAGE_SECONDS.time(stage="http_get_tools"):
+            async with self.session.get(f"{self.base_url}/tools", timeout=timeout) as response:
+                if response.status == 200:
+                    return await response.json()
+                else:
+                    raise Exception(f"HTTP {response.status}: {await response.text()}")
     
-    async def call_tool(self, tool_name: str, arguments: dict):
-        """Call a specific tool on the server"""
+    async def get_stats(self) -> dict:
+        """Counters of whichever server worker answers (``/stats``), tagged with its ``worker_pid``"""
         if not self.session:
             raise RuntimeError("Transport not initialized")
+        import aiohttp
+        async with self.session.get(f"{self.base_url}/stats", timeout=aiohttp.ClientTimeout(total=self.timeout)) as response:
+            if response.status != 200:
+                raise Exception(f"HTTP {response.status}: {await response.text()}")
+            return await response.json()
+
+    async def call_tool(self, tool_name: str, arguments: dict, timeout: float | None = None):
+        """Call a specific tool on the server
+
+        ``timeout`` bounds the whole HTTP exchange and is sent along as
+        X-Request-Timeout-Ms so the server can bound its own upstream work.
+        """
+        if not self.session:
+            raise RuntimeError("Transport not initialized")
+        import aiohttp
+        timeout = timeout or self.timeout
         
         # Server expects arguments nested under "arguments" key
         request_body = {"arguments": arguments}
         
+        headers = {"Content-Type": "application/json", "X-Request-Timeout-Ms": str(int(timeout * 1000))}
+        traceparent = tracing.current_traceparent()
+        if traceparent:
+            headers["traceparent"] = traceparent
+        
         # Try POST to /tools/{tool_name}
-        async with self.session.post(
-            f"{self.base_url}/tools/{tool_name}",
-            json=request_body,
-            headers={"Content-Type": "application/json"}
-        ) as response:
-            if response.status == 200:
-                return await response.json()
-            else:
-                error_text = await response.text()
-                raise Exception(f"HTTP {response.status}: {error_text}")
+        with metrics.STAGE_SECONDS.time(stage="http_call_tool"):
+            async with self.session.post(
+                f"{self.base_url}/tools/{tool_name}",
+                json=request_body,
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(total=timeout)
+            ) as response:
+                if response.status == 200:
+                    return await response.json()
+                else:
+                    error_text = await response.text()
+                    raise Exception(f"HTTP {response.status}: {error_text}")
 
 class MCPClient:
     def __init__(self):
         # Initialize session and client objects
-        self.session: Optional[ClientSession] = None
+        self.session_pool: Optional[SessionPool] = None
+        # Each pooled stdio server is its own process, so more than one per core buys nothing
+        self.pool_size = int(os.getenv("MCP_POOL_SIZE", str(min(4, os.cpu_count() or 1))))
         self.exit_stack = AsyncExitStack()
         self.http_transport = None
         self.is_http = False
 
-        # Initialize Bedrock Runtime client with region - this will fail without credentials
-        try:
-            self.bedrock_client = boto3.client(
-                "bedrock-runtime",
-                region_name="us-east-1"  # DeepSeek models are available in us-east-1
-            )
-        except Exception as e:
-            self.bedrock_client = None
+        # Tool catalogue and the static part of every Bedrock request body, built once
+        # per connection and dropped on reconnect or a tools/list_changed notification
+        self._tools = None
+        self._system_message_json = json.dumps({"role": "system", "content": SYSTEM_PROMPT})
+        self._request_tails: dict[str, str] = {}
+        self.tools_version = None
+        self.formatter = ResponseFormatter()
+
+        # boto3 is synchronous, so model calls run on a bounded thread pool to keep
+        # the event loop free; the pool size also caps concurrent Bedrock requests
+        self.model_concurrency = int(os.getenv("BEDROCK_MAX_CONCURRENCY", "16"))
+        self.model_timeout = float(os.getenv("BEDROCK_TIMEOUT", "60"))
+        self.model_executor = ThreadPoolExecutor(
+            max_workers=self.model_concurrency,
+            thread_name_prefix="bedrock"
+        )
+        self.tool_timeout = float(os.getenv("TOOL_TIMEOUT", "30"))
+
+        # Queries that need the model wait here for a slot, or are turned away with a
+        # Retry-After estimate, instead of piling onto Bedrock until it throttles everyone
+        # (per worker: api_server.main() splits these limits when API_WORKERS > 1)
+        self.admission = AdmissionController(
+            max_concurrent=int(os.getenv("ADMISSION_MAX_CONCURRENT", str(self.model_concurrency))),
+            max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "64")),
+            queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))
+        )
+        self.max_tool_rounds = int(os.getenv("MAX_TOOL_ROUNDS", "3"))
+
+        # Simple, unambiguous queries are answered straight from the tools without the model
+        self.router_enabled = os.getenv("ROUTER_ENABLED", "1") == "1"
+        self.router = IntentRouter(min_confidence=float(os.getenv("ROUTER_MIN_CONFIDENCE", "0.8")))
+
+        # Final answers keyed on the normalized query and the tool catalogue they were built
+        # with. Answers built from record lookups expire with the server's record cache (saman
+        # TTL), or its negative TTL when a record was missing; see answer_ttl.
+        # RESPONSE_CACHE_PATH shares the cache between API worker processes.
+        response_cache_path = os.getenv("RESPONSE_CACHE_PATH")
+        response_cache_options = dict(
+            max_size=int(os.getenv("RESPONSE_CACHE_SIZE", "1024")),
+            default_ttl=float(os.getenv("RESPONSE_CACHE_TTL", "600"))
+        )
+        if response_cache_path:
+            self.response_cache = SharedResponseCache(response_cache_path, **response_cache_options)
+        else:
+            self.response_cache = ResponseCache(**response_cache_options)
+        self.response_cache_mykad_ttl = float(os.getenv("RESPONSE_CACHE_MYKAD_TTL", "300"))
+        # Answers saying a record doesn't exist; the server's CACHE_NEGATIVE_TTL by default
+        self.response_cache_not_found_ttl = float(os.getenv("RESPONSE_CACHE_NOT_FOUND_TTL", "30"))
+
+        # Multi-turn sessions: the model sees a token-budgeted slice of the history, and tool
+        # results already fetched in the session are reused for SESSION_TOOL_TTL seconds
+        self.conversations = ConversationStore(
+            max_sessions=int(os.getenv("SESSION_MAX", "10000")),
+            idle_timeout=float(os.getenv("SESSION_IDLE_TIMEOUT", "1800")),
+            token_budget=int(os.getenv("SESSION_HISTORY_TOKENS", "1500")),
+            max_turns=int(os.getenv("SESSION_MAX_TURNS", "20")),
+            tool_ttl=float(os.getenv("SESSION_TOOL_TTL", "300"))
+        )
+
+        # Created on first use (see bedrock_client); importing boto3 and loading its
+        # service models takes a noticeable part of startup
+        self._bedrock_client = None
+        self._bedrock_lock = threading.Lock()
         
         # DeepSeek R1 model - correct model ID
         self.model_id = "openai.gpt-oss-120b-1:0"
 
+    @property
+    def bedrock_client(self):
+        """Bedrock Runtime client, created on first use; raises without credentials"""
+        if self._bedrock_client is None:
+            with self._bedrock_lock:
+                if self._bedrock_client is None:
+                    self._bedrock_client = self._create_bedrock_client()
+        return self._bedrock_client
+
+    def _create_bedrock_client(self):
+        if os.getenv("BEDROCK_MODE") == "fake":
+            return FakeBedrockClient(
+                latency=float(os.getenv("FAKE_BEDROCK_LATENCY", "0.5")),
+                token_latency=float(os.getenv("FAKE_BEDROCK_TOKEN_LATENCY", "0.01")),
+                script=FakeBedrockClient.load_script(os.getenv("FAKE_BEDROCK_SCRIPT"))
+            )
+        import boto3
+        from botocore.config import Config
+        return boto3.client(
+            "bedrock-runtime",
+            region_name="us-east-1",  # DeepSeek models are available in us-east-1
+            config=Config(
+                max_pool_connections=self.model_concurrency,
+                read_timeout=self.model_timeout,
+            )
+        )
+
+    async def open_model_client(self):
+        """Create the Bedrock client on a model thread, off the event loop"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.model_executor, lambda: self.bedrock_client)
+
+    async def warm_up(self, tool: Optional[str] = "pay_saman", model_call: bool = True) -> dict:
+        """Get every connection and cache ready before the first real query
+
+        Steps: create the Bedrock client, prime the tool catalogue (and the
+        pre-encoded request body), call ``tool`` once on every MCP server so
+        each child and pooled connection has served a request, and send a
+        one-token canary to the model. A failing step is logged and skipped;
+        returns each step's duration in seconds or its error.
+        """
+        steps = [("model_client", self.open_model_client), ("tools", lambda: self.list_tools(refresh=True))]
+        if tool:
+            steps.append(("mcp_servers", lambda: self._warm_up_servers(tool)))
+        if model_call:
+            canary = json.dumps({"messages": [{"role": "user", "content": "ping"}], "max_tokens": 1})
+            steps.append(("model_call", lambda: self.invoke_model(canary)))
+        report = {}
+        for name, step in steps:
+            started = time.perf_counter()
+            try:
+                await step()
+                report[name] = round(time.perf_counter() - started, 4)
+                metrics.STARTUP_SECONDS.set(report[name], phase=f"warmup_{name}")
+            except Exception as e:
+                print(f"Warm-up step {name} failed: {e!r}")
+                metrics.ERRORS.inc(stage=f"warmup_{name}")
+                report[name] = f"error: {e}"
+        return report
+
+    async def _warm_up_servers(self, tool: str):
+        if self.is_http:
+            await self.call_tool(tool, {})
+            return
+        results = await self.session_pool.each(lambda session: session.call_tool(tool, {}), timeout=self.tool_timeout)
+        if len(results) < len(self.session_pool.members):
+            raise RuntimeError(f"{len(results)} of {len(self.session_pool.members)} MCP servers answered")
+
+    def _build_request_skeleton(self, tools):
+        """Pre-encode everything in the request body except the conversation"""
+        # Convert MCP tools to OpenAI-compatible format for DeepSeek
+        available_tools = [
+            {
+                "type": "function",
+                "function": {
+                    "name": tool.name,
+                    "description": tool.description,
+                    "parameters": tool.inputSchema
+                }
+            }
+            for tool in tools
+        ]
+
+        self._request_tails = {}
+        for tool_choice in ("auto", "none"):
+            # Format request for OpenAI model on Bedrock (no model parameter needed)
+            static_fields = {
+                "max_tokens": 1000,
+                "temperature": 0.7
+            }
+            # Add tools if available
+            if available_tools:
+                static_fields["tools"] = available_tools
+                static_fields["tool_choice"] = tool_choice
+            # Drop the opening brace so the encoded messages can be spliced in front
+            self._request_tails[tool_choice] = json.dumps(static_fields)[1:]
+        # Identifies the catalogue so cached answers never outlive a tool change
+        self.tools_version = hashlib.sha1(self._request_tails["auto"].encode()).hexdigest()[:12]
+
+    def build_request_body(self, messages: list[dict], tool_choice: str = "auto") -> str:
+        """Encode a Bedrock request body for ``messages`` (system prompt is prepended)"""
+        encoded_messages = [self._system_message_json, *(json.dumps(message) for message in messages)]
+        return '{"messages": [' + ", ".join(encoded_messages) + "], " + self._request_tails[tool_choice]
+
+    def _invoke_model_sync(self, body: str) -> dict:
+        response = self.bedrock_client.invoke_model(
+            modelId=self.model_id,
+            body=body
+        )
+        return json.loads(response["body"].read())
+
+    async def invoke_model(self, body: str, timeout: float | None = None) -> dict:
+        """Call Bedrock on the model executor without blocking the event loop.
+
+        Raises asyncio.TimeoutError once ``timeout`` (default BEDROCK_TIMEOUT)
+        or the request deadline expires. The awaiting task is cancelled straight
+        away; the worker thread finishes on its own, bounded by the botocore
+        read timeout.
+        """
+        loop = asyncio.get_running_loop()
+        with tracing.tracer.span("bedrock.invoke_model", kind="client", model=self.model_id) as span:
+            try:
+                response = await asyncio.wait_for(
+                    loop.run_in_executor(self.model_executor, self._invoke_model_sync, body),
+                    timeout=deadline.remaining(timeout or self.model_timeout)
+                )
+            except asyncio.TimeoutError:
+                metrics.MODEL_CALLS.inc(outcome="timeout")
+                raise
+            except Exception:
+                metrics.MODEL_CALLS.inc(outcome="error")
+                raise
+            metrics.MODEL_CALLS.inc(outcome="ok")
+            usage = response.get("usage")
+            metrics.record_usage(usage)
+            if usage:
+                span.set_attribute("tokens.prompt", usage.get("prompt_tokens", 0))
+                span.set_attribute("tokens.completion", usage.get("completion_tokens", 0))
+            return response
+
+    async def stream_model(self, body: str) -> AsyncIterator[dict]:
+        """Yield decoded chunks from Bedrock's response stream
+
+        The blocking event-stream iterator runs on the model executor and hands
+        chunks back through a queue. Each chunk must arrive within
+        BEDROCK_TIMEOUT and before the request deadline; closing the generator stops the reader thread at the
+        next chunk.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        finished = object()
+        stopped = threading.Event()
+
+        def put(item):
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:
+                pass  # event loop already closed
+
+        def read_stream():
+            try:
+                response = self.bedrock_client.invoke_model_with_response_stream(
+                    modelId=self.model_id,
+                    body=body
+                )
+                for event in response["body"]:
+                    if stopped.is_set():
+                        break
+                    if "chunk" not in event:
+                        # Any other event type is a modelled stream error (throttling, timeout...)
+                        raise RuntimeError(f"Bedrock stream error: {event}")
+                    put(json.loads(event["chunk"]["bytes"]))
+            except Exception as e:
+                put(e)
+            finally:
+                put(finished)
+
+        loop.run_in_executor(self.model_executor, read_stream)
+        started = time.perf_counter()
+        outcome = "error"
+        with tracing.tracer.span("bedrock.stream_model", kind="client", model=self.model_id) as span:
+            try:
+                while True:
+                    try:
+                        item = await asyncio.wait_for(queue.get(), timeout=deadline.remaining(self.model_timeout))
+                    except asyncio.TimeoutError:
+                        outcome = "timeout"
+                        raise
+                    if item is finished:
+                        outcome = "ok"
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    if started is not None:
+                        first_chunk = time.perf_counter() - started
+                        metrics.STAGE_SECONDS.observe(first_chunk, stage="model_first_chunk")
+                        span.set_attribute("first_chunk_ms", round(first_chunk * 1000, 3))
+                        started = None
+                    metrics.record_usage(item.get("usage"))
+                    yield item
+            finally:
+                stopped.set()
+                span.set_attribute("outcome", outcome)
+                metrics.MODEL_CALLS.inc(outcome=outcome)
+
     def clean_response_formatting(self, response: str) -> str:
         """Clean and format the AI response for messaging applications"""
-        if not response:
-                return response
-        
-        # Remove any raw JSON objects at the beginning and anywhere in the text
-        response = re.sub(r"\{'result':\s*'[^']*'\}", '', response, flags=re.MULTILINE | re.DOTALL)
-        response = re.sub(r'\{"result":\s*"[^"]*"\}', '', response, flags=re.MULTILINE | re.DOTALL)
-        response = re.sub(r"^\{'result':\s*\".*?\"\}\s*", '', response, flags=re.MULTILINE | re.DOTALL)
-        
-        # Convert HTML tags to proper formatting
-        response = re.sub(r'<br\s*/?>|<br>', '\n', response, flags=re.IGNORECASE)  # Convert <br> to newlines
-        response = re.sub(r'<[^>]+>', '', response)  # Remove any other HTML tags
-        
-        # Convert markdown tables to Field: Value format
-        table_pattern = r'\|([^|]+)\|([^|]+)\|[\s\S]*?(?=\n\n|\n[^|]|\Z)'
-        
-        def convert_table(match):
-            lines = match.group(0).split('\n')
-            formatted_lines = []
-            
-            for line in lines:
-                if '|' in line and not line.strip().startswith('|---'):
-                    cells = [cell.strip() for cell in line.split('|') if cell.strip()]
-                    if len(cells) >= 2:
-                        field = cells[0].replace('**', '').strip()  # Remove bold from field names
-                        value = cells[1].strip()  # Keep bold formatting in values
-                        if field and value and field != 'Field' and value != 'Information':
-                            formatted_lines.append(f"{field}: {value}")
-            
-            return '\n'.join(formatted_lines) if formatted_lines else ''
-        
-        response = re.sub(table_pattern, convert_table, response)
-        
-        # Remove markdown formatting (but keep bold text)
-        # Keep bold text as **text** - this line is commented out to preserve bold formatting
-        response = re.sub(r'(?<!\*)\*(?!\*)([^*]+?)(?<!\*)\*(?!\*)', r'\1', response)  # Remove single * (italic) but not **
-        response = re.sub(r'`(.*?)`', r'\1', response)        # Remove code formatting
-        response = re.sub(r'#{1,6}\s*', '', response)         # Remove headers
-        response = re.sub(r'---+', '', response)              # Remove horizontal rules
-        response = re.sub(r'^\s*[\*\-\+]\s+', '', response, flags=re.MULTILINE)  # Remove bullet points
-        
-        # Clean up encoding issues
-        replacements = {
-            'â¯': ' ', 'â': '-', 'â': "'", 'â': "'", 
-            'â': '"', 'â': '"', 'â¦': '...', 'â': '-', 'â': '--',
-        }
-        for bad_char, good_char in replacements.items():
-            response = response.replace(bad_char, good_char)
-        
-        # Clean up extra whitespace and empty lines
-        response = re.sub(r'\n\s*\n\s*\n', '\n\n', response)  # Multiple empty lines
-        response = re.sub(r'[ \t]+', ' ', response)           # Multiple spaces
-        response = response.strip()
-        
-        return response
+        return self.formatter.format(response)
 
-    def format_tool_result(self, tool_name: str, result_content: str, tool_args: dict) -> str:
-        """Format tool results in a clean way"""
-        try:
-            # Try to parse the result as JSON for clean formatting
-            if isinstance(result_content, str):
-                try:
-                    parsed_result = json.loads(result_content)
-                    return json.dumps(parsed_result, indent=2)
-                except json.JSONDecodeError:
-                    return result_content
-            else:
-                return str(result_content)
-            
-        except Exception as e:
-            return str(result_content)
+    def format_tool_result(self, tool_name: str, result) -> str:
+        """User-facing text for a tool result
+
+        Structured results are rendered from their tool's template; only
+        text-only results (and errors) go through the response formatter.
+        """
+        rendered = tool_results.render(tool_name, result)
+        if rendered is not None:
+            return rendered
+        return self.formatter.format(tool_results.text(result))
 
     def clean_response(self, content: str) -> str:
         """Remove reasoning sections and clean up the response for messaging"""
-        if not content:
-            return content
-            
-        # Remove reasoning sections
-        lines = content.split('\n')
-        cleaned_lines = []
-        skip_reasoning = False
-        
-        for line in lines:
-            # Check for reasoning tags or patterns
-            if '<reasoning>' in line.lower() or line.strip().startswith('**Reasoning'):
-                skip_reasoning = True
-                continue
-            elif '</reasoning>' in line.lower() or (skip_reasoning and line.strip() == ''):
-                skip_reasoning = False
-                continue
-            elif skip_reasoning:
-                continue
-                
-            cleaned_lines.append(line)
-        
-        response = '\n'.join(cleaned_lines).strip()
-        
-        # Apply additional formatting cleanup
-        return self.clean_response_formatting(response)
+        return self.formatter.format(content, strip_reasoning=True)
+
+    async def list_tools(self, refresh: bool = False):
+        """List available tools from the cached catalogue (works with both HTTP and stdio)
+
+        Args:
+            refresh: Fetch the catalogue from the server even if one is cached
+        """
+        if self._tools is None or refresh:
+            with metrics.STAGE_SECONDS.time(stage="list_tools"), tracing.tracer.span("mcp.list_tools", kind="client"):
+                tools = await self._fetch_tools()
+            self._build_request_skeleton(tools)
+            self._tools = tools
+        return self._tools
 
-    async def list_tools(self):
-        """List available tools (works with both HTTP and stdio)"""
+    def invalidate_tools(self):
+        """Forget the cached tool catalogue; the next list_tools() refetches it"""
+        self._tools = None
+
+    async def _handle_server_message(self, message):
+        """Drop the cached tool catalogue when the server reports its tools changed"""
+        from mcp import types
+        if isinstance(message, types.ServerNotification) and isinstance(message.root, types.ToolListChangedNotification):
+            self.invalidate_tools()
+
+    async def _fetch_tools(self):
+        """Fetch the tool list from the server (works with both HTTP and stdio)"""
+        from mcp import types
         if self.is_http:
             result = await self.http_transport.get_tools()
-            # Convert HTTP response to match stdio format
-            class Tool:
-                def __init__(self, name, description, inputSchema):
-                    self.name = name
-                    self.description = description
-                    self.inputSchema = inputSchema
-            
-            tools = []
-            if "tools" in result:
-                for tool_data in result["tools"]:
-                    tools.append(Tool(
-                        tool_data["name"],
-                        tool_data.get("description", ""),
-                        tool_data.get("inputSchema", {})
-                    ))
-            return tools
+            return [types.Tool.model_validate(tool) for tool in result.get("tools", [])]
         else:
-            response = await self.session.list_tools()
+            response = await self.session_pool.list_tools()
             return response.tools
     
     async def call_tool(self, tool_name: str, arguments: dict):
-        """Call a tool (works with both HTTP and stdio)"""
-        if self.is_http:
-            result = await self.http_transport.call_tool(tool_name, arguments)
-            # Convert HTTP response to match stdio format
-            class ToolResult:
-                def __init__(self, content):
-                    self.content = content
-            
-            # Return the result directly as content
-            return ToolResult(result)
-        else:
-            return await self.session.call_tool(tool_name, arguments)
+        """Call a tool (works with both HTTP and stdio)
+
+        The call gets TOOL_TIMEOUT or whatever is left of the request deadline,
+        whichever is shorter, and the server is told that budget along with
+        the trace context.
+        """
+        conversation = conversations.current()
+        query_tools = _query_tools.get()
+        if conversation is not None:
+            reused = conversation.tool_result(tool_name, arguments)
+            if reused is not None:
+                self.conversations.tool_reuse_hits += 1
+                metrics.TOOL_CALLS.inc(tool=tool_name, outcome="session_reuse")
+                if query_tools is not None:
+                    query_tools.record(tool_name, reused)
+                return reused
+        timeout = deadline.remaining(self.tool_timeout)
+        started = time.perf_counter()
+        outcome = "error"
+        transport = "http" if self.is_http else "stdio"
+        with tracing.tracer.span("mcp.call_tool", kind="client", tool=tool_name, transport=transport) as span:
+            try:
+                if self.is_http:
+                    from mcp import types
+                    # The server answers with the same CallToolResult a stdio session returns
+                    result = types.CallToolResult.model_validate(
+                        await self.http_transport.call_tool(tool_name, arguments, timeout=timeout)
+                    )
+                else:
+                    result = await asyncio.wait_for(
+                        self.session_pool.call_tool(tool_name, arguments, timeout=timeout, traceparent=span.traceparent),
+                        timeout
+                    )
+                outcome = "tool_error" if getattr(result, "isError", False) else "ok"
+                if query_tools is not None:
+                    query_tools.record(tool_name, result)
+                if outcome == "ok" and tool_results.unavailable(result):
+                    # Only true until the upstream is back: never reused, and the answer isn't cached
+                    outcome = "unavailable"
+                if conversation is not None and outcome == "ok":
+                    conversation.store_tool_result(tool_name, arguments, result)
+                return result
+            except asyncio.TimeoutError:
+                outcome = "timeout"
+                raise
+            finally:
+                span.set_attribute("outcome", outcome)
+                metrics.TOOL_SECONDS.observe(time.perf_counter() - started, tool=tool_name)
+                metrics.TOOL_CALLS.inc(tool=tool_name, outcome=outcome)
+
+    async def run_tool_call(self, tool_call: dict) -> tuple[str, dict, types.CallToolResult]:
+        """Execute one model-requested tool call with a timeout
+
+        Returns the tool name, parsed arguments and result. Failures become
+        an error result so sibling calls in the same turn still reach the
+        model.
+        """
+        function = tool_call.get("function", {})
+        tool_name = function.get("name")
+        try:
+            tool_args = json.loads(function.get("arguments") or "{}")
+        except json.JSONDecodeError:
+            tool_args = {}
+
+        try:
+            return tool_name, tool_args, await self.call_tool(tool_name, tool_args)
+        except asyncio.TimeoutError:
+            error = f"Error: tool '{tool_name}' timed out"
+        except Exception as e:
+            error = f"Error: tool '{tool_name}' failed: {e}"
+        from mcp import types
+        return tool_name, tool_args, types.CallToolResult(content=[types.TextContent(type="text", text=error)], isError=True)
+
+    async def route_query(self, query: str) -> Optional[tuple[Route, list[tuple[str, dict, types.CallToolResult]]]]:
+        """Answer ``query`` from the tools alone when the intent router is confident
+
+        Returns the route and each tool's ``(name, args, result)``, or None when
+        the query should go to the model: no confident route, a routed tool the
+        server does not offer, or a tool call that fails.
+        """
+        if not self.router_enabled:
+            return None
+        conversation = conversations.current()
+        with metrics.STAGE_SECONDS.time(stage="route"):
+            route = self.router.route(query, conversation.last_mykad if conversation else None)
+        if route is None:
+            return None
+        span = tracing.current_span()
+        if span is not None:
+            span.set_attribute("route.intent", route.intent)
+            span.set_attribute("route.confidence", route.confidence)
+        tool_names = {tool.name for tool in await self.list_tools()}
+        if any(name not in tool_names for name, _ in route.calls):
+            return None
+
+        async def run(name: str, args: dict) -> tuple[str, dict, types.CallToolResult]:
+            result = await self.call_tool(name, args)
+            if getattr(result, "isError", False):
+                raise RuntimeError(tool_results.text(result))
+            return name, args, result
+
+        try:
+            with metrics.STAGE_SECONDS.time(stage="routed_tools"):
+                return route, await asyncio.gather(*(run(name, args) for name, args in route.calls))
+        except Exception as e:
+            metrics.ERRORS.inc(stage="routed_tools")
+            print(f"Routed call failed, falling back to the model: {e}")
+            return None
 
     async def connect_to_server(self, server_path: str):
         """Connect to an MCP server
@@ -224,6 +610,8 @@ class MCPClient:
         Args:
             server_path: Path to the server script (.py or .js) or HTTP URL
         """
+        self.invalidate_tools()
+
         # Check if it's an HTTP URL
         if server_path.startswith('http://') or server_path.startswith('https://'):
             self.http_transport = await self.exit_stack.enter_async_context(HTTPMCPTransport(server_path))
@@ -231,7 +619,7 @@ class MCPClient:
             
             # Test connection by getting tools
             try:
-                result = await self.http_transport.get_tools()
+                await self.list_tools()
                 return
             except Exception as e:
                 raise Exception(f"Failed to connect to HTTP MCP server: {e}")
@@ -242,46 +630,141 @@ class MCPClient:
         if not (is_python or is_js):
             raise ValueError("Server script must be a .py or .js file, or use an HTTP URL")
             
-        command = "python" if is_python else "node"
+        from mcp import StdioServerParameters
+        from session_pool import SessionPool
+
+        # The interpreter running the client, so every worker's children share its environment
+        command = sys.executable if is_python else "node"
         server_params = StdioServerParameters(
             command=command,
             args=[server_path],
-            env=None
+            # The server is configured through its environment (FAKER_API_URL, RECORD_SOURCE,
+            # CACHE_*, TRACE_*...), so children inherit ours rather than the SDK's minimal default
+            env=dict(os.environ)
         )
         
-        stdio_transport = await self.exit_stack.enter_async_context(stdio_client(server_params))
-        self.stdio, self.write = stdio_transport
-        self.session = await self.exit_stack.enter_async_context(ClientSession(self.stdio, self.write))
+        # One stdio pipe serializes every request, so run a pool of server children
+        self.session_pool = SessionPool(
+            server_params,
+            size=self.pool_size,
+            message_handler=self._handle_server_message,
+            health_interval=float(os.getenv("MCP_POOL_HEALTH_INTERVAL", "15"))
+        )
+        await self.session_pool.start()
+        self.exit_stack.push_async_callback(self.session_pool.close)
         self.is_http = False
         
-        await self.session.initialize()
-        
         # List available tools
         tools = await self.list_tools()
         print("\nConnected to server with tools:", [tool.name for tool in tools])
 
+    async def response_cache_key(self, query: str, endpoint: str) -> tuple[str, str, str]:
+        """Cache key for an answer to ``query`` from ``endpoint`` ("query" or "stream")
+
+        The two endpoints shape the same answer differently (/query includes
+        the rendered tool records, the stream sends those as separate
+        events), so each caches its own.
+        """
+        await self.list_tools()
+        return self.tools_version, endpoint, normalize_query(query)
+
+    def answer_ttl(self, tools: QueryTools) -> Optional[float]:
+        """How long an answer built from ``tools`` may be cached: 0 to skip, None for the default
+
+        Decided by the lookups that actually ran rather than by what the
+        query looks like, so a MyKad the router missed but the model passed
+        to a tool still gets the record TTL.
+        """
+        if tools.unavailable:
+            return 0
+        if not tools.lookups:
+            return None
+        if tools.not_found:
+            return min(self.response_cache_mykad_ttl, self.response_cache_not_found_ttl)
+        return self.response_cache_mykad_ttl
+
+    def cache_response(self, key: tuple[str, str, str], response: str, tools: QueryTools):
+        """Cache a successful answer for as long as the records behind it stay current"""
+        ttl = self.answer_ttl(tools)
+        if ttl != 0:
+            self.response_cache.set(key, response, ttl=ttl)
+
+    def uses_response_cache(self) -> bool:
+        """Follow-ups depend on their conversation, so only opening questions share answers"""
+        conversation = conversations.current()
+        return conversation is None or not conversation.turns
+
+    def conversation_history(self) -> list[dict]:
+        conversation = conversations.current()
+        if conversation is None:
+            return []
+        return conversation.history(self.conversations.token_budget)
+
     async def process_query(self, query: str) -> str:
-        """Process a query using DeepSeek R1 on Bedrock and available tools"""
-        # Add system prompt to guide the model's behavior
-        system_prompt = """
-        You are a helpful assistant specializing in Malaysian government services and data retrieval.
+        """Process a query using DeepSeek R1 on Bedrock and available tools
 
-        When retrieving Saman data or other official records:
-        - Always use the appropriate tools rather than generating fake data
-        - Present results in a clear, structured format
-        - Use proper Malaysian formats (MyKad numbers, phone numbers, etc.)
-        - Be accurate and only return actual tool results
+        Inside ``conversations.scope`` the answer also becomes part of that
+        session's history.
+        """
+        started = time.perf_counter()
+        path = "error"
+        conversation = conversations.current()
+        with tracing.tracer.span("process_query", query_length=len(query)) as span, track_tools() as query_tools:
+            try:
+                cacheable = self.uses_response_cache()
+                if cacheable:
+                    key = await self.response_cache_key(query, "query")
+                    with metrics.STAGE_SECONDS.time(stage="response_cache"):
+                        cached = self.response_cache.get(key)
+                    if cached is not None:
+                        path = "cache"
+                        if conversation is not None:
+                            conversation.add_turn(query, cached)
+                        return cached
 
-        Format responses professionally and clearly. Do note that if the MyKad data is not correct, still use it as a argument to pass
-        it into the tools and get appropriate data from the tools. If the users ask for anything related to paying a saman or renewing
-        their license, simply call the tool as we dont need their mykad number or any details to provide them with the information
+                response, complete, path = await self._process_query(query)
+                if complete:
+                    if cacheable:
+                        self.cache_response(key, response, query_tools)
+                    if conversation is not None:
+                        conversation.add_turn(query, response)
+                else:
+                    metrics.ERRORS.inc(stage="incomplete_answer")
+                span.set_attribute("complete", complete)
+                return response
+            finally:
+                span.set_attribute("path", path)
+                metrics.QUERY_SECONDS.observe(time.perf_counter() - started, path=path)
+
+    async def _process_query(self, query: str) -> tuple[str, bool, str]:
+        """Answer a query; the flag is False when a model error cut the answer short
+
+        The last item names the path taken ("router" or "model") for metrics.
         """
+        routed = await self.route_query(query)
+        if routed is not None:
+            _, results = routed
+            with metrics.STAGE_SECONDS.time(stage="format"):
+                final_text = [self.format_tool_result(tool_name, result) for tool_name, _, result in results]
+            final_text = [text for text in final_text if text]
+            if not final_text:
+                return "No response received from GPT", False, "router"
+            return "\n".join(final_text), True, "router"
 
+        # Raises Overloaded when no model slot frees up in time
+        queued = time.perf_counter()
+        async with self.admission.slot():
+            waited = time.perf_counter() - queued
+            metrics.STAGE_SECONDS.observe(waited, stage="admission_wait")
+            span = tracing.current_span()
+            if span is not None:
+                span.set_attribute("admission.wait_ms", round(waited * 1000, 3))
+            return (*await self._process_with_model(query), "model")
+
+    async def _process_with_model(self, query: str) -> tuple[str, bool]:
+        # The system prompt is prepended by build_request_body
         messages = [
-            {
-                "role": "system", 
-                "content": system_prompt
-            },
+            *self.conversation_history(),
             {
                 "role": "user",
                 "content": query
@@ -289,127 +772,291 @@ class MCPClient:
         ]
 
         tools = await self.list_tools()
-        available_tools = []
-        
-        # Convert MCP tools to OpenAI-compatible format for DeepSeek
-        for tool in tools:
-            tool_spec = {
-                "type": "function",
-                "function": {
-                    "name": tool.name,
-                    "description": tool.description,
-                    "parameters": tool.inputSchema
-                }
-            }
-            available_tools.append(tool_spec)
-
-        # Format request for OpenAI model on Bedrock (no model parameter needed)
-        native_request = {
-            "messages": messages,
-            "max_tokens": 1000,
-            "temperature": 0.7
-        }
-        
-        # Add tools if available
-        if available_tools:
-            native_request["tools"] = available_tools
-            native_request["tool_choice"] = "auto"
-
-        try:
-            # Call Bedrock
-            response = self.bedrock_client.invoke_model(
-                modelId=self.model_id,
-                body=json.dumps(native_request)
-            )
-        except (ClientError, Exception) as e:
-            return f"ERROR: Can't invoke '{self.model_id}'. Reason: {e}"
+        tool_choice = "auto"
 
-        # Decode the response body
-        model_response = json.loads(response["body"].read())
-        
         # Process response and handle tool calls (DeepSeek R1 uses OpenAI-compatible format)
-        tool_results = []
         final_text = []
+        complete = True
 
-        # Handle DeepSeek R1 response format (similar to OpenAI)
-        choices = model_response.get("choices", [])
-        if not choices:
-            return "No response choices received from GPT"
+        # Each round is one model call. All tool calls it asks for run concurrently and their
+        # results go back together in the next round, so N tools cost one follow-up, not N.
+        for round_number in range(self.max_tool_rounds + 1):
+            if round_number == self.max_tool_rounds and tools:
+                # Last allowed round: make the model answer with what it has
+                tool_choice = "none"
 
-        message = choices[0].get("message", {})
-        
-        # Check if there are tool calls first
-        tool_calls = message.get("tool_calls", [])
-        
-        # Only add initial content if there are NO tool calls
-        # (if there are tool calls, we'll get the final response after tool execution)
-        if not tool_calls and "content" in message and message["content"]:
-            cleaned_content = self.clean_response(message["content"])
-            if cleaned_content:
-                final_text.append(cleaned_content)
-        for tool_call in tool_calls:
-            if tool_call.get("type") == "function":
-                function = tool_call.get("function", {})
-                tool_name = function.get("name")
-                tool_args_str = function.get("arguments", "{}")
-                
-                try:
-                    tool_args = json.loads(tool_args_str)
-                except json.JSONDecodeError:
-                    tool_args = {}
-                
-                # Execute tool call
-                result = await self.call_tool(tool_name, tool_args)
-                tool_results.append({"call": tool_name, "result": result})
-                
-                # Format the result nicely
-                formatted_result = self.format_tool_result(tool_name, str(result.content), tool_args)
-                final_text.append(formatted_result)
+            try:
+                # Call Bedrock
+                with metrics.STAGE_SECONDS.time(stage="model_first" if round_number == 0 else "model_follow_up"):
+                    model_response = await self.invoke_model(self.build_request_body(messages, tool_choice))
+            except Exception as e:
+                reason = "timed out" if isinstance(e, asyncio.TimeoutError) else e
+                metrics.ERRORS.inc(stage="model")
+                if round_number == 0:
+                    return f"ERROR: Can't invoke '{self.model_id}'. Reason: {reason}", False
+                final_text.append(f"Error in follow-up response: {reason}")
+                complete = False
+                break
 
-                # Continue conversation with tool results (send raw result to model)
-                messages.append({
-                    "role": "assistant",
-                    "content": message.get("content"),
-                    "tool_calls": tool_calls
-                })
+            # Handle DeepSeek R1 response format (similar to OpenAI)
+            choices = model_response.get("choices", [])
+            if not choices:
+                if round_number == 0:
+                    return "No response choices received from GPT", False
+                complete = False
+                break
+
+            message = choices[0].get("message", {})
+            tool_calls = [call for call in message.get("tool_calls") or [] if call.get("type") == "function"]
+
+            # Only add the model's text once it stops asking for tools
+            # (if there are tool calls, we'll get the final response after tool execution)
+            if not tool_calls:
+                if message.get("content"):
+                    with metrics.STAGE_SECONDS.time(stage="format"):
+                        cleaned_content = self.clean_response(message["content"])
+                    if cleaned_content:
+                        final_text.append(cleaned_content)
+                break
+
+            messages.append({
+                "role": "assistant",
+                "content": message.get("content"),
+                "tool_calls": tool_calls
+            })
+            with metrics.STAGE_SECONDS.time(stage="tool_calls"):
+                results = await asyncio.gather(*(self.run_tool_call(tool_call) for tool_call in tool_calls))
+            for tool_call, (tool_name, _, result) in zip(tool_calls, results):
+                with metrics.STAGE_SECONDS.time(stage="format"):
+                    formatted_result = self.format_tool_result(tool_name, result)
+                if formatted_result:
+                    final_text.append(formatted_result)
+
+                # The model gets the compact encoding rather than the user-facing text
                 messages.append({
                     "role": "tool",
                     "tool_call_id": tool_call.get("id"),
-                    "content": str(result.content)
+                    "content": tool_results.for_model(result)
                 })
 
-                # Get next response from OpenAI model
-                follow_up_request = {
-                    "messages": messages,
-                    "max_tokens": 1000,
-                    "temperature": 0.7
+        # Every piece is already formatted, so the joined response needs no second pass
+        if not final_text:
+            return "No response received from GPT", False
+        return "\n".join(final_text), complete
+
+    async def stream_query(self, query: str) -> AsyncIterator[tuple[str, dict]]:
+        """Process a query like process_query, yielding progress events as they happen
+
+        Yields ``(event, data)`` pairs: ``text`` with an incremental, already
+        formatted ``delta``; ``tool_call`` and ``tool_result`` around each tool
+        execution; ``error`` if the model call fails; and a final ``done``.
+        A cached answer comes back as a single ``text`` event.
+        """
+        started = time.perf_counter()
+        path = "stream_error"
+        conversation = conversations.current()
+        with tracing.tracer.span("stream_query", query_length=len(query)) as span, track_tools() as query_tools:
+            try:
+                cacheable = self.uses_response_cache()
+                if cacheable:
+                    key = await self.response_cache_key(query, "stream")
+                    cached = self.response_cache.get(key)
+                    if cached is not None:
+                        path = "stream_cache"
+                        if conversation is not None:
+                            conversation.add_turn(query, cached)
+                        yield "text", {"delta": cached}
+                        yield "done", {}
+                        return
+
+                streamed, failed = [], False
+                async for event, data in self._stream_query(query):
+                    if event == "text":
+                        streamed.append(data["delta"])
+                    elif event == "error":
+                        failed = True
+                    elif event == "done":
+                        path = "stream"
+                        if streamed and not failed:
+                            if cacheable:
+                                self.cache_response(key, "".join(streamed), query_tools)
+                            if conversation is not None:
+                                conversation.add_turn(query, "".join(streamed))
+                    yield event, data
+            finally:
+                span.set_attribute("path", path)
+                metrics.QUERY_SECONDS.observe(time.perf_counter() - started, path=path)
+
+    async def _stream_query(self, query: str) -> AsyncIterator[tuple[str, dict]]:
+        routed = await self.route_query(query)
+        if routed is not None:
+            _, results = routed
+            texts = []
+            for index, (tool_name, _, result) in enumerate(results):
+                call_id = f"routed_{index}"
+                yield "tool_call", {"id": call_id, "name": tool_name}
+                text = self.format_tool_result(tool_name, result)
+                yield "tool_result", {"id": call_id, "name": tool_name, "result": text}
+                texts.append(text)
+            text = "\n".join(text for text in texts if text)
+            if text:
+                yield "text", {"delta": text}
+            yield "done", {}
+            return
+
+        async with self.admission.slot():
+            async for event, data in self._stream_with_model(query):
+                yield event, data
+
+    async def _stream_with_model(self, query: str) -> AsyncIterator[tuple[str, dict]]:
+        messages = [
+            *self.conversation_history(),
+            {
+                "role": "user",
+                "content": query
+            }
+        ]
+        tools = await self.list_tools()
+        tool_choice = "auto"
+        formatter = self.formatter.stream(strip_reasoning=True)
+
+        for round_number in range(self.max_tool_rounds + 1):
+            if round_number == self.max_tool_rounds and tools:
+                tool_choice = "none"
+
+            content_parts = []
+            pending_calls: dict[int, dict] = {}
+            try:
+                async for chunk in self.stream_model(self.build_request_body(messages, tool_choice)):
+                    for choice in chunk.get("choices", []):
+                        delta = choice.get("delta", {})
+                        if delta.get("content"):
+                            content_parts.append(delta["content"])
+                            text = formatter.feed(delta["content"])
+                            if text:
+                                yield "text", {"delta": text}
+                        # Tool calls arrive in fragments keyed by index; stitch the arguments together
+                        for call_delta in delta.get("tool_calls") or []:
+                            call = pending_calls.setdefault(call_delta.get("index", 0), {
+                                "id": None,
+                                "type": "function",
+                                "function": {"name": "", "arguments": ""}
+                            })
+                            call["id"] = call_delta.get("id") or call["id"]
+                            function = call_delta.get("function") or {}
+                            call["function"]["name"] += function.get("name") or ""
+                            call["function"]["arguments"] += function.get("arguments") or ""
+            except Exception as e:
+                reason = "timed out" if isinstance(e, asyncio.TimeoutError) else e
+                metrics.ERRORS.inc(stage="model")
+                yield "error", {"detail": f"Can't invoke '{self.model_id}'. Reason: {reason}"}
+                break
+
+            tool_calls = [pending_calls[index] for index in sorted(pending_calls)]
+            if not tool_calls:
+                break
+
+            messages.append({
+                "role": "assistant",
+                "content": "".join(content_parts) or None,
+                "tool_calls": tool_calls
+            })
+            for tool_call in tool_calls:
+                yield "tool_call", {"id": tool_call["id"], "name": tool_call["function"]["name"]}
+            results = await asyncio.gather(*(self.run_tool_call(tool_call) for tool_call in tool_calls))
+            for tool_call, (tool_name, _, result) in zip(tool_calls, results):
+                yield "tool_result", {
+                    "id": tool_call["id"],
+                    "name": tool_name,
+                    "result": self.format_tool_result(tool_name, result)
                 }
-                
-                if available_tools:
-                    follow_up_request["tools"] = available_tools
-                    follow_up_request["tool_choice"] = "auto"
-
-                try:
-                    follow_up_response = self.bedrock_client.invoke_model(
-                        modelId=self.model_id,
-                        body=json.dumps(follow_up_request)
-                    )
-                    follow_up_data = json.loads(follow_up_response["body"].read())
-                    
-                    # Extract text from follow-up response
-                    follow_choices = follow_up_data.get("choices", [])
-                    if follow_choices:
-                        follow_message = follow_choices[0].get("message", {})
-                        if follow_message.get("content"):
-                            cleaned_content = self.clean_response(follow_message["content"])
-                            if cleaned_content:
-                                final_text.append(cleaned_content)
-                            
-                except (ClientError, Exception) as e:
-                    final_text.append(f"Error in follow-up response: {e}")
-
-        final_response = "\n".join(final_text) if final_text else "No response received from GPT"
-        return self.clean_response_formatting(final_response)
+                messages.append({
+                    "role": "tool",
+                    "tool_call_id": tool_call["id"],
+                    "content": tool_results.for_model(result)
+                })
+
+        text = formatter.flush()
+        if text:
+            yield "text", {"delta": text}
+        yield "done", {}
+
+    def collect_metrics(self, samples: metrics.SampleSet):
+        """Add the router, response cache, admission, session pool, conversation and tracing counters"""
+        samples.add_stats(
+            "govlink_tracing", tracing.tracer.stats(), "Trace sampling and export",
+            counters=("traces_started", "traces_sampled", "spans_exported", "export_errors")
+        )
+        samples.add_stats(
+            "govlink_conversations", self.conversations.stats(), "Multi-turn conversation sessions",
+            counters=("created", "evicted", "expired", "tool_reuse_hits")
+        )
+        samples.add_stats(
+            "govlink_response_cache", self.response_cache.stats(), "Response cache counters",
+            counters=("hits", "misses", "evictions", "expirations", "errors")
+        )
+        router = self.router.stats()
+        for tool, count in router["routed_by_tools"].items():
+            samples.add("govlink_router_routed_total", "counter", "Queries answered by the intent router", count, {"tool": tool})
+        for reason in ("low_confidence", "unmatched"):
+            samples.add(
+                "govlink_router_fallbacks_total", "counter", "Queries the intent router passed to the model",
+                router[f"{reason}_fallbacks"], {"reason": reason}
+            )
+        samples.add_stats(
+            "govlink_admission", self.admission.stats(), "Model admission control",
+            counters=("admitted", "queued", "rejected_queue_full", "rejected_queue_timeout")
+        )
+        if self.session_pool:
+            for session in self.session_pool.stats()["sessions"]:
+                labels = {"session": session["index"]}
+                samples.add("govlink_mcp_session_ready", "gauge", "Whether the pooled MCP server is connected", int(session["ready"]), labels)
+                samples.add("govlink_mcp_session_in_flight", "gauge", "Requests running on the pooled MCP server", session["in_flight"], labels)
+                for field in ("calls", "failures", "restarts"):
+                    samples.add(f"govlink_mcp_session_{field}_total", "counter", "Pooled MCP server counters", session[field], labels)
+
+    async def collect_server_metrics(self, samples: metrics.SampleSet):
+        """Add tool latency and cache counters from the MCP server
+
+        Over stdio every pooled child reports its stats://server resource.
+        Over HTTP ``/stats`` is answered by one uvicorn worker with only its
+        own counters, so those samples carry a ``worker`` label and are a
+        per-worker snapshot of whichever worker took the scrape, not a total.
+        """
+        if self.is_http:
+            stats = await self.http_transport.get_stats()
+            snapshots = [({"server": "http", "worker": stats.pop("worker_pid", "")}, stats)]
+        elif self.session_pool:
+            snapshots = [
+                ({"server": index}, json.loads(result.contents[0].text))
+                for index, result in (await self.session_pool.read_resource_each("stats://server")).items()
+            ]
+        else:
+            return
+        for labels, stats in snapshots:
+            for tool, snapshot in stats.pop("tool_latency", {}).items():
+                samples.add_histogram(
+                    "govlink_server_tool_duration_seconds", "Tool latency inside the MCP server",
+                    snapshot, {**labels, "tool": tool}
+                )
+                samples.add(
+                    "govlink_server_tool_errors_total", "counter", "Tool calls that raised inside the MCP server",
+                    snapshot["errors"], {**labels, "tool": tool}
+                )
+            upstream = stats.pop("upstream_latency", None)
+            if upstream:
+                samples.add_histogram("govlink_server_upstream_duration_seconds", "Upstream request latency", upstream, labels)
+                samples.add("govlink_server_upstream_errors_total", "counter", "Failed upstream requests", upstream["errors"], labels)
+            breaker = stats.get("upstream_breaker") or {}
+            if "state" in breaker:
+                samples.add("govlink_server_upstream_breaker_open", "gauge", "Whether the upstream circuit is open", int(breaker["state"] != "closed"), labels)
+            samples.add_stats(
+                "govlink_server", stats, "MCP server counters", labels,
+                counters=(
+                    "hits", "misses", "evictions", "expirations", "executions", "coalesced", "writes", "errors",
+                    "traces_started", "traces_sampled", "spans_exported", "export_errors"
+                )
+            )
 
     async def chat_loop(self):
         """Run an interactive chat loop"""
@@ -431,6 +1078,8 @@ class MCPClient:
     async def cleanup(self):
         """Clean up resources"""
         await self.exit_stack.aclose()
+        self.model_executor.shutdown(wait=False, cancel_futures=True)
+        tracing.tracer.flush()
 
 async def main():
     if len(sys.argv) < 2:
@@ -448,5 +1097,4 @@ async def main():
         await client.cleanup()
 
 if __name__ == "__main__":
-    import sys
     asyncio.run(main())
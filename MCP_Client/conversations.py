@@ -0,0 +1,178 @@
+import json
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Optional
+
+from router import MYKAD_PATTERN
+
+# Rough token count for budgeting without a tokenizer; close enough for English and JSON
+CHARS_PER_TOKEN = 4
+
+# Conversation of the query being served, if the caller sent a session ID
+_current: ContextVar[Optional["Conversation"]] = ContextVar("conversation", default=None)
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+class Conversation:
+    """History and fetched tool results of one client session
+
+    Only the user's questions and the final answers are kept; tool messages
+    stay inside the turn that made them, so a follow-up costs one question
+    and a few short answers rather than every record fetched so far.
+    ``history`` fits the most recent turns into a token budget and folds
+    the older questions into a one-line summary.
+    """
+
+    def __init__(self, session_id: str, max_turns: int, max_answer_chars: int, max_tool_results: int, tool_ttl: float):
+        self.session_id = session_id
+        self.max_turns = max_turns
+        self.max_answer_chars = max_answer_chars
+        self.max_tool_results = max_tool_results
+        self.tool_ttl = tool_ttl
+        self.turns: list[tuple[str, str]] = []
+        self.dropped_questions: list[str] = []
+        self.last_mykad: Optional[str] = None
+        self.last_used = time.monotonic()
+        self._tool_results: OrderedDict[tuple[str, str], tuple[float, Any]] = OrderedDict()
+
+    def add_turn(self, query: str, answer: str):
+        mykads = ["".join(match.groups()) for match in MYKAD_PATTERN.finditer(query)]
+        if mykads:
+            self.last_mykad = mykads[-1]
+        if len(answer) > self.max_answer_chars:
+            answer = answer[:self.max_answer_chars] + "..."
+        self.turns.append((query, answer))
+        if len(self.turns) > self.max_turns:
+            self.dropped_questions.append(self.turns.pop(0)[0])
+            del self.dropped_questions[:-5]
+
+    def history(self, token_budget: int) -> list[dict]:
+        """Recent turns as chat messages, newest kept first, within ``token_budget``"""
+        messages: list[dict] = []
+        used = 0
+        kept = 0
+        for query, answer in reversed(self.turns):
+            cost = estimate_tokens(query) + estimate_tokens(answer)
+            if used + cost > token_budget:
+                break
+            messages[:0] = [{"role": "user", "content": query}, {"role": "assistant", "content": answer}]
+            used += cost
+            kept += 1
+        earlier = self.dropped_questions + [query for query, _ in self.turns[:len(self.turns) - kept]]
+        if earlier:
+            asked = "; ".join(question[:80] for question in earlier[-5:])
+            summary = {"role": "system", "content": f"Earlier in this conversation the user asked: {asked}"}
+            if used + estimate_tokens(summary["content"]) <= token_budget:
+                messages.insert(0, summary)
+        return messages
+
+    def tool_result(self, tool_name: str, arguments: dict) -> Any:
+        """A result this session already fetched for the same call, or None"""
+        key = (tool_name, json.dumps(arguments, sort_keys=True))
+        entry = self._tool_results.get(key)
+        if entry is None:
+            return None
+        fetched, result = entry
+        if time.monotonic() - fetched > self.tool_ttl:
+            del self._tool_results[key]
+            return None
+        self._tool_results.move_to_end(key)
+        return result
+
+    def store_tool_result(self, tool_name: str, arguments: dict, result: Any):
+        key = (tool_name, json.dumps(arguments, sort_keys=True))
+        self._tool_results[key] = (time.monotonic(), result)
+        self._tool_results.move_to_end(key)
+        while len(self._tool_results) > self.max_tool_results:
+            self._tool_results.popitem(last=False)
+
+
+class ConversationStore:
+    """In-memory sessions keyed by (client, session ID) with LRU and idle eviction
+
+    Keying on the client as well keeps one caller from reading another's
+    session by guessing its ID. Sessions live in the worker that created
+    them; with several API workers a follow-up that lands elsewhere simply
+    starts a fresh session.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 10000,
+        idle_timeout: float = 1800.0,
+        token_budget: int = 1500,
+        max_turns: int = 20,
+        max_answer_chars: int = 2000,
+        max_tool_results: int = 32,
+        tool_ttl: float = 300.0,
+    ):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.token_budget = token_budget
+        self.conversation_options = dict(
+            max_turns=max_turns, max_answer_chars=max_answer_chars,
+            max_tool_results=max_tool_results, tool_ttl=tool_ttl
+        )
+        self._sessions: OrderedDict[tuple[str, str], Conversation] = OrderedDict()
+        self.created = 0
+        self.evicted = 0
+        self.expired = 0
+        self.tool_reuse_hits = 0
+
+    def get(self, client: str, session_id: str) -> Conversation:
+        """The caller's session, created on first use"""
+        self._expire()
+        key = (client, session_id)
+        conversation = self._sessions.get(key)
+        if conversation is None:
+            conversation = Conversation(session_id, **self.conversation_options)
+            self._sessions[key] = conversation
+            self.created += 1
+            if len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evicted += 1
+        self._sessions.move_to_end(key)
+        conversation.last_used = time.monotonic()
+        return conversation
+
+    def end(self, client: str, session_id: str) -> bool:
+        return self._sessions.pop((client, session_id), None) is not None
+
+    def _expire(self):
+        # Least recently used first, so stop at the first session still in use
+        cutoff = time.monotonic() - self.idle_timeout
+        while self._sessions:
+            key, conversation = next(iter(self._sessions.items()))
+            if conversation.last_used > cutoff:
+                break
+            del self._sessions[key]
+            self.expired += 1
+
+    def stats(self) -> dict:
+        self._expire()
+        return {
+            "active": len(self._sessions),
+            "created": self.created,
+            "evicted": self.evicted,
+            "expired": self.expired,
+            "tool_reuse_hits": self.tool_reuse_hits,
+        }
+
+
+@contextmanager
+def scope(conversation: Optional[Conversation]):
+    """Make ``conversation`` the current one for the enclosed query"""
+    token = _current.set(conversation)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def current() -> Optional[Conversation]:
+    return _current.get()
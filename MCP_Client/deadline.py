@@ -0,0 +1,39 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+# Absolute time.monotonic() deadline of the request being served, if any
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """The request's overall time budget ran out before this stage started"""
+
+
+@contextmanager
+def scope(seconds: float):
+    """Give the enclosed work at most ``seconds``; nested scopes can only shorten it"""
+    deadline = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(deadline if outer is None else min(outer, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining(stage_timeout: Optional[float] = None) -> Optional[float]:
+    """Timeout for the next stage: its own limit capped by what is left of the request
+
+    Returns None when there is neither a stage limit nor a deadline, and
+    raises DeadlineExceeded when the deadline has already passed.
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return stage_timeout
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return left if stage_timeout is None else min(stage_timeout, left)
@@ -0,0 +1,153 @@
+"""Offline stand-in for the Bedrock runtime client.
+
+Mimics ``invoke_model`` for the OpenAI-compatible models we use: it blocks
+for a configurable latency like the real SDK call, then answers with a
+tool call when the query names a tool it recognises, or with text that
+echoes the tool results once they are in the conversation.
+
+``invoke_model_with_response_stream`` streams the same answer as OpenAI-style
+chunks, one word at a time after the first-token latency.
+
+A script (``FAKE_BEDROCK_SCRIPT``, a JSON file) overrides that heuristic for
+matching queries. Each rule has a ``match`` regex, a list of ``tool_calls``
+rounds (each a list of ``{"name", "arguments"}``; the strings ``{mykad}``
+and ``{mykads}`` in arguments become the query's first MyKad and all of
+them) and an optional ``answer`` returned once the rounds are used up::
+
+    [{"match": "full report", "tool_calls": [[{"name": "get_license_data", "arguments": {"mykad": "{mykad}"}}],
+                                             [{"name": "get_saman_data", "arguments": {"mykad": "{mykad}"}}]]}]
+
+Enable it with ``BEDROCK_MODE=fake`` (latency via ``FAKE_BEDROCK_LATENCY``,
+per-word delay via ``FAKE_BEDROCK_TOKEN_LATENCY``).
+"""
+import io
+import json
+import re
+import time
+
+from router import MYKAD_PATTERN
+
+
+def find_mykads(text: str) -> list[str]:
+    """MyKads as written in ``text``, matched exactly like the intent router does"""
+    return [match.group(0) for match in MYKAD_PATTERN.finditer(text)]
+
+
+class FakeBedrockClient:
+    """Synchronous, boto3-shaped fake of the ``bedrock-runtime`` client."""
+
+    def __init__(self, latency: float = 0.5, token_latency: float = 0.01, script: list[dict] | None = None):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.script = [dict(rule, match=re.compile(rule["match"], re.IGNORECASE)) for rule in script or []]
+        self.calls = 0
+
+    @staticmethod
+    def load_script(path: str | None) -> list[dict] | None:
+        """Read a tool-call script from a JSON file, or None without a path."""
+        if not path:
+            return None
+        with open(path) as script_file:
+            return json.load(script_file)
+
+    def _scripted_tool_calls(self, rule: dict, query: str, round_number: int) -> list[dict]:
+        rounds = rule.get("tool_calls", [])
+        if round_number >= len(rounds):
+            return []
+        mykads = find_mykads(query)
+
+        def fill(value):
+            if value == "{mykads}":
+                return mykads
+            if isinstance(value, str):
+                return value.replace("{mykad}", mykads[0] if mykads else "")
+            return value
+
+        return [
+            {"name": call["name"], "arguments": {key: fill(value) for key, value in call.get("arguments", {}).items()}}
+            for call in rounds[round_number]
+        ]
+
+    def _choose_tool_calls(self, query: str, tool_names: set[str]) -> list[dict]:
+        lowered = query.lower()
+        mykads = find_mykads(query)
+        calls = []
+        for name, wanted in (("get_saman_data", "saman" in lowered), ("get_license_data", "licen" in lowered or "lesen" in lowered)):
+            if not mykads or not wanted:
+                continue
+            if len(mykads) > 1 and f"{name}_batch" in tool_names:
+                calls.append({"name": f"{name}_batch", "arguments": {"mykads": mykads}})
+            else:
+                calls.extend({"name": name, "arguments": {"mykad": mykad}} for mykad in mykads)
+        if not calls and "pay" in lowered:
+            calls.append({"name": "pay_saman", "arguments": {}})
+        if not calls and "renew" in lowered:
+            calls.append({"name": "renew_license", "arguments": {}})
+        return [call for call in calls if call["name"] in tool_names]
+
+    def respond(self, request: dict) -> dict:
+        """Build the model response for an OpenAI-style request body."""
+        messages = request.get("messages", [])
+        tool_names = {tool["function"]["name"] for tool in request.get("tools", [])}
+        tool_results = [message["content"] for message in messages if message.get("role") == "tool"]
+        query = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+
+        message = {"role": "assistant", "content": None}
+        if request.get("tool_choice") == "none":
+            tool_names = set()
+        rule = next((rule for rule in self.script if rule["match"].search(query)), None)
+        if rule is not None:
+            round_number = sum(1 for m in messages if m.get("role") == "assistant" and m.get("tool_calls"))
+            tool_calls = [
+                call for call in self._scripted_tool_calls(rule, query, round_number) if call["name"] in tool_names
+            ]
+        else:
+            tool_calls = [] if tool_results else self._choose_tool_calls(query, tool_names)
+        if tool_calls:
+            message["tool_calls"] = [
+                {
+                    "id": f"call_{self.calls}_{index}",
+                    "type": "function",
+                    "function": {"name": call["name"], "arguments": json.dumps(call["arguments"])},
+                }
+                for index, call in enumerate(tool_calls)
+            ]
+        elif rule is not None and rule.get("answer"):
+            message["content"] = rule["answer"]
+        elif tool_results:
+            message["content"] = "Here is what I found:\n" + "\n".join(str(result) for result in tool_results)
+        else:
+            message["content"] = f"You asked: {query}. How else can I help with government services?"
+
+        prompt_tokens = sum(len(str(m.get("content") or "")) for m in messages) // 4
+        completion_tokens = len(message["content"] or "") // 4
+        return {
+            "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if tool_calls else "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    def invoke_model(self, modelId: str, body: str, **kwargs) -> dict:
+        self.calls += 1
+        time.sleep(self.latency)
+        payload = json.dumps(self.respond(json.loads(body))).encode()
+        return {"body": io.BytesIO(payload), "contentType": "application/json"}
+
+    def _stream_events(self, response: dict):
+        message = response["choices"][0]["message"]
+        time.sleep(self.latency)
+        for index, call in enumerate(message.get("tool_calls") or []):
+            delta = {"tool_calls": [dict(call, index=index)]}
+            yield {"chunk": {"bytes": json.dumps({"choices": [{"index": 0, "delta": delta}]}).encode()}}
+        for token in re.findall(r"\S+\s*|\s+", message.get("content") or ""):
+            yield {"chunk": {"bytes": json.dumps({"choices": [{"index": 0, "delta": {"content": token}}]}).encode()}}
+            time.sleep(self.token_latency)
+        final = {"choices": [{"index": 0, "delta": {}, "finish_reason": response["choices"][0]["finish_reason"]}]}
+        yield {"chunk": {"bytes": json.dumps(final).encode()}}
+
+    def invoke_model_with_response_stream(self, modelId: str, body: str, **kwargs) -> dict:
+        self.calls += 1
+        return {"body": self._stream_events(self.respond(json.loads(body))), "contentType": "application/json"}
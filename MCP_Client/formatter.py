@@ -0,0 +1,236 @@
+import re
+from typing import Optional
+
+
+def _mis_decodings(text: str) -> set[str]:
+    """How ``text`` looks after its UTF-8 bytes are read as Windows-1252 or Latin-1"""
+    cp1252 = []
+    for byte in text.encode("utf-8"):
+        try:
+            cp1252.append(bytes([byte]).decode("cp1252"))
+        except UnicodeDecodeError:
+            cp1252.append(chr(byte))  # bytes cp1252 leaves undefined pass through as-is
+    return {"".join(cp1252), text.encode("utf-8").decode("latin-1")}
+
+
+# Mojibake left by models that echo double-decoded punctuation, mapped to plain ASCII
+MOJIBAKE = {
+    garbled: replacement
+    for char, replacement in {
+        "\u202f": " ", "\u2011": "-", "\u2019": "'", "\u2018": "'",
+        "\u201c": '"', "\u201d": '"', "\u2026": "...", "\u2013": "-", "\u2014": "--",
+    }.items()
+    for garbled in _mis_decodings(char)
+}
+
+
+class ResponseFormatter:
+    """Turn model output into plain chat text in a single pass
+
+    One precompiled tokenizer walks the whole response once and rewrites
+    every construct it meets: table rows become ``Field: Value`` lines,
+    header and bullet markers are dropped from line starts, HTML tags, raw
+    ``{'result': ...}`` blobs and horizontal rules disappear, italics and
+    code spans keep their text, mojibake becomes ASCII and whitespace runs
+    collapse. Every alternative stops at the next delimiter or line end, so
+    the work stays linear in the input size.
+    """
+
+    HTML_BREAK = re.compile(r"<br\s*/?>", re.IGNORECASE)
+    LINE_BREAK = re.compile(r"\r?\n|<br\s*/?>", re.IGNORECASE)
+    TABLE_SEPARATOR = re.compile(r"^\|?[\s:|-]*-[\s:|-]*$")
+    BLANK_RUN = re.compile(r"\n{3,}")
+    DOUBLE_SPACE = re.compile(r" {2,}")
+    # Every branch starts with a literal character so the regex engine can skip
+    # plain text with a fast character-set scan; _token dispatches on that character
+    TOKENS = re.compile("|".join([
+        # Line start: blank-line run, indentation, then a table row or header/bullet marker
+        # (plain lines are skipped by the lookahead so they never reach the callback)
+        r"\n(?=[ \t\n|#*+\-])(?P<blank>(?:[ \t]*\n)*)[ \t]*(?:(?P<table>\|[^\n]*)|#{1,6}[ \t]*|[*+\-][ \t]+)?",
+        r" [ \t]*(?=\n|\Z)",
+        r" [ \t]+",
+        r"\t[ \t]*",
+        r"""\{'result':\s*'[^'\n]*'\}""",
+        r'''\{"result":\s*"[^"\n]*"\}''',
+        r"</?[a-zA-Z!][^<>\n]*>",
+        r"`(?P<code>[^`\n]*)`",
+        # Single asterisks only: bold (**) on either side is left alone
+        r"\*(?<!\*\*)(?!\*)(?P<italic>[^*\n]+)\*(?!\*)",
+        r"-{3,}",
+        r"\u00e2(?:" + "|".join(re.escape(key[1:]) for key in sorted(MOJIBAKE, key=len, reverse=True)) + ")",
+    ]))
+
+    def _token(self, match: re.Match) -> str:
+        token = match.group()
+        first = token[0]
+        if first == "\n":
+            newline = "\n\n" if match.group("blank") else "\n"
+            if match.group("table") is None:
+                return newline  # indentation and header/bullet markers are dropped
+            row = self._table_row(match.group("table").strip())
+            if row is None:
+                # Rows that convert to nothing take their newline with them
+                return "\n" if match.group("blank") else ""
+            return newline + row
+        if first in " \t":
+            at_line_end = match.end() == len(match.string) or match.string[match.end()] == "\n"
+            return "" if at_line_end else " "
+        if first == "`":
+            return match.group("code")
+        if first == "*":
+            return match.group("italic")
+        if first == "\u00e2":
+            return MOJIBAKE[token]
+        return ""  # result blobs, HTML tags and horizontal rules
+
+    def _table_row(self, row: str) -> Optional[str]:
+        if self.TABLE_SEPARATOR.match(row):
+            return None
+        cells = [cell.strip() for cell in row.split("|") if cell.strip()]
+        if len(cells) < 2:
+            return None
+        field = cells[0].replace("**", "").strip()  # Remove bold from field names
+        value = cells[1]  # Keep bold formatting in values
+        if not field or field == "Field" or value == "Information":
+            return None
+        return self._finish(self.TOKENS.sub(self._token, f"{field}: {value}"))
+
+    def _finish(self, text: str) -> str:
+        # Dropping a token can leave doubled spaces or extra blank lines behind
+        if "  " in text:
+            text = self.DOUBLE_SPACE.sub(" ", text)
+        if "\n\n\n" in text:
+            text = self.BLANK_RUN.sub("\n\n", text)
+        return text.strip()
+
+    def _strip_reasoning(self, text: str) -> str:
+        cleaned_lines = []
+        skip_reasoning = False
+        for line in text.split("\n"):
+            # Check for reasoning tags or patterns
+            if '<reasoning>' in line.lower() or line.strip().startswith('**Reasoning'):
+                skip_reasoning = True
+                continue
+            elif '</reasoning>' in line.lower() or (skip_reasoning and line.strip() == ''):
+                skip_reasoning = False
+                continue
+            elif skip_reasoning:
+                continue
+            cleaned_lines.append(line)
+        return "\n".join(cleaned_lines)
+
+    def format(self, text: str, strip_reasoning: bool = False) -> str:
+        """Format a complete response
+
+        Args:
+            text: Raw model output
+            strip_reasoning: Also drop ``<reasoning>`` / ``**Reasoning`` sections
+        """
+        if not text:
+            return text
+        if "\r" in text:
+            text = text.replace("\r\n", "\n")
+        if "<" in text:
+            text = self.HTML_BREAK.sub("\n", text)
+        if strip_reasoning and "easoning" in text:
+            text = self._strip_reasoning(text)
+        # The leading newline lets the first line go through the line-start branch
+        return self._finish(self.TOKENS.sub(self._token, "\n" + text))
+
+    def format_line(self, line: str) -> Optional[str]:
+        """Format one line; ``None`` means the line disappears entirely"""
+        if line.lstrip().startswith("|"):
+            return self._table_row(line.strip())
+        return self._finish(self.TOKENS.sub(self._token, "\n" + line))
+
+    def stream(self, strip_reasoning: bool = False) -> "FormatStream":
+        """Start formatting a response that arrives in pieces"""
+        return FormatStream(self, strip_reasoning)
+
+
+class FormatStream:
+    """Incremental state for one response being formatted
+
+    ``feed`` returns formatted text as soon as it is safe to show: every
+    completed line, plus the start of the current line up to its last space
+    when that part holds nothing the formatter would rewrite. Joining every
+    ``feed`` result and ``flush`` gives the same text as ``format``.
+    """
+
+    # Characters that may start markup, tables, HTML or mojibake the formatter rewrites
+    UNSAFE_PARTIAL = re.compile(r"[*`#<>{}|\u00e2]|--|^\s*[-+]")
+
+    def __init__(self, formatter: ResponseFormatter, strip_reasoning: bool = False):
+        self.formatter = formatter
+        self.strip_reasoning = strip_reasoning
+        self.skip_reasoning = False
+        self.line = ""
+        self.line_emitted = False
+        self.started = False
+        self.pending_blank = False
+
+    def _emit(self, text: Optional[str]) -> str:
+        """Start a new output line, collapsing runs of blank lines"""
+        if text is None:
+            return ""
+        if not text:
+            if self.started:
+                self.pending_blank = True
+            return ""
+        separator = ("\n\n" if self.pending_blank else "\n") if self.started else ""
+        self.started = True
+        self.pending_blank = False
+        return separator + text
+
+    def finish_line(self, line: str) -> str:
+        """Format and emit one complete line"""
+        emitted, self.line_emitted = self.line_emitted, False
+        if emitted:
+            # The start of this line already went out as plain text; a placeholder
+            # stands in for it so line-start rules and the word boundary still hold
+            return self.formatter.format_line("a" + line)[1:]
+
+        # Remove reasoning sections
+        if self.strip_reasoning:
+            lowered = line.lower()
+            if '<reasoning>' in lowered or line.strip().startswith('**Reasoning'):
+                self.skip_reasoning = True
+                return ""
+            elif '</reasoning>' in lowered or (self.skip_reasoning and line.strip() == ''):
+                self.skip_reasoning = False
+                return ""
+            elif self.skip_reasoning:
+                return ""
+
+        return self._emit(self.formatter.format_line(line))
+
+    def feed(self, delta: str) -> str:
+        """Add streamed text and return whatever can already be shown"""
+        self.line += delta
+        output = []
+        while True:
+            match = self.formatter.LINE_BREAK.search(self.line)
+            if not match:
+                break
+            output.append(self.finish_line(self.line[:match.start()]))
+            self.line = self.line[match.end():]
+
+        # Release the safe prefix of the current line so words appear as they stream
+        prefix = self.line[:max(self.line.rfind(" "), 0)].rstrip()
+        if (
+            prefix.strip() and not self.skip_reasoning
+            and not self.UNSAFE_PARTIAL.search(self.line if not self.line_emitted else prefix)
+        ):
+            formatted = re.sub(r"[ \t]+", " ", prefix)
+            if not self.line_emitted:
+                formatted = self._emit(formatted.lstrip())
+            output.append(formatted)
+            self.line = self.line[len(prefix):]
+            self.line_emitted = True
+        return "".join(output)
+
+    def flush(self) -> str:
+        """Return the formatted remainder once the stream has ended"""
+        output = self.finish_line(self.line) if self.line or self.line_emitted else ""
+        self.line = ""
+        return output
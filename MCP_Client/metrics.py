@@ -0,0 +1,225 @@
+"""Minimal Prometheus metrics: counters, gauges and histograms in text format.
+
+Everything lives in process memory and costs a dict lookup and a few float
+operations per observation, so instrumentation can stay on in production.
+With API_WORKERS > 1 each worker exports its own series.
+"""
+import math
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Iterable
+
+# Seconds; spans a cached answer (sub-millisecond) to a slow model call
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.2, 0.3, 0.4, 0.5, 0.75,
+    1.0, 1.5, 2.0, 3.0, 5.0, 10.0, 30.0, 60.0
+)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels: Iterable[tuple[str, str]]) -> str:
+    pairs = []
+    for name, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = self.header()
+        for key, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(zip(self.labelnames, key))} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # Per label set: [count per bucket (last is +Inf), sum]
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of the enclosed block, even if it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> list[str]:
+        lines = self.header()
+        for key, (counts, total) in self._series.items():
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(labels + [('le', _format_value(bound))])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+class SampleSet:
+    """Series gathered at scrape time, grouped so each metric gets one HELP/TYPE header"""
+
+    def __init__(self):
+        self._families: dict[str, tuple[str, str, list[str]]] = {}
+
+    def add(self, name: str, kind: str, documentation: str, value: float, labels: dict | None = None, suffix: str = ""):
+        family = self._families.setdefault(name, (kind, documentation, []))
+        family[2].append(f"{name}{suffix}{_format_labels((labels or {}).items())} {_format_value(value)}")
+
+    def add_stats(self, prefix: str, stats: dict, documentation: str, labels: dict | None = None, counters: tuple[str, ...] = ()):
+        """Add the numeric fields of a ``stats()`` dict as ``prefix_field`` gauges
+
+        Fields listed in ``counters`` become ``prefix_field_total`` counters.
+        Nested dicts extend the name; strings, lists and None are skipped.
+        """
+        for field, value in stats.items():
+            name = f"{prefix}_{field}"
+            if isinstance(value, dict):
+                self.add_stats(name, value, documentation, labels, counters)
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                if field in counters:
+                    self.add(f"{name}_total", "counter", documentation, value, labels)
+                else:
+                    self.add(name, "gauge", documentation, value, labels)
+
+    def add_histogram(self, name: str, documentation: str, snapshot: dict, labels: dict | None = None):
+        """Add a histogram from per-bucket counts (the MCP server's ``timing`` snapshots)"""
+        labels = labels or {}
+        cumulative = 0
+        for bound, count in zip((*snapshot["buckets"], math.inf), snapshot["counts"]):
+            cumulative += count
+            self.add(name, "histogram", documentation, cumulative, {**labels, "le": _format_value(bound)}, "_bucket")
+        self.add(name, "histogram", documentation, snapshot["sum"], labels, "_sum")
+        self.add(name, "histogram", documentation, cumulative, labels, "_count")
+
+    def render(self) -> list[str]:
+        lines = []
+        for name, (kind, documentation, samples) in self._families.items():
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples)
+        return lines
+
+
+class Registry:
+    """Metrics defined up front plus collectors that report existing stats at scrape time"""
+
+    def __init__(self):
+        self.metrics: list[_Metric] = []
+        self.collectors: list[Callable[[SampleSet], None]] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[SampleSet], None]):
+        self.collectors.append(collector)
+
+    def render(self, samples: SampleSet | None = None) -> str:
+        """Prometheus text exposition of every metric, collector and ``samples``"""
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        samples = samples or SampleSet()
+        for collector in self.collectors:
+            collector(samples)
+        lines.extend(samples.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+QUERY_SECONDS = REGISTRY.register(Histogram(
+    "govlink_query_duration_seconds", "End-to-end time to answer a query", ("path",)
+))
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "govlink_stage_duration_seconds", "Time spent in each stage of answering a query", ("stage",)
+))
+TOOL_SECONDS = REGISTRY.register(Histogram(
+    "govlink_tool_call_duration_seconds", "MCP tool call latency seen by the client", ("tool",)
+))
+MODEL_CALLS = REGISTRY.register(Counter(
+    "govlink_model_calls_total", "Bedrock model calls by outcome", ("outcome",)
+))
+TOOL_CALLS = REGISTRY.register(Counter(
+    "govlink_tool_calls_total", "MCP tool calls by tool and outcome", ("tool", "outcome")
+))
+ERRORS = REGISTRY.register(Counter(
+    "govlink_errors_total", "Failures by stage", ("stage",)
+))
+MODEL_TOKENS = REGISTRY.register(Counter(
+    "govlink_model_tokens_total", "Tokens reported by the model", ("kind",)
+))
+MODEL_LAST_TOKENS = REGISTRY.register(Gauge(
+    "govlink_model_last_call_tokens", "Tokens used by the most recent model call", ("kind",)
+))
+STARTUP_SECONDS = REGISTRY.register(Gauge(
+    "govlink_startup_seconds", "Duration of each startup and warm-up phase", ("phase",)
+))
+
+
+def record_usage(usage: dict | None):
+    """Feed the token counters from an OpenAI-style ``usage`` block"""
+    if not usage:
+        return
+    for kind in ("prompt_tokens", "completion_tokens", "total_tokens"):
+        if kind in usage:
+            MODEL_TOKENS.inc(usage[kind], kind=kind)
+            MODEL_LAST_TOKENS.set(usage[kind], kind=kind)
+
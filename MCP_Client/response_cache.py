@@ -0,0 +1,182 @@
+import re
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from router import MYKAD_PATTERN
+
+PUNCTUATION = re.compile(r"[^\w\s]+")
+
+
+def normalize_query(query: str) -> str:
+    """Reduce a query to the form used as its cache key
+
+    Case, punctuation and spacing are dropped and MyKad numbers lose their
+    dashes, so "How to pay saman?" and "how to pay  saman" share an entry.
+    """
+    text = MYKAD_PATTERN.sub(lambda match: "".join(match.groups()), query.lower())
+    return " ".join(PUNCTUATION.sub(" ", text).split())
+
+
+class ResponseCache:
+    """Bounded cache of final answers with LRU eviction and per-entry TTLs"""
+
+    def __init__(self, max_size: int = 1024, default_ttl: float = 600.0):
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self._entries: OrderedDict[tuple, tuple[float, str]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: tuple) -> Optional[str]:
+        """Return the cached answer for ``key``, or None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, response = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return response
+
+    def set(self, key: tuple, response: str, ttl: float | None = None):
+        """Store ``response`` for ``ttl`` seconds (0 or less skips caching)"""
+        if ttl is None:
+            ttl = self.default_ttl
+        if ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": "memory",
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class SharedResponseCache:
+    """Response cache in a SQLite file shared by every API worker process
+
+    Same interface as ResponseCache. Point RESPONSE_CACHE_PATH at a file
+    on tmpfs (``/dev/shm``) so every pre-forked worker sees the answers the
+    others computed and lookups stay well under a millisecond. Eviction
+    drops the entries closest to expiry rather than true LRU, since
+    tracking recency would turn every hit into a write. Hit counters are
+    per worker; ``size`` is shared.
+    """
+
+    def __init__(self, path: str, max_size: int = 1024, default_ttl: float = 600.0, trim_every: int = 64):
+        self.path = path
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self.trim_every = trim_every
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=1.0)
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = OFF")  # losing a cache entry on power loss is fine
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, expires_at REAL NOT NULL) WITHOUT ROWID"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_expires_at ON responses (expires_at)")
+        self._sets = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.errors = 0
+
+    @staticmethod
+    def _encode(key: tuple) -> str:
+        return "\x1f".join(key)
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT count(*) FROM responses").fetchone()[0]
+
+    def get(self, key: tuple) -> Optional[str]:
+        """Return the cached answer for ``key``, or None"""
+        try:
+            row = self._db.execute(
+                "SELECT response, expires_at FROM responses WHERE key = ?", (self._encode(key),)
+            ).fetchone()
+        except sqlite3.Error:
+            self.errors += 1
+            row = None
+        if row is None:
+            self.misses += 1
+            return None
+        response, expires_at = row
+        if expires_at <= time.time():
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self.hits += 1
+        return response
+
+    def set(self, key: tuple, response: str, ttl: float | None = None):
+        """Store ``response`` for ``ttl`` seconds (0 or less skips caching)"""
+        if ttl is None:
+            ttl = self.default_ttl
+        if ttl <= 0:
+            return
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, response, expires_at) VALUES (?, ?, ?)",
+                (self._encode(key), response, time.time() + ttl),
+            )
+            self._sets += 1
+            if self._sets % self.trim_every == 0:
+                self._trim()
+        except sqlite3.Error:
+            self.errors += 1
+
+    def _trim(self):
+        self._db.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+        excess = len(self) - self.max_size
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY expires_at LIMIT ?)",
+                (excess,),
+            )
+            self.evictions += excess
+
+    def clear(self):
+        self._db.execute("DELETE FROM responses")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": "shared",
+            "size": len(self),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "errors": self.errors,
+        }
@@ -0,0 +1,103 @@
+import re
+from dataclasses import dataclass, field
+
+MYKAD_PATTERN = re.compile(r"(?<!\d)(\d{6})[-\s]?(\d{2})[-\s]?(\d{4})(?!\d)")
+
+# Keyword patterns in English and Malay; matched against the lower-cased query
+SAMAN = r"(?:saman|summons?|traffic fines?|denda)"
+LICENSE = r"(?:licen[cs]e|lesen|driving permit|ldl|pdl|cdl)"
+PAY = re.compile(rf"\b(?:pay(?:ing|ment)?|bayar(?:an)?|settle|jelaskan|langsaikan)\b.*\b{SAMAN}|\b{SAMAN}\b.*\b(?:pay(?:ing|ment)?|bayar(?:an)?|settle|jelaskan)\b")
+RENEW = re.compile(rf"\b(?:renew(?:al|ing)?|perbaharui|pembaharuan|baharui|sambung|extend)\b.*\b{LICENSE}|\b{LICENSE}\b.*\b(?:renew(?:al|ing)?|perbaharui|pembaharuan|baharui|sambung)\b")
+SAMAN_LOOKUP = re.compile(rf"\b{SAMAN}\b")
+LICENSE_LOOKUP = re.compile(rf"\b{LICENSE}\b")
+# Phrasing that means the user wants more than a fixed answer or a plain lookup
+COMPLEX = re.compile(r"\b(?:why|kenapa|mengapa|compare|banding|appeal|rayuan|dispute|if|jika|kalau|explain|terangkan)\b")
+
+
+@dataclass
+class Route:
+    """A routing decision: which tools answer the query and how sure we are"""
+    intent: str
+    confidence: float
+    calls: list[tuple[str, dict]] = field(default_factory=list)
+
+
+class IntentRouter:
+    """Keyword router that answers simple queries straight from the MCP tools
+
+    Paying a saman and renewing a licence have fixed answers, and a MyKad
+    lookup only needs the number from the text, so neither needs a model
+    round trip. Anything ambiguous comes back with low confidence so the
+    caller can fall back to the LLM.
+    """
+
+    def __init__(self, min_confidence: float = 0.8, max_words: int = 30):
+        self.min_confidence = min_confidence
+        self.max_words = max_words
+        self.routed: dict[str, int] = {}
+        self.low_confidence = 0
+        self.unmatched = 0
+
+    def classify(self, query: str, fallback_mykad: str | None = None) -> Route | None:
+        """Work out the intent of ``query`` without recording metrics
+
+        ``fallback_mykad`` (the MyKad a conversation last mentioned) is looked
+        up when the query asks for a record without naming a MyKad. It never
+        applies to static questions, so "how do I pay my saman?" still gets
+        the fixed answer mid-conversation.
+        """
+        text = query.lower()
+        mykads = list(dict.fromkeys("".join(match.groups()) for match in MYKAD_PATTERN.finditer(text)))
+
+        static = []
+        if PAY.search(text):
+            static.append(("pay_saman", {}))
+        if RENEW.search(text):
+            static.append(("renew_license", {}))
+        if not mykads and not static and fallback_mykad:
+            mykads = [fallback_mykad]
+        mykad = mykads[0] if mykads else None
+        lookups = []
+        for tool, pattern in (("get_saman_data", SAMAN_LOOKUP), ("get_license_data", LICENSE_LOOKUP)):
+            if mykad and pattern.search(text):
+                # Several MyKads (a household or fleet) go to the batch tool in one call
+                lookups.append((f"{tool}_batch", {"mykads": mykads}) if len(mykads) > 1 else (tool, {"mykad": mykad}))
+
+        if not static and not lookups:
+            return None
+        if static and lookups:
+            # e.g. "pay the saman for 900101-14-5001": needs judgement, leave it to the model
+            return Route("mixed", 0.4, static + lookups)
+
+        confidence = 0.95
+        if len(MYKAD_PATTERN.sub("", text).split()) > self.max_words:
+            confidence -= 0.3
+        if COMPLEX.search(text):
+            confidence -= 0.4
+        if static:
+            return Route("static", confidence if len(static) == 1 else confidence - 0.1, static)
+        return Route("lookup", confidence, lookups)
+
+    def route(self, query: str, fallback_mykad: str | None = None) -> Route | None:
+        """Return a confident route for ``query``, or None to use the LLM"""
+        route = self.classify(query, fallback_mykad)
+        if route is None:
+            self.unmatched += 1
+            return None
+        if route.confidence < self.min_confidence:
+            self.low_confidence += 1
+            return None
+        key = "+".join(tool for tool, _ in route.calls)
+        self.routed[key] = self.routed.get(key, 0) + 1
+        return route
+
+    def stats(self) -> dict:
+        routed = sum(self.routed.values())
+        total = routed + self.low_confidence + self.unmatched
+        return {
+            "routed": routed,
+            "routed_by_tools": dict(self.routed),
+            "low_confidence_fallbacks": self.low_confidence,
+            "unmatched_fallbacks": self.unmatched,
+            "hit_rate": round(routed / total, 4) if total else 0.0,
+        }
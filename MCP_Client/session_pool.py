@@ -0,0 +1,241 @@
+import asyncio
+import time
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Optional
+
+import anyio
+from mcp import ClientSession, McpError, StdioServerParameters, types
+from mcp.client.stdio import stdio_client
+
+
+class PooledSession:
+    """One stdio MCP server child and its session, kept alive by its own task
+
+    The transport and session contexts are entered and exited inside ``run``
+    (anyio requires that), which reconnects with a short backoff whenever
+    the child dies or ``restart`` is called.
+    """
+
+    def __init__(self, index: int, server_params: StdioServerParameters, message_handler=None):
+        self.index = index
+        self.server_params = server_params
+        self.message_handler = message_handler
+        self.session: Optional[ClientSession] = None
+        self.ready = asyncio.Event()
+        # Resolved when the current session ends, so requests waiting on it fail fast
+        self.closed: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.in_flight = 0
+        self.calls = 0
+        self.failures = 0
+        self.restarts = 0
+        self._signal = asyncio.Event()
+        self._stopping = False
+
+    async def run(self):
+        backoff = 0.5
+        while not self._stopping:
+            started = time.monotonic()
+            try:
+                async with stdio_client(self.server_params) as (read, write):
+                    async with ClientSession(read, write, message_handler=self.message_handler) as session:
+                        await session.initialize()
+                        self.session = session
+                        self.closed = asyncio.get_running_loop().create_future()
+                        self.ready.set()
+                        await self._signal.wait()
+            except Exception as e:
+                print(f"MCP session {self.index} closed: {e!r}")
+            finally:
+                self.ready.clear()
+                self.session = None
+                self._signal.clear()
+                if not self.closed.done():
+                    self.closed.set_result(None)
+            if self._stopping:
+                break
+            self.restarts += 1
+            # Back off only when the child keeps dying straight after starting
+            backoff = 0.5 if time.monotonic() - started > 30 else min(backoff * 2, 10.0)
+            await asyncio.sleep(backoff)
+
+    def restart(self, session: ClientSession):
+        """Drop the child behind ``session``; ``run`` starts a fresh one
+
+        Requests that fail on an already replaced session are ignored, so a
+        burst of failures from one dead child causes a single restart.
+        """
+        if session is not None and session is self.session:
+            self.ready.clear()
+            self._signal.set()
+
+    def stop(self):
+        self._stopping = True
+        self._signal.set()
+
+
+def is_connection_error(error: Exception) -> bool:
+    """Whether ``error`` means the session is gone rather than the request failed"""
+    if isinstance(error, McpError):
+        return error.error.code == types.CONNECTION_CLOSED
+    return isinstance(error, (ConnectionError, anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream))
+
+
+class SessionPool:
+    """Pool of stdio MCP sessions with least-busy dispatch
+
+    A single stdio child serializes every request through one pipe, so the
+    pool runs ``size`` children and sends each request to the ready session
+    with the fewest requests in flight. A background task pings every
+    session and restarts the ones that stop answering; a request that fails
+    because its session died is retried once on another session.
+    """
+
+    def __init__(
+        self,
+        server_params: StdioServerParameters,
+        size: int = 4,
+        message_handler=None,
+        health_interval: float = 15.0,
+        ping_timeout: float = 5.0,
+        acquire_timeout: float = 30.0,
+    ):
+        self.members = [PooledSession(index, server_params, message_handler) for index in range(size)]
+        self.health_interval = health_interval
+        self.ping_timeout = ping_timeout
+        self.acquire_timeout = acquire_timeout
+        self._tasks: list[asyncio.Task] = []
+        self._health_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Start every child and wait until at least one session is ready"""
+        self._tasks = [asyncio.create_task(member.run()) for member in self.members]
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(member.ready.wait() for member in self.members)),
+                timeout=self.acquire_timeout
+            )
+        except asyncio.TimeoutError:
+            if not any(member.ready.is_set() for member in self.members):
+                await self.close()
+                raise RuntimeError(f"No MCP session became ready within {self.acquire_timeout}s")
+        self._health_task = asyncio.create_task(self._health_loop())
+
+    async def _acquire(self, exclude: Optional[PooledSession] = None) -> PooledSession:
+        deadline = time.monotonic() + self.acquire_timeout
+        while True:
+            ready = [member for member in self.members if member.ready.is_set() and member is not exclude]
+            if not ready and exclude is not None and exclude.ready.is_set():
+                ready = [exclude]
+            if ready:
+                return min(ready, key=lambda member: (member.in_flight, member.calls))
+            if time.monotonic() >= deadline:
+                raise RuntimeError("No MCP session available")
+            await asyncio.sleep(0.05)
+
+    async def run(self, request: Callable[[ClientSession], Awaitable[Any]]) -> Any:
+        """Run ``request`` on the least busy session, retrying once if that session dies"""
+        failed = None
+        for attempt in range(2):
+            member = await self._acquire(exclude=failed)
+            session = member.session
+            member.in_flight += 1
+            member.calls += 1
+            task = asyncio.ensure_future(request(session))
+            try:
+                # A dead child never answers, so stop waiting as soon as its session ends
+                await asyncio.wait((task, member.closed), return_when=asyncio.FIRST_COMPLETED)
+                if not task.done():
+                    task.cancel()
+                    raise ConnectionError(f"MCP session {member.index} closed")
+                return task.result()
+            except asyncio.CancelledError:
+                task.cancel()
+                raise
+            except Exception as e:
+                # Slow tools and request errors leave the session alone; the health check decides
+                if not (member.closed.done() or is_connection_error(e)):
+                    raise
+                member.failures += 1
+                member.restart(session)
+                if attempt:
+                    raise
+                failed = member
+            finally:
+                member.in_flight -= 1
+
+    async def list_tools(self):
+        return await self.run(lambda session: session.list_tools())
+
+    async def call_tool(self, tool_name: str, arguments: dict, timeout: float | None = None, traceparent: str | None = None):
+        """Call a tool; ``timeout`` and ``traceparent`` also go to the server in ``_meta``"""
+        meta_fields = {}
+        if timeout:
+            meta_fields["timeoutMs"] = int(timeout * 1000)
+        if traceparent:
+            meta_fields["traceparent"] = traceparent
+        meta = types.RequestParams.Meta(**meta_fields) if meta_fields else None
+        request = types.ClientRequest(types.CallToolRequest(
+            params=types.CallToolRequestParams(name=tool_name, arguments=arguments, _meta=meta)
+        ))
+        read_timeout = timedelta(seconds=timeout) if timeout else None
+        return await self.run(
+            lambda session: session.send_request(request, types.CallToolResult, request_read_timeout_seconds=read_timeout)
+        )
+
+    async def each(self, request: Callable[[ClientSession], Awaitable[Any]], timeout: float = 2.0) -> dict[int, Any]:
+        """Run ``request`` on every ready server, keyed by member index
+
+        Servers that fail or miss ``timeout`` are left out, so a caller never
+        blocks on a restarting child.
+        """
+        async def run(member: PooledSession):
+            return member.index, await asyncio.wait_for(request(member.session), timeout)
+
+        results = await asyncio.gather(
+            *(run(member) for member in self.members if member.ready.is_set()),
+            return_exceptions=True
+        )
+        return dict(result for result in results if not isinstance(result, BaseException))
+
+    async def read_resource_each(self, uri: str, timeout: float = 2.0) -> dict[int, Any]:
+        """Read ``uri`` from every ready server, keyed by member index"""
+        return await self.each(lambda session: session.read_resource(uri), timeout)
+
+    async def _check(self, member: PooledSession):
+        session = member.session
+        try:
+            await asyncio.wait_for(session.send_ping(), timeout=self.ping_timeout)
+        except Exception as e:
+            print(f"MCP session {member.index} failed its health check: {e!r}")
+            member.failures += 1
+            member.restart(session)
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await asyncio.gather(*(self._check(member) for member in self.members if member.ready.is_set()))
+
+    async def close(self):
+        """Stop the health check and shut every child down"""
+        if self._health_task is not None:
+            self._health_task.cancel()
+        for member in self.members:
+            member.stop()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self.members),
+            "ready": sum(1 for member in self.members if member.ready.is_set()),
+            "sessions": [
+                {
+                    "index": member.index,
+                    "ready": member.ready.is_set(),
+                    "in_flight": member.in_flight,
+                    "calls": member.calls,
+                    "failures": member.failures,
+                    "restarts": member.restarts,
+                }
+                for member in self.members
+            ],
+        }
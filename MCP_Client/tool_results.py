@@ -0,0 +1,140 @@
+import json
+from typing import Any, Optional
+
+# User-facing text per lookup tool; missing and null fields read "Unknown"
+TEMPLATES = {
+    "get_license_data": (
+        "myKadNumber: {myKadNumber}\n"
+        "Email: {email}\n"
+        "Phone: {phone}\n"
+        "Address: {address}\n"
+        "License Number: {licenseNumber}\n"
+        "License Type: {licenseType}\n"
+        "Expiry: {expiry}\n"
+        "Valid: {valid}\n"
+        "Digital: {digital}"
+    ),
+    "get_saman_data": (
+        "Summon ID: {summonId}\n"
+        "myKadNumber: {myKadNumber}\n"
+        "Offense: {offenseDetails}\n"
+        "Amount: {amount}\n"
+        "Issue Date: {issueDate}\n"
+        "Location: {location}\n"
+        "Status: {status}"
+    ),
+}
+NOT_FOUND = {
+    "get_license_data": "Couldn't find a license for MyKad {myKadNumber}.",
+    "get_saman_data": "Couldn't find a saman for MyKad {myKadNumber}.",
+}
+# ``found: null``: the server couldn't reach the records, which is not the same as no record
+UNAVAILABLE = {
+    "get_license_data": "License records for MyKad {myKadNumber} are unavailable right now; please try again later.",
+    "get_saman_data": "Saman records for MyKad {myKadNumber} are unavailable right now; please try again later.",
+}
+
+
+class _Fields(dict):
+    def __missing__(self, key: str) -> str:
+        return "Unknown"
+
+
+def _display(value: Any) -> str:
+    if value is None:
+        return "Unknown"
+    if isinstance(value, bool):
+        return "Yes" if value else "No"
+    return str(value)
+
+
+def text(result) -> str:
+    """Text blocks of a tool result joined; anything else stringified"""
+    return "\n".join(getattr(item, "text", None) or str(item) for item in result.content)
+
+
+def structured(result) -> Any:
+    """The tool's structured output, or None for text-only and failed results
+
+    FastMCP wraps non-object return values as ``{"result": value}``; those
+    come back unwrapped.
+    """
+    data = getattr(result, "structuredContent", None)
+    if data is None or getattr(result, "isError", False):
+        return None
+    if len(data) == 1 and "result" in data:
+        return data["result"]
+    return data
+
+
+def _lookup_states(result) -> list:
+    """``found`` of each record in a lookup or batch result; empty for anything else"""
+    data = structured(result)
+    if not isinstance(data, dict):
+        return []
+    records = data.get("results") if isinstance(data.get("results"), list) else [data]
+    return [record["found"] for record in records if isinstance(record, dict) and "found" in record]
+
+
+def unavailable(result) -> bool:
+    """True when a lookup (or any record of a batch) could not reach the records
+
+    Answers built from such a result are only true for now, so they must
+    not be cached or reused.
+    """
+    return any(found is None for found in _lookup_states(result))
+
+
+def not_found(result) -> bool:
+    """True when a lookup (or any record of a batch) found no record"""
+    return any(found is False for found in _lookup_states(result))
+
+
+def _without_nulls(value: Any) -> Any:
+    # ``found: null`` carries meaning (records unavailable), so it is kept
+    if isinstance(value, dict):
+        return {key: _without_nulls(item) for key, item in value.items() if item is not None or key == "found"}
+    if isinstance(value, list):
+        return [_without_nulls(item) for item in value]
+    return value
+
+
+def for_model(result) -> str:
+    """The smallest faithful encoding of a tool result for the model's tool message
+
+    Structured results become compact JSON without null fields, plain string
+    results are sent as-is, and anything else falls back to its text blocks.
+    """
+    data = structured(result)
+    if data is None:
+        return text(result)
+    if isinstance(data, str):
+        return data
+    return json.dumps(_without_nulls(data), separators=(",", ":"), ensure_ascii=False)
+
+
+def render_record(tool_name: str, record: dict) -> str:
+    if "found" in record and record["found"] is None:
+        return UNAVAILABLE[tool_name].format_map(_Fields(record))
+    if not record.get("found", True):
+        return NOT_FOUND[tool_name].format_map(_Fields(record))
+    return TEMPLATES[tool_name].format_map(_Fields({key: _display(value) for key, value in record.items()}))
+
+
+def render(tool_name: str, result) -> Optional[str]:
+    """User-facing text for a structured tool result, or None when no template applies
+
+    Batch tools (``<tool>_batch``) render each record with the single-lookup
+    template.
+    """
+    data = structured(result)
+    if isinstance(data, str):
+        return data
+    if not isinstance(data, dict):
+        return None
+    single = tool_name.removesuffix("_batch")
+    if single not in TEMPLATES:
+        return None
+    if single != tool_name:
+        return "\n\n".join(render_record(single, record) for record in data.get("results", []))
+    return render_record(tool_name, data)
@@ -0,0 +1,116 @@
+import os
+import time
+from collections import deque
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling an upstream whose breaker is open."""
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker over a rolling window of call outcomes.
+
+    The breaker opens once at least ``min_calls`` of the last ``window``
+    calls were recorded and the failure rate among them reaches
+    ``failure_rate``. While open every call fails fast. After
+    ``open_seconds`` up to ``half_open_probes`` calls are let through; a
+    successful probe closes the breaker, a failed one re-opens it.
+    """
+
+    def __init__(
+        self,
+        failure_rate: float = 0.5,
+        window: int = 20,
+        min_calls: int = 5,
+        open_seconds: float = 30.0,
+        half_open_probes: int = 1,
+    ):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self._outcomes: deque[bool] = deque(maxlen=window)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self.opened = 0
+        self.rejected = 0
+        self.successes = 0
+        self.failures = 0
+
+    @classmethod
+    def from_env(cls) -> "CircuitBreaker":
+        """Build a breaker from the BREAKER_* environment variables."""
+        return cls(
+            failure_rate=float(os.getenv("BREAKER_FAILURE_RATE", "0.5")),
+            window=int(os.getenv("BREAKER_WINDOW", "20")),
+            min_calls=int(os.getenv("BREAKER_MIN_CALLS", "5")),
+            open_seconds=float(os.getenv("BREAKER_OPEN_SECONDS", "30")),
+        )
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            return HALF_OPEN
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now; every allowed call must be recorded."""
+        if self._state == OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                self.rejected += 1
+                return False
+            self._state = HALF_OPEN
+            self._probes = 0
+        if self._state == HALF_OPEN:
+            if self._probes >= self.half_open_probes:
+                self.rejected += 1
+                return False
+            self._probes += 1
+        return True
+
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self.opened += 1
+
+    def record_success(self):
+        self.successes += 1
+        if self._state == HALF_OPEN:
+            self._state = CLOSED
+            self._outcomes.clear()
+            return
+        self._outcomes.append(True)
+
+    def record_failure(self):
+        self.failures += 1
+        if self._state == HALF_OPEN:
+            self._open()
+            return
+        self._outcomes.append(False)
+        if len(self._outcomes) >= self.min_calls:
+            failed = self._outcomes.count(False)
+            if failed / len(self._outcomes) >= self.failure_rate:
+                self._open()
+
+    def record_abandoned(self):
+        """An allowed call was cancelled before it had an outcome."""
+        if self._state == HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    def stats(self) -> dict:
+        """Counters suitable for metrics endpoints."""
+        recent = len(self._outcomes)
+        return {
+            "state": self.state,
+            "recent_failure_rate": round(self._outcomes.count(False) / recent, 4) if recent else 0.0,
+            "times_opened": self.opened,
+            "rejected": self.rejected,
+            "successes": self.successes,
+            "failures": self.failures,
+        }
@@ -0,0 +1,77 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+# Returned by TTLCache.get on a miss so cached ``None`` values stay usable
+MISSING = object()
+
+
+class TTLCache:
+    """Bounded in-process cache with LRU eviction and per-entry TTLs.
+
+    Entries may store ``None`` (negative caching); callers compare the
+    result of ``get`` against ``MISSING`` to tell a miss from a cached
+    ``None``. Expired entries stay until they are evicted or overwritten so
+    ``get_stale`` can still return them (stale-while-revalidate).
+    """
+
+    def __init__(self, max_size: int = 10_000, default_ttl: float = 300.0):
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Any:
+        """Return the cached value for ``key`` or ``MISSING``."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return MISSING
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self.expirations += 1
+            self.misses += 1
+            return MISSING
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def get_stale(self, key: Hashable) -> Any:
+        """Return the value for ``key`` even if it has expired, or ``MISSING``."""
+        entry = self._entries.get(key)
+        return MISSING if entry is None else entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None):
+        """Store ``value`` for ``ttl`` seconds, evicting the LRU entry if full."""
+        if ttl is None:
+            ttl = self.default_ttl
+        if ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        """Counters suitable for metrics endpoints."""
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
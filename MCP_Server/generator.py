@@ -0,0 +1,222 @@
+"""Local, seeded stand-in for the fakerapi.it custom endpoint.
+
+Field specs use the same ``{field: faker_type}`` shape as the upstream query
+string, so records carry the same schema whichever source produced them.
+Every faker type is drawn as a few bounded integers and rendered from them,
+which lets the single-record and bulk paths share one set of renderers. The
+bulk path renders whole columns at once: kinds with few distinct values by
+lookup in a table built from those renderers, and fixed-width text (phone
+numbers, timestamps) by assembling code points looked up from small tables
+into arrays of the same strings.
+"""
+import itertools
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Iterator
+
+try:
+    import numpy as np
+except ImportError:  # bulk mode falls back to the stdlib generator
+    np = None
+
+FIRST_NAMES = [
+    "ahmad", "nurul", "siti", "muhammad", "aisyah", "wei.ming", "mei.ling",
+    "kumar", "priya", "hafiz", "farah", "jason", "daniel", "aminah", "ravi", "li.hua",
+]
+LAST_NAMES = [
+    "abdullah", "ismail", "rahman", "tan", "lim", "wong", "lee", "raj",
+    "hassan", "othman", "chong", "nair", "yusof", "ong", "ibrahim", "ng",
+]
+STREETS = [
+    "Jalan Ampang", "Jalan Tun Razak", "Jalan Bukit Bintang", "Jalan Sultan Ismail",
+    "Jalan Ipoh", "Jalan Klang Lama", "Jalan Gasing", "Jalan SS2/24",
+    "Jalan Penang", "Jalan Tebrau", "Jalan Kuching", "Jalan Meru",
+]
+CITIES = [
+    "Kuala Lumpur", "Petaling Jaya", "Shah Alam", "George Town", "Johor Bahru",
+    "Ipoh", "Kuching", "Kota Kinabalu", "Melaka", "Seremban", "Kuantan", "Alor Setar",
+]
+EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+DATE_SPAN_SECONDS = 10 * 365 * 24 * 3600
+
+# faker type -> (upper bound of each integer draw, renderer taking those draws)
+FIELD_KINDS: dict[str, tuple[tuple[int, ...], Callable[..., Any]]] = {
+    "email": (
+        (len(FIRST_NAMES), len(LAST_NAMES), 100),
+        lambda first, last, n: f"{FIRST_NAMES[first]}.{LAST_NAMES[last]}{n}@example.my",
+    ),
+    "phone": ((10, 10_000_000), lambda prefix, n: f"+601{prefix}-{n:07d}"),
+    "streetAddress": ((200, len(STREETS)), lambda n, street: f"{n + 1}, {STREETS[street]}"),
+    "address": (
+        (200, len(STREETS), len(CITIES)),
+        lambda n, street, city: f"{n + 1}, {STREETS[street]}, {CITIES[city]}",
+    ),
+    "number": ((999_999,), lambda n: n + 1),
+    "dateTime": ((DATE_SPAN_SECONDS,), lambda s: (EPOCH + timedelta(seconds=s)).isoformat()),
+    "boolean": ((2,), lambda b: bool(b)),
+}
+
+
+# Kinds with at most this many distinct draws render by table lookup
+TABLE_MAX_SIZE = 100_000
+# Records rendered per column pass when iterating a batch
+RENDER_CHUNK = 65_536
+
+
+def _code_points(texts) -> Any:
+    """Equal-length strings as rows of UCS4 code points; see ``_as_text``."""
+    return np.array([[ord(c) for c in text] for text in texts], dtype=np.uint32)
+
+
+def _as_text(chars):
+    """View a matrix of code points as one str per row, without copying."""
+    return chars.view(f"U{chars.shape[1]}").ravel()
+
+
+def _code_table(name: str, texts: Callable[[], Iterator[str]]):
+    if name not in _tables:
+        _tables[name] = _code_points(texts())
+    return _tables[name]
+
+
+def _number_column(n):
+    return n + 1
+
+
+def _phone_column(prefix, n):
+    digits = _code_table("digits", lambda: (f"{i:04d}" for i in range(10_000)))
+    high, low = np.divmod(n, 10_000)
+    chars = np.empty((len(n), 13), dtype=np.uint32)
+    chars[:, :4] = _code_points(["+601"])
+    chars[:, 4] = prefix + ord("0")
+    chars[:, 5] = ord("-")
+    chars[:, 6:9] = digits.take(high, axis=0)[:, 1:]
+    chars[:, 9:] = digits.take(low, axis=0)
+    return _as_text(chars)
+
+
+def _date_time_column(seconds):
+    # A few thousand dates and one day of clock times, looked up as code points
+    dates = _code_table("dates", lambda: (
+        f"{EPOCH + timedelta(days=day):%Y-%m-%d}" for day in range(DATE_SPAN_SECONDS // 86400 + 1)
+    ))
+    times = _code_table("times", lambda: (
+        f"{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}" for s in range(86400)
+    ))
+    day, clock = np.divmod(seconds, 86400)
+    chars = np.empty((len(seconds), 25), dtype=np.uint32)
+    chars[:, :10] = dates.take(day, axis=0)
+    chars[:, 10] = ord("T")
+    chars[:, 11:19] = times.take(clock, axis=0)
+    chars[:, 19:] = _code_points(["+00:00"])
+    return _as_text(chars)
+
+
+# numpy renderers for kinds too large to tabulate; each matches its FIELD_KINDS renderer
+COLUMN_RENDERERS: dict[str, Callable[..., Any]] = {
+    "number": _number_column,
+    "phone": _phone_column,
+    "dateTime": _date_time_column,
+}
+_tables: dict[str, Any] = {}
+
+
+def _table(faker_type: str):
+    """Every rendered value of a small kind, indexed like ``np.ravel_multi_index``."""
+    if faker_type not in _tables:
+        bounds, render = FIELD_KINDS[faker_type]
+        table = np.empty(np.prod(bounds), dtype=object)
+        table[:] = [render(*draws) for draws in itertools.product(*map(range, bounds))]
+        _tables[faker_type] = table
+    return _tables[faker_type]
+
+
+def render_column(faker_type: str, draws: list):
+    """Render one field for a run of records from its integer draws.
+
+    Returns a numpy array when numpy is installed, otherwise a list.
+    """
+    bounds, render = _kind(faker_type)
+    if np is None:
+        return [render(*values) for values in zip(*draws)]
+    if faker_type in COLUMN_RENDERERS:
+        return COLUMN_RENDERERS[faker_type](*draws)
+    if np.prod(bounds) <= TABLE_MAX_SIZE:
+        return _table(faker_type)[np.ravel_multi_index(draws, bounds)]
+    return np.array([render(*values) for values in zip(*(column.tolist() for column in draws))], dtype=object)
+
+
+def _kind(faker_type: str) -> tuple[tuple[int, ...], Callable[..., Any]]:
+    if faker_type not in FIELD_KINDS:
+        raise ValueError(f"Unsupported faker type: {faker_type}")
+    return FIELD_KINDS[faker_type]
+
+
+def generate_record(seed: str, fields: dict[str, str]) -> dict[str, Any]:
+    """Generate one record for ``fields``; the same seed always gives the same record."""
+    rng = random.Random(seed)
+    record = {}
+    for field, faker_type in fields.items():
+        bounds, render = _kind(faker_type)
+        record[field] = render(*(rng.randrange(bound) for bound in bounds))
+    return record
+
+
+class RecordBatch:
+    """Columnar batch of generated records.
+
+    Columns hold the raw integer draws (numpy arrays when numpy is
+    installed). ``iter_columns`` renders them column by column in chunks of
+    RENDER_CHUNK records, which is the fast way to consume a batch;
+    iterating builds a dict per record from those chunks and ``record``
+    renders a single one.
+    """
+
+    def __init__(self, fields: dict[str, str], columns: dict[str, list], size: int):
+        self.fields = fields
+        self.columns = columns
+        self.size = size
+
+    def __len__(self) -> int:
+        return self.size
+
+    def record(self, index: int) -> dict[str, Any]:
+        record = {}
+        for field, faker_type in self.fields.items():
+            render = FIELD_KINDS[faker_type][1]
+            record[field] = render(*(int(draws[index]) for draws in self.columns[field]))
+        return record
+
+    def iter_columns(self) -> Iterator[dict[str, Any]]:
+        """Yield ``{field: rendered values}`` for each chunk of RENDER_CHUNK records."""
+        for start in range(0, self.size, RENDER_CHUNK):
+            stop = min(start + RENDER_CHUNK, self.size)
+            yield {
+                field: render_column(faker_type, [draws[start:stop] for draws in self.columns[field]])
+                for field, faker_type in self.fields.items()
+            }
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        names = list(self.fields)
+        for chunk in self.iter_columns():
+            rendered = [chunk[field] if np is None else chunk[field].tolist() for field in names]
+            yield from map(dict, map(zip, itertools.repeat(names), zip(*rendered)))
+
+
+def generate_bulk(fields: dict[str, str], count: int, seed: int = 0) -> RecordBatch:
+    """Draw ``count`` records for load tests in one vectorized pass.
+
+    With numpy, consuming the batch through ``iter_columns`` renders millions
+    of records per second; iterating it as one dict per record is several
+    times slower because building the dicts dominates.
+    """
+    columns = {}
+    if np is not None:
+        rng = np.random.default_rng(seed)
+        for field, faker_type in fields.items():
+            columns[field] = [rng.integers(0, bound, count) for bound in _kind(faker_type)[0]]
+    else:
+        rng = random.Random(seed)
+        for field, faker_type in fields.items():
+            columns[field] = [[rng.randrange(bound) for _ in range(count)] for bound in _kind(faker_type)[0]]
+    return RecordBatch(fields, columns, count)
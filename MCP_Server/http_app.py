@@ -0,0 +1,172 @@
+"""HTTP serving mode for the GovLink MCP server.
+
+One server can be shared by many API instances instead of each one spawning
+stdio children. It speaks two protocols:
+
+- ``GET /tools`` and ``POST /tools/{name}`` with ``{"arguments": {...}}`` is
+  the REST shape ``HTTPMCPTransport`` in the client uses. The budget comes
+  from an ``X-Request-Timeout-Ms`` header and the trace from ``traceparent``,
+  the same way stdio calls carry them in ``_meta``.
+- ``/mcp`` is streamable-HTTP MCP for any other MCP client. It runs
+  stateless, so a request can land on any worker.
+
+``run`` starts uvicorn with MCP_HTTP_WORKERS pre-forked workers. Every worker
+has its own in-memory cache but shares the on-disk record store. uvicorn
+drains in-flight requests for up to MCP_HTTP_GRACEFUL_SHUTDOWN seconds on
+SIGTERM before a restart.
+"""
+import contextlib
+import json
+import os
+import time
+
+import uvicorn
+from mcp import types
+from mcp.server.fastmcp.exceptions import ToolError
+from starlette.applications import Starlette
+from starlette.exceptions import HTTPException
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Mount, Route
+
+import mcp_server
+from mcp_server import mcp, tool_deadline
+from tracing import tracer
+
+# Tool arguments are a few MyKads; anything much larger is a mistake or abuse
+MAX_BODY_BYTES = int(os.getenv("MCP_HTTP_MAX_BODY_BYTES", str(1024 * 1024)))
+
+# Sessions would pin a client to one worker, and nothing here needs them
+mcp.settings.stateless_http = True
+mcp_app = mcp.streamable_http_app()
+
+_tool_names: set[str] | None = None
+
+
+class BodyLimit:
+    """Reject request bodies over ``max_bytes`` with 413, declared or streamed."""
+
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None:
+            try:
+                declared = int(length)
+            except ValueError:
+                response = JSONResponse({"detail": "Invalid Content-Length"}, status_code=400)
+                return await response(scope, receive, send)
+            if declared > self.max_bytes:
+                response = JSONResponse({"detail": "Request body too large"}, status_code=413)
+                return await response(scope, receive, send)
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise HTTPException(status_code=413, detail="Request body too large")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+async def tool_names() -> set[str]:
+    global _tool_names
+    if _tool_names is None:
+        _tool_names = {tool.name for tool in await mcp.list_tools()}
+    return _tool_names
+
+
+def dump(model) -> dict:
+    return model.model_dump(mode="json", by_alias=True, exclude_none=True)
+
+
+async def list_tools(request: Request) -> JSONResponse:
+    return JSONResponse({"tools": [dump(tool) for tool in await mcp.list_tools()]})
+
+
+async def call_tool(request: Request) -> JSONResponse:
+    """Run one tool and return an MCP ``CallToolResult``; tool failures come back with ``isError``."""
+    name = request.path_params["name"]
+    if name not in await tool_names():
+        return JSONResponse({"detail": f"Unknown tool: {name}"}, status_code=404)
+    try:
+        body = await request.json()
+    except ValueError:
+        return JSONResponse({"detail": "Body must be JSON"}, status_code=400)
+    arguments = body.get("arguments", {}) if isinstance(body, dict) else None
+    if not isinstance(arguments, dict):
+        return JSONResponse({"detail": "Body must be {\"arguments\": {...}}"}, status_code=400)
+
+    try:
+        timeout_ms = float(request.headers.get("x-request-timeout-ms", 0))
+    except ValueError:
+        timeout_ms = 0
+    if timeout_ms > 0:
+        # Each request runs in its own task, so this only bounds this call's lookups
+        tool_deadline.set(time.monotonic() + timeout_ms / 1000)
+
+    with tracer.span(f"POST /tools/{name}", kind="server", traceparent=request.headers.get("traceparent")):
+        try:
+            result = await mcp.call_tool(name, arguments)
+        except ToolError as e:
+            result = types.CallToolResult(content=[types.TextContent(type="text", text=str(e))], isError=True)
+            return JSONResponse(dump(result))
+    content, structured = result if isinstance(result, tuple) else (result, None)
+    return JSONResponse(dump(types.CallToolResult(content=list(content), structuredContent=structured)))
+
+
+async def health(request: Request) -> JSONResponse:
+    return JSONResponse({"status": "healthy", "pid": os.getpid()})
+
+
+async def stats(request: Request) -> JSONResponse:
+    """``stats://server`` of whichever worker answered, with that worker's ``worker_pid``."""
+    return JSONResponse({**json.loads(mcp_server.server_stats()), "worker_pid": os.getpid()})
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: Starlette):
+    async with mcp_server.lifespan(), mcp.session_manager.run():
+        yield
+
+
+app = Starlette(
+    routes=[
+        Route("/health", health),
+        Route("/stats", stats),
+        Route("/tools", list_tools),
+        Route("/tools/{name}", call_tool, methods=["POST"]),
+        Mount("/", app=mcp_app),
+    ],
+    lifespan=lifespan,
+)
+app.add_middleware(BodyLimit, max_bytes=MAX_BODY_BYTES)
+
+
+def run():
+    """Serve ``app`` on MCP_HTTP_HOST:MCP_HTTP_PORT with MCP_HTTP_WORKERS processes."""
+    uvicorn.run(
+        "http_app:app",
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
+        host=os.getenv("MCP_HTTP_HOST", "0.0.0.0"),
+        port=int(os.getenv("MCP_HTTP_PORT", "8000")),
+        workers=int(os.getenv("MCP_HTTP_WORKERS", str(min(4, os.cpu_count() or 1)))),
+        # Above the client's connection pool expiry, so the client closes idle connections first
+        timeout_keep_alive=int(os.getenv("MCP_HTTP_KEEPALIVE", "75")),
+        timeout_graceful_shutdown=int(os.getenv("MCP_HTTP_GRACEFUL_SHUTDOWN", "30")),
+        # Beyond this many open connections a worker answers 503 instead of queueing
+        limit_concurrency=int(os.getenv("MCP_HTTP_MAX_CONNECTIONS", "0")) or None,
+        access_log=False,
+    )
+
+
+if __name__ == "__main__":
+    run()
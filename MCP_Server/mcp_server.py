@@ -1,25 +1,380 @@
+import asyncio
+import contextlib
+import functools
+import json
+import os
 import random
+import re
+import time
+from contextvars import ContextVar
 from typing import Any
-import httpx
 from mcp.server.fastmcp import FastMCP
+# pydantic only builds schemas from typing.TypedDict on Python 3.12+
+from typing_extensions import NotRequired, TypedDict
 from datetime import datetime
 
+from breaker import CircuitBreaker, CircuitOpen
+from cache import MISSING, TTLCache
+from generator import generate_record
+from singleflight import SingleFlight
+from store import RecordStore
+from timing import LatencyHistogram, timed, tool_latency
+from tracing import tracer
+from upstream import UpstreamClient
+
 # Initialize FastMCP server
 mcp = FastMCP("GovLink")
+tracer.name_service("govlink-mcp-server")
 
 # Constants
 USER_AGENT = "gov-link/1.0"
 FAKER_SAMAN = "https://fakerapi.it/api/v2/custom?_seed=500&_quantity=1&email=email&phoneNumber=phone&address=address&licenseNumber=number&expiryDate=dateTime&isDigital=boolean"
+FAKER_API_URL = os.getenv("FAKER_API_URL", "https://fakerapi.it/api/v2/custom")
+# "remote" fetches from FAKER_API_URL, "local" generates records in-process (air-gapped)
+RECORD_SOURCE = os.getenv("RECORD_SOURCE", "remote")
+
+# Faker field specs per lookup tool, shared by the remote URL and the local generator
+RECORD_FIELDS = {
+    "get_license_data": {
+        "email": "email",
+        "phoneNumber": "phone",
+        "address": "streetAddress",
+        "licenseNumber": "number",
+        "expiryDate": "dateTime",
+        "isDigital": "boolean",
+    },
+    "get_saman_data": {
+        "summonId": "number",
+        "amount": "number",
+        "issueDate": "dateTime",
+        "location": "streetAddress",
+    },
+}
+
+# One pooled client for the lifetime of the server, closed in main()
+upstream = UpstreamClient.from_env(headers={"User-Agent": USER_AGENT})
+
+# Upstream records are seeded by MyKad, so identical lookups can be served locally
+record_cache = TTLCache(max_size=int(os.getenv("CACHE_MAX_SIZE", "10000")))
+CACHE_TTLS = {
+    "get_license_data": float(os.getenv("CACHE_TTL_LICENSE", "3600")),
+    "get_saman_data": float(os.getenv("CACHE_TTL_SAMAN", "300")),
+}
+CACHE_NEGATIVE_TTL = float(os.getenv("CACHE_NEGATIVE_TTL", "30"))
+
+# Upstream records persisted under the server directory so restarts start warm;
+# RECORD_STORE_PATH="" keeps everything in memory
+record_store = RecordStore.from_env(os.path.join(os.path.dirname(os.path.abspath(__file__)), "records.db"))
+
+# Concurrent lookups of the same URL share a single upstream request
+upstream_flights = SingleFlight()
+
+# Fail fast while the upstream is down instead of waiting out its timeout on every lookup
+upstream_breaker = CircuitBreaker.from_env()
+# Latency of requests that actually reached the upstream
+upstream_latency = LatencyHistogram()
+# Background refreshes of stale records, keyed by (tool, mykad)
+revalidating: dict[tuple[str, str], asyncio.Task] = {}
+swr_stats = {"stale_served": 0, "refreshes": 0, "refresh_failures": 0, "fast_failed": 0}
+
+# Batch tools look up at most BATCH_MAX_SIZE MyKads, BATCH_CONCURRENCY at a time
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "100"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
+class RecordUnavailable(Exception):
+    """The upstream could not be asked (down, breaker open or no time left), so the answer is unknown."""
+
+# FastMCP serializes absent NotRequired keys as null, so every optional field must allow it
+class LicenseRecord(TypedDict):
+    """A licence lookup; only ``myKadNumber`` and ``found`` when there is no licence.
+
+    ``found`` is None, with the reason in ``error``, when the records could
+    not be reached; that says nothing about whether a licence exists.
+    """
+    myKadNumber: str
+    found: bool | None
+    error: NotRequired[str | None]
+    email: NotRequired[str | None]
+    phone: NotRequired[str | None]
+    address: NotRequired[str | None]
+    licenseNumber: NotRequired[int | str | None]
+    licenseType: NotRequired[str | None]
+    expiry: NotRequired[str | None]
+    valid: NotRequired[bool | None]
+    digital: NotRequired[bool | None]
+
+class SamanRecord(TypedDict):
+    """A summons lookup; only ``myKadNumber`` and ``found`` when there is no summons.
+
+    As for LicenseRecord, ``found: None`` means the records could not be reached.
+    """
+    myKadNumber: str
+    found: bool | None
+    error: NotRequired[str | None]
+    summonId: NotRequired[int | str | None]
+    offenseDetails: NotRequired[str | None]
+    amount: NotRequired[int | float | str | None]
+    issueDate: NotRequired[str | None]
+    location: NotRequired[str | None]
+    status: NotRequired[str | None]
+    paidDate: NotRequired[str | None]
+
+class LicenseBatch(TypedDict):
+    requested: int
+    found: int
+    unavailable: int
+    results: list[LicenseRecord]
+
+class SamanBatch(TypedDict):
+    requested: int
+    found: int
+    unavailable: int
+    results: list[SamanRecord]
+
+# Absolute time.monotonic() deadline of the tool call being served, if the client sent one
+tool_deadline: ContextVar[float | None] = ContextVar("tool_deadline", default=None)
 
-async def make_faker_request(url: str) -> dict[str, Any] | None:
-    """Make a request to the Faker API with proper error handling."""
-    async with httpx.AsyncClient() as client:
+def request_meta():
+    """``_meta`` of the MCP request being served, or None outside a request."""
+    try:
+        return mcp.get_context().request_context.meta
+    except (LookupError, ValueError):
+        return None
+
+def start_deadline() -> float | None:
+    """Deadline for the current tool call, from the client's ``_meta.timeoutMs`` budget.
+
+    Read once per call; tools that fan out call this before spawning tasks
+    so every lookup shares the same deadline.
+    """
+    deadline = tool_deadline.get()
+    if deadline is None:
+        timeout_ms = getattr(request_meta(), "timeoutMs", None)
+        if timeout_ms:
+            deadline = time.monotonic() + timeout_ms / 1000
+            tool_deadline.set(deadline)
+    return deadline
+
+def traced(fn):
+    """Run a tool in a server span that continues the client's trace from ``_meta.traceparent``."""
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        traceparent = getattr(request_meta(), "traceparent", None)
+        with tracer.span(f"tool {fn.__name__}", kind="server", traceparent=traceparent):
+            return await fn(*args, **kwargs)
+    return wrapper
+
+async def _get_faker_json(url: str, timeout: float | None = None) -> dict[str, Any]:
+    # The query string carries the MyKad seed, so only the endpoint goes in the span
+    with tracer.span("upstream GET", kind="client", endpoint=url.split("?", 1)[0]) as span:
+        if not upstream_breaker.allow():
+            span.set_attribute("breaker.state", upstream_breaker.state)
+            raise CircuitOpen(f"Upstream circuit is open for {url}")
+        start = time.perf_counter()
         try:
-            response = await client.get(url, timeout=30.0)
-            response.raise_for_status()
-            return response.json()
+            # Covers the wait for a per-host slot as well as the request itself
+            data = await asyncio.wait_for(upstream.get_json(url, timeout=timeout), timeout)
+        except asyncio.CancelledError:
+            upstream_breaker.record_abandoned()
+            raise
         except Exception:
-            return None
+            upstream_breaker.record_failure()
+            upstream_latency.errors += 1
+            raise
+        finally:
+            upstream_latency.observe(time.perf_counter() - start)
+        upstream_breaker.record_success()
+        return data
+
+async def make_faker_request(url: str, timeout: float | None = None) -> dict[str, Any]:
+    """Make a request to the Faker API through the circuit breaker.
+
+    Raises CircuitOpen without touching the network while the breaker is
+    open, and the underlying error when the request fails.
+    """
+    return await upstream_flights.do(url, lambda: _get_faker_json(url, timeout))
+
+def faker_url(mykad: str, fields: dict[str, str]) -> str:
+    """Build the seeded Faker API URL for one record with the given fields."""
+    field_params = "&".join(f"{field}={faker_type}" for field, faker_type in fields.items())
+    return f"{FAKER_API_URL}?_seed={mykad}&_quantity=1&{field_params}"
+
+def normalize_mykad(mykad: str) -> str:
+    """Strip the dashes and whitespace users commonly type in MyKad numbers."""
+    return re.sub(r"[\s-]", "", mykad)
+
+def last_known_record(tool: str, mykad: str) -> tuple[dict[str, Any], float | None] | None:
+    """Most recent record for a lookup, even if expired, with its age when known."""
+    record = record_cache.get_stale((tool, mykad))
+    if record is not MISSING and record is not None:
+        return record, None
+    if record_store is not None:
+        return record_store.get(tool, mykad)
+    return None
+
+async def refresh_record(tool: str, mykad: str, timeout: float | None = None) -> dict[str, Any] | None:
+    """Fetch a record from upstream and write it to the cache and record store.
+
+    Returns None for a genuine miss (cached for CACHE_NEGATIVE_TTL seconds so
+    unknown MyKads don't keep hitting the upstream); upstream failures and an
+    open breaker raise instead and are never cached.
+    """
+    data = await make_faker_request(faker_url(mykad, RECORD_FIELDS[tool]), timeout)
+    record = data["data"][0] if data and "data" in data and len(data["data"]) > 0 else None
+    if record is not None and record_store is not None:
+        record_store.put(tool, mykad, record)
+    record_cache.set((tool, mykad), record, CACHE_TTLS[tool] if record is not None else CACHE_NEGATIVE_TTL)
+    return record
+
+async def _revalidate(tool: str, mykad: str):
+    # Runs in its own task (a copy of the caller's context), so this doesn't touch the caller
+    tool_deadline.set(None)
+    try:
+        with tracer.span("revalidate", tool=tool):
+            await refresh_record(tool, mykad)
+    except Exception:
+        swr_stats["refresh_failures"] += 1
+    finally:
+        revalidating.pop((tool, mykad), None)
+
+def start_revalidation(tool: str, mykad: str):
+    """Refresh a stale record in the background, at most once per lookup at a time."""
+    key = (tool, mykad)
+    if key in revalidating:
+        return
+    swr_stats["refreshes"] += 1
+    revalidating[key] = asyncio.create_task(_revalidate(tool, mykad))
+
+async def fetch_record(tool: str, mykad: str) -> dict[str, Any] | None:
+    """Fetch the first upstream record for a lookup, served from cache when fresh.
+
+    The in-memory cache is checked first, then the on-disk record store. A
+    known record past its TTL is returned straight away and refreshed in the
+    background (stale-while-revalidate); with nothing known the upstream is
+    asked directly, within whatever is left of the caller's deadline. When
+    the upstream fails, its breaker is open or the deadline has passed this
+    raises RecordUnavailable rather than reporting the record as missing.
+    With RECORD_SOURCE=local the record is generated in-process and the
+    network is never touched.
+    """
+    if RECORD_SOURCE == "local":
+        return generate_record(mykad, RECORD_FIELDS[tool])
+    key = (tool, mykad)
+    record = record_cache.get(key)
+    if record is not MISSING:
+        return record
+    known = last_known_record(tool, mykad)
+    if known is not None:
+        record, age = known
+        if age is not None and age < CACHE_TTLS[tool]:
+            record_cache.set(key, record, CACHE_TTLS[tool] - age)
+            return record
+        swr_stats["stale_served"] += 1
+        start_revalidation(tool, mykad)
+        return record
+
+    deadline = start_deadline()
+    timeout = None
+    if deadline is not None:
+        timeout = deadline - time.monotonic()
+        if timeout <= 0:
+            raise RecordUnavailable("the request deadline has passed")
+    try:
+        return await refresh_record(tool, mykad, timeout)
+    except CircuitOpen as e:
+        swr_stats["fast_failed"] += 1
+        raise RecordUnavailable("the record service is temporarily unavailable") from e
+    except Exception as e:
+        raise RecordUnavailable("the record service did not respond") from e
+
+def license_details(mykad: str, license: dict[str, Any]) -> LicenseRecord:
+    """Licence fields shown to users, including the derived type and validity."""
+    licenseType = ["LDL", "PDL", "CDL"]
+    try:
+        mykad_int = int(mykad)
+        randomLicense = licenseType[mykad_int % len(licenseType)]
+    except ValueError:
+        randomLicense = "LDL"  # Default license type
+    expiry_str = license.get('expiryDate', '')
+    try:
+        expiry_date = datetime.fromisoformat(expiry_str.replace('Z', '+00:00'))
+        is_valid = expiry_date > datetime.now(expiry_date.tzinfo)
+    except Exception:
+        is_valid = False
+    return {
+        "myKadNumber": mykad,
+        "found": True,
+        "email": license.get('email'),
+        "phone": license.get('phoneNumber'),
+        "address": license.get('address'),
+        "licenseNumber": license.get('licenseNumber'),
+        "licenseType": randomLicense,
+        "expiry": license.get('expiryDate'),
+        "valid": is_valid,
+        "digital": license.get('isDigital'),
+    }
+
+def saman_details(mykad: str, saman: dict[str, Any]) -> SamanRecord:
+    """Saman fields shown to users, including the offense derived from the MyKad."""
+    offenses = [
+        "Speeding in a residential area",
+        "Parking in a non-designated zone",
+        "Failure to display valid road tax sticker",
+        "Running a red light",
+        "Using a mobile phone while driving",
+        "Not wearing a seatbelt",
+        "Driving without a valid license",
+    ]
+    # Seeded per call rather than globally so concurrent lookups can't interleave
+    offense = random.Random(mykad).choice(offenses)
+    return {
+        "myKadNumber": mykad,
+        "found": True,
+        "summonId": saman.get('summonId'),
+        "offenseDetails": offense,
+        "amount": saman.get('amount'),
+        "issueDate": saman.get('issueDate'),
+        "location": saman.get('location'),
+        "status": "Pending",
+        "paidDate": None,
+    }
+
+async def lookup_record(tool: str, mykad: str, details) -> dict[str, Any]:
+    """One lookup as its structured record, ``found: false`` when there is none.
+
+    ``found: None`` with an ``error`` means the upstream could not be asked.
+    """
+    try:
+        record = await fetch_record(tool, mykad)
+    except RecordUnavailable as e:
+        return {"myKadNumber": mykad, "found": None, "error": str(e)}
+    if record is None:
+        return {"myKadNumber": mykad, "found": False}
+    return details(mykad, record)
+
+async def lookup_batch(tool: str, mykads: list[str], details) -> dict[str, Any]:
+    """Look up many MyKads concurrently and return their records in one result.
+
+    Duplicates (after normalization) are looked up once; every lookup goes
+    through fetch_record, so the caches and record store apply as usual.
+    """
+    unique = list(dict.fromkeys(normalize_mykad(mykad) for mykad in mykads))
+    if len(unique) > BATCH_MAX_SIZE:
+        raise ValueError(f"At most {BATCH_MAX_SIZE} MyKad numbers per call, got {len(unique)}")
+    start_deadline()
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def lookup(mykad: str) -> dict[str, Any]:
+        async with semaphore:
+            return await lookup_record(tool, mykad, details)
+
+    results = await asyncio.gather(*(lookup(mykad) for mykad in unique))
+    return {
+        "requested": len(unique),
+        "found": sum(1 for result in results if result["found"]),
+        "unavailable": sum(1 for result in results if result["found"] is None),
+        "results": results,
+    }
 
 def format_alert(feature: dict) -> str:
     """Format an alert feature into a readable string."""
@@ -32,84 +387,67 @@ Description: {props.get('description', 'No description available')}
 Instructions: {props.get('instruction', 'No specific instructions provided')}
 """
 
-@mcp.tool(description="Retrieve driving license information for a Malaysian citizen using their MyKad number")
-async def get_license_data(mykad: str) -> str:
+@mcp.tool(description="Retrieve driving license information for a Malaysian citizen using their MyKad number. found=false means there is no licence on record; never make one up. found=null means the records could not be reached: say so and suggest trying again later, never that there is no licence")
+@traced
+@timed
+async def get_license_data(mykad: str) -> LicenseRecord:
     """Get driving license data for a Malaysian citizen.
     
     Args:
         mykad: Malaysian Identity Card (MyKad) number
         
     Returns:
-        Formatted string containing license details including validity status
-    """
-    url = f"https://fakerapi.it/api/v2/custom?_seed={mykad}&_quantity=1&email=email&phoneNumber=phone&address=streetAddress&licenseNumber=number&expiryDate=dateTime&isDigital=boolean"
-    data = await make_faker_request(url)
-    if data and "data" in data and len(data["data"]) > 0:
-        license = data["data"][0]
-        licenseType = ["LDL", "PDL", "CDL"]
-        try:
-            mykad_int = int(mykad)
-            randomLicense = licenseType[mykad_int % len(licenseType)]
-        except ValueError:
-            randomLicense = "LDL"  # Default license type
-        # Format the saman data as a readable string
-        expiry_str = license.get('expiryDate', '')
-        try:
-            expiry_date = datetime.fromisoformat(expiry_str.replace('Z', '+00:00'))
-            is_valid = expiry_date > datetime.now(expiry_date.tzinfo)
-        except Exception:
-            is_valid = False
-
-        return f"""
-    myKadNumber: {mykad} 
-    Email: {license.get('email', 'Unknown')}
-    Phone: {license.get('phoneNumber', 'Unknown')}
-    Address: {license.get('address', 'Unknown')}
-    License Number: {license.get('licenseNumber', 'Unknown')}
-    License Type: {randomLicense}\nExpiry: {license.get('expiryDate', 'Unknown')}
-    Status: {'TRUE' if is_valid else 'FALSE'}
-    Digital: {license.get('isDigital', 'Unknown')}
+        The licence record including type and validity, ``found: false``
+        when there is none, or ``found: None`` when the records are unavailable
     """
-    return "Couldnt find a license, DO NOT create a random one just say you cant find one"
+    return await lookup_record("get_license_data", normalize_mykad(mykad), license_details)
 
-@mcp.tool(description="Retrieve traffic summons (saman) records for a Malaysian citizen using their MyKad number")
-async def get_saman_data(mykad: str) -> str:
+@mcp.tool(description="Retrieve traffic summons (saman) records for a Malaysian citizen using their MyKad number. found=false means there is no summons on record. found=null means the records could not be reached: say so and suggest trying again later, never that there are no summonses")
+@traced
+@timed
+async def get_saman_data(mykad: str) -> SamanRecord:
     """Get traffic summons data for a Malaysian citizen.
     
     Args:
         mykad: Malaysian Identity Card (MyKad) number
         
     Returns:
-        Formatted string containing summons details including amount and offense
+        The summons record including amount and offense, ``found: false``
+        when there is none, or ``found: None`` when the records are unavailable
     """
-    random.seed(mykad)
-    url = f"https://fakerapi.it/api/v2/custom?_seed={mykad}&_quantity=1&summonId=number&amount=number&issueDate=dateTime&location=streetAddress"
-    data = await make_faker_request(url)
-    if data and "data" in data and len(data["data"]) > 0:
-        saman = data["data"][0]
-        offenses = [
-            "Speeding in a residential area",
-            "Parking in a non-designated zone",
-            "Failure to display valid road tax sticker",
-            "Running a red light",
-            "Using a mobile phone while driving",
-            "Not wearing a seatbelt",
-            "Driving without a valid license",
-        ]
-        offense = random.choice(offenses)
-        # Format the saman data as a readable string
-        return f"""summonId: {saman.get('summonId', 'Unknown')}
-myKadNumber: {mykad}
-offenseDetails: {offense}
-amount: {saman.get('amount', 'Unknown')}
-issueDate: {saman.get('issueDate', 'Unknown')}
-location: {saman.get('location', 'Unknown')}
-status: Pending
-paidDate: None
-"""
-    return "Couldn't find a saman"
+    return await lookup_record("get_saman_data", normalize_mykad(mykad), saman_details)
+
+@mcp.tool(description="Retrieve driving license information for several Malaysian citizens at once using a list of MyKad numbers. As for get_license_data, found=null means that record could not be reached")
+@traced
+@timed
+async def get_license_data_batch(mykads: list[str]) -> LicenseBatch:
+    """Get driving license data for many MyKad numbers in one call.
+
+    Args:
+        mykads: Malaysian Identity Card (MyKad) numbers; duplicates are looked up once
+
+    Returns:
+        One record per distinct MyKad (``found: false`` when missing, ``None`` when unavailable)
+    """
+    return await lookup_batch("get_license_data", mykads, license_details)
+
+@mcp.tool(description="Retrieve traffic summons (saman) records for several Malaysian citizens at once using a list of MyKad numbers. As for get_saman_data, found=null means that record could not be reached")
+@traced
+@timed
+async def get_saman_data_batch(mykads: list[str]) -> SamanBatch:
+    """Get traffic summons data for many MyKad numbers in one call.
+
+    Args:
+        mykads: Malaysian Identity Card (MyKad) numbers; duplicates are looked up once
+
+    Returns:
+        One record per distinct MyKad (``found: false`` when missing, ``None`` when unavailable)
+    """
+    return await lookup_batch("get_saman_data", mykads, saman_details)
 
 @mcp.tool(description="Get information about how to pay traffic summons online")
+@traced
+@timed
 async def pay_saman() -> str:
     """Provide instructions for paying traffic summons.
     
@@ -119,6 +457,8 @@ async def pay_saman() -> str:
     return "To pay your traffic summons, you can visit the official government website at https://www.myeg.com.my/services/jpj or use the MyEG app for a convenient online payment option or visit the nearest JPJ office."
 
 @mcp.tool(description="Get information about renewing a Malaysian driving license")
+@traced
+@timed
 async def renew_license() -> str:
     """Provide instructions for renewing a driving license.
     
@@ -128,6 +468,48 @@ async def renew_license() -> str:
     return "Visit the nearest JPJ office or use the MyJPJ app to renew your driving license. Alternatively, you can visit this website https://www.myeg.com.my/services/jpj"
     
 
+@mcp.resource("stats://server", mime_type="application/json")
+def server_stats() -> str:
+    """Cache, upstream and tool latency counters for the client's metrics endpoints."""
+    return json.dumps({
+        "record_cache": record_cache.stats(),
+        "upstream_requests": upstream_flights.stats(),
+        "record_store": record_store.stats() if record_store is not None else None,
+        "upstream_breaker": upstream_breaker.stats(),
+        "stale_while_revalidate": {**swr_stats, "in_progress": len(revalidating)},
+        "tool_latency": {tool: histogram.snapshot() for tool, histogram in tool_latency.items()},
+        "upstream_latency": upstream_latency.snapshot(),
+        "tracing": tracer.stats(),
+    })
+
+@contextlib.asynccontextmanager
+async def lifespan():
+    """Open the record store and trace flusher; flush both and release the upstream pool on exit."""
+    if record_store is not None:
+        record_store.open()
+    trace_flusher = asyncio.create_task(tracer.flush_periodically())
+    try:
+        yield
+    finally:
+        trace_flusher.cancel()
+        tracer.flush()
+        if record_store is not None:
+            await record_store.close()
+        await upstream.aclose()
+
+async def serve():
+    """Run the stdio server."""
+    async with lifespan():
+        await mcp.run_stdio_async()
+
+def main():
+    # "stdio" for a child of the client, "http" for a shared multi-worker server (see http_app.py)
+    if os.getenv("MCP_TRANSPORT", "stdio") == "http":
+        import http_app
+        http_app.run()
+    else:
+        asyncio.run(serve())
+
 if __name__ == "__main__":
     # Initialize and run the server
-    mcp.run(transport='stdio')
\ No newline at end of file
+    main()
@@ -0,0 +1,182 @@
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import time
+from typing import Any
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    tool TEXT NOT NULL,
+    mykad TEXT NOT NULL,
+    record TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (tool, mykad)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS records_fetched_at ON records (fetched_at);
+"""
+
+
+class RecordStore:
+    """SQLite-backed record store that survives server restarts.
+
+    Lookups are primary-key reads on the event loop thread (a few
+    microseconds on local disk). Fresh upstream records are buffered by
+    ``put`` and written behind in batches on a worker thread, so a slow
+    disk never delays a tool call. Compaction drops records older than
+    ``max_age`` and trims the table to ``max_records``, oldest first.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_records: int = 100_000,
+        max_age: float = 86400.0,
+        flush_interval: float = 1.0,
+        flush_batch: int = 256,
+        compact_interval: float = 600.0,
+    ):
+        self.path = path
+        self.max_records = max_records
+        self.max_age = max_age
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.compact_interval = compact_interval
+        self._reader: sqlite3.Connection | None = None
+        self._writer: sqlite3.Connection | None = None
+        self._pending: dict[tuple[str, str], tuple[str, float]] = {}
+        self._wake = asyncio.Event()
+        self._flusher: asyncio.Task | None = None
+        self._last_compaction = time.time()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.compactions = 0
+        self.errors = 0
+
+    @classmethod
+    def from_env(cls, default_path: str) -> "RecordStore | None":
+        """Build a store from RECORD_STORE_* variables; an empty path disables it."""
+        path = os.getenv("RECORD_STORE_PATH", default_path)
+        if not path:
+            return None
+        return cls(
+            path,
+            max_records=int(os.getenv("RECORD_STORE_MAX_RECORDS", "100000")),
+            max_age=float(os.getenv("RECORD_STORE_MAX_AGE", "86400")),
+            flush_interval=float(os.getenv("RECORD_STORE_FLUSH_INTERVAL", "1.0")),
+        )
+
+    def open(self):
+        """Open (creating if needed) the database and start the write-behind task."""
+        writer = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        # Set before the first table exists so deleted pages can be returned to the OS
+        writer.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        writer.execute("PRAGMA journal_mode = WAL")
+        writer.execute("PRAGMA synchronous = NORMAL")
+        writer.executescript(SCHEMA)
+        self._writer = writer
+        # WAL lets the reader keep serving lookups while a batch is being written
+        self._reader = sqlite3.connect(self.path, isolation_level=None)
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    def get(self, tool: str, mykad: str) -> tuple[dict[str, Any], float] | None:
+        """Return ``(record, age_seconds)`` for a stored lookup, or None."""
+        pending = self._pending.get((tool, mykad))
+        if pending is not None:
+            encoded, fetched_at = pending
+        else:
+            try:
+                row = self._reader.execute(
+                    "SELECT record, fetched_at FROM records WHERE tool = ? AND mykad = ?", (tool, mykad)
+                ).fetchone()
+            except sqlite3.Error:
+                self.errors += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            encoded, fetched_at = row
+        age = time.time() - fetched_at
+        if age > self.max_age:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(encoded), age
+
+    def put(self, tool: str, mykad: str, record: dict[str, Any]):
+        """Queue a fresh record for the next write-behind batch."""
+        self._pending[(tool, mykad)] = (json.dumps(record), time.time())
+        if len(self._pending) >= self.flush_batch:
+            self._wake.set()
+
+    def _write(self, batch: list[tuple[str, str, str, float]], compact: bool):
+        with self._writer:
+            self._writer.executemany(
+                "INSERT OR REPLACE INTO records (tool, mykad, record, fetched_at) VALUES (?, ?, ?, ?)", batch
+            )
+        if compact:
+            with self._writer:
+                self._writer.execute("DELETE FROM records WHERE fetched_at < ?", (time.time() - self.max_age,))
+                # Bounded size: keep only the newest max_records rows
+                self._writer.execute(
+                    "DELETE FROM records WHERE fetched_at < ("
+                    "SELECT fetched_at FROM records ORDER BY fetched_at DESC LIMIT 1 OFFSET ?)",
+                    (self.max_records - 1,),
+                )
+            self._writer.execute("PRAGMA incremental_vacuum")
+            self._writer.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    async def flush(self, compact: bool = False):
+        """Write every queued record to disk (and compact if asked)."""
+        batch = [(tool, mykad, encoded, fetched_at) for (tool, mykad), (encoded, fetched_at) in self._pending.items()]
+        self._pending.clear()
+        if not batch and not compact:
+            return
+        try:
+            await asyncio.to_thread(self._write, batch, compact)
+            self.writes += len(batch)
+            if compact:
+                self.compactions += 1
+                self._last_compaction = time.time()
+        except sqlite3.Error as e:
+            self.errors += 1
+            # stdout is the JSON-RPC channel when the server runs over stdio
+            print(f"Record store write failed: {e}", file=sys.stderr)
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush(compact=time.time() - self._last_compaction >= self.compact_interval)
+
+    async def close(self):
+        """Stop the write-behind task, flush what is queued and close the database."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        if self._writer is not None:
+            await self.flush()
+            self._writer.close()
+            self._reader.close()
+            self._writer = self._reader = None
+
+    def stats(self) -> dict[str, Any]:
+        """Counters suitable for metrics endpoints."""
+        return {
+            "path": self.path,
+            "hits": self.hits,
+            "misses": self.misses,
+            "pending_writes": len(self._pending),
+            "writes": self.writes,
+            "compactions": self.compactions,
+            "errors": self.errors,
+        }
@@ -0,0 +1,60 @@
+import functools
+import time
+from bisect import bisect_left
+
+# Seconds; from an in-memory cache hit up to a slow upstream lookup
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.2, 0.3, 0.5, 0.75,
+    1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram, cheap enough to update on every call.
+
+    ``snapshot`` returns per-bucket (non-cumulative) counts with a final
+    overflow bucket, which the client turns into Prometheus histograms.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.errors = 0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+
+    def snapshot(self) -> dict:
+        return {
+            "buckets": list(self.buckets),
+            "counts": list(self.counts),
+            "sum": round(self.sum, 6),
+            "errors": self.errors,
+        }
+
+
+# Per-tool call latency, filled in by ``timed``
+tool_latency: dict[str, LatencyHistogram] = {}
+
+
+def timed(fn):
+    """Record the latency and failures of an async tool under its function name.
+
+    Apply below ``@mcp.tool`` so FastMCP still sees the original signature.
+    """
+    histogram = tool_latency.setdefault(fn.__name__, LatencyHistogram())
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await fn(*args, **kwargs)
+        except BaseException:
+            histogram.errors += 1
+            raise
+        finally:
+            histogram.observe(time.perf_counter() - start)
+
+    return wrapper
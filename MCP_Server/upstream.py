@@ -0,0 +1,85 @@
+import asyncio
+import os
+from importlib.util import find_spec
+from typing import Any
+from urllib.parse import urlsplit
+
+import httpx
+
+
+class UpstreamClient:
+    """Long-lived, pooled HTTP client shared by every tool call.
+
+    One ``httpx.AsyncClient`` is created lazily and reused so keep-alive
+    connections (and HTTP/2 streams when ``h2`` is installed) survive across
+    tool calls. A semaphore per upstream host caps how many requests are in
+    flight against it at once.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        per_host_limit: int = 10,
+        http2: bool = True,
+        timeout: float = 30.0,
+        headers: dict[str, str] | None = None,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.per_host_limit = per_host_limit
+        # HTTP/2 needs the optional h2 package; fall back to HTTP/1.1 keep-alive
+        self.http2 = http2 and find_spec("h2") is not None
+        self.timeout = timeout
+        self.headers = headers or {}
+        self._client: httpx.AsyncClient | None = None
+        self._host_limits: dict[str, asyncio.Semaphore] = {}
+
+    @classmethod
+    def from_env(cls, headers: dict[str, str] | None = None) -> "UpstreamClient":
+        """Build a client from the UPSTREAM_* environment variables."""
+        return cls(
+            max_connections=int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "20")),
+            keepalive_expiry=float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "30")),
+            per_host_limit=int(os.getenv("UPSTREAM_PER_HOST_LIMIT", "10")),
+            http2=os.getenv("UPSTREAM_HTTP2", "1") == "1",
+            timeout=float(os.getenv("UPSTREAM_TIMEOUT", "30")),
+            headers=headers,
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The shared ``httpx.AsyncClient``, created on first use."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                limits=self.limits,
+                http2=self.http2,
+                timeout=self.timeout,
+                headers=self.headers,
+            )
+        return self._client
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._host_limits[host]
+
+    async def get_json(self, url: str, timeout: float | None = None) -> Any:
+        """GET ``url`` and decode the JSON body, raising on HTTP errors."""
+        async with self._host_limit(url):
+            response = await self.client.get(url, timeout=timeout or self.timeout)
+            response.raise_for_status()
+            return response.json()
+
+    async def aclose(self):
+        """Close pooled connections. Safe to call more than once."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._host_limits.clear()
@@ -0,0 +1,120 @@
+"""Throughput of the API server as worker processes are added.
+
+Starts ``api_server.py`` with API_WORKERS=1..N against the stdio MCP server
+and the fake Bedrock client (no model latency, so the work left is request
+handling, JSON and formatting), then keeps ``--concurrency`` requests in
+flight for ``--duration`` seconds. The response cache is disabled unless
+``--cached`` is given, so every request does the full pipeline.
+
+    python benchmarks/bench_api_workers.py --workers 1 2 4 --duration 10
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def start_server(workers: int, port: int, cached: bool) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        API_WORKERS=str(workers),
+        API_PORT=str(port),
+        MCP_SERVER_URL=os.path.join(ROOT, "MCP_Server", "mcp_server.py"),
+        BEDROCK_MODE="fake",
+        FAKE_BEDROCK_LATENCY="0",
+        FAKE_BEDROCK_TOKEN_LATENCY="0",
+        RESPONSE_CACHE_PATH="" if workers == 1 else f"/tmp/bench-responses-{port}.db",
+        # A single load generator would otherwise be rate limited as one client
+        ADMISSION_CLIENT_RATE="0",
+    )
+    if not cached:
+        env["RESPONSE_CACHE_TTL"] = "0"
+    return subprocess.Popen(
+        [sys.executable, "api_server.py"],
+        cwd=os.path.join(ROOT, "MCP_Client"),
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+async def wait_ready(http: httpx.AsyncClient, workers: int, timeout: float = 60.0):
+    # Requests land on whichever worker accepts first, so wait for a run of successes
+    deadline = time.monotonic() + timeout
+    successes = 0
+    while successes < workers * 4:
+        if time.monotonic() > deadline:
+            raise RuntimeError("API server did not become ready")
+        try:
+            response = await http.post("/query", json={"query": "warm up"})
+            successes = successes + 1 if response.status_code == 200 else 0
+        except httpx.TransportError:
+            successes = 0
+            await asyncio.sleep(0.2)
+
+
+async def load(http: httpx.AsyncClient, args) -> tuple[int, int]:
+    done = errors = 0
+    stop_at = time.monotonic() + args.duration
+
+    async def worker(worker_id: int):
+        nonlocal done, errors
+        request_id = 0
+        while time.monotonic() < stop_at:
+            request_id += 1
+            query = f"{args.query} ({worker_id}-{request_id})"
+            try:
+                response = await http.post("/query", json={"query": query})
+                if response.status_code == 200:
+                    done += 1
+                else:
+                    errors += 1
+            except httpx.TransportError:
+                errors += 1
+
+    await asyncio.gather(*(worker(worker_id) for worker_id in range(args.concurrency)))
+    return done, errors
+
+
+async def run(workers: int, args) -> float:
+    port = args.port + workers
+    server = start_server(workers, port, args.cached)
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30) as http:
+            await wait_ready(http, workers)
+            start = time.perf_counter()
+            done, errors = await load(http, args)
+            elapsed = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    throughput = done / elapsed
+    print(f"workers={workers:<3} requests={done:<7} errors={errors:<4} {throughput:9.1f} req/s")
+    return throughput
+
+
+async def main(args):
+    print(f"cores={os.cpu_count()} concurrency={args.concurrency} duration={args.duration}s cached={args.cached}")
+    baseline = None
+    for workers in args.workers:
+        throughput = await run(workers, args)
+        baseline = baseline or throughput
+        print(f"{'':11}speedup vs {args.workers[0]} worker(s): {throughput / baseline:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--query", default="What government services can you help with?")
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--cached", action="store_true", help="keep the response cache on")
+    asyncio.run(main(parser.parse_args()))
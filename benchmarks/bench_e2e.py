@@ -0,0 +1,475 @@
+"""Offline end-to-end load test: api_server -> MCPClient -> mcp_server.
+
+Runs the whole stack without Bedrock or fakerapi.it. The stub upstream
+(stub_upstream.py) is served from this process. ``api_server.py`` runs as a
+subprocess with the fake Bedrock client (``BEDROCK_MODE=fake``, with tool
+calls scripted by bedrock_script.json), and its MCP server is pointed at the
+stub. With ``--transport http`` the MCP server runs as its own multi-worker
+HTTP process instead of as stdio children of the API server. For each concurrency level the suite keeps that many requests in
+flight for ``--duration`` seconds over a mix of scenarios. It reports:
+
+* throughput and end-to-end p50/p95/p99, overall and per scenario
+* time to the first streamed event for /query/stream
+* per-stage p50/p95/p99, from the API server's /metrics histograms (the
+  client stages, tool calls, MCP server tools and upstream requests)
+* resident memory of every process involved, sampled over time
+
+Results are written as JSON (``--output``, by default under
+benchmarks/results/). ``--compare`` checks them against an earlier run and
+exits non-zero when throughput or p95/p99 regress by more than
+``--tolerance``.
+
+    python benchmarks/bench_e2e.py --concurrency 1 4 16 64 --duration 10
+    python benchmarks/bench_e2e.py --compare benchmarks/results/baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import httpx
+
+from stub_upstream import StubUpstream
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# name -> (endpoint, query template); {mykad} and {mykads} are filled per request
+SCENARIOS = {
+    # Answered by the intent router straight from one tool
+    "routed_lookup": ("/query", "What is the saman for {mykad}?"),
+    # One model turn asking for two tools, then a follow-up turn
+    "model_tools": ("/query", "Why do I have a saman and is my licence okay? MyKad {mykad}"),
+    # Two scripted tool rounds, so three model calls
+    "scripted_rounds": ("/query", "Full report for {mykad}"),
+    # Batch tools for several MyKads in one scripted round
+    "batch": ("/query", "Everything on record for several people: {mykads}"),
+    # A single model turn with no tools
+    "model_text": ("/query", "What government services can you help with?"),
+    # model_tools over Server-Sent Events
+    "stream": ("/query/stream", "Why do I have a saman and is my licence okay? MyKad {mykad}"),
+}
+
+# /metrics histograms reported per stage, keyed by the prefix used in the results
+STAGE_HISTOGRAMS = {
+    "govlink_query_duration_seconds": "query",
+    "govlink_stage_duration_seconds": "stage",
+    "govlink_tool_call_duration_seconds": "tool",
+    "govlink_server_tool_duration_seconds": "server_tool",
+    "govlink_server_upstream_duration_seconds": "upstream",
+}
+BUCKET_LINE = re.compile(r"^(\w+)_bucket\{(.*)\} (\S+)$")
+LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    """Linearly interpolated percentile (``q`` in 0..1) of ``values``"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = q * (len(ordered) - 1)
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(values: list[float]) -> dict:
+    """p50/p95/p99/mean/max of latencies in seconds, reported in milliseconds"""
+    if not values:
+        return {"count": 0}
+    summary = {name: percentile(values, q) for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))}
+    summary.update(mean=sum(values) / len(values), max=max(values))
+    return {"count": len(values), **{name: round(value * 1000, 3) for name, value in summary.items()}}
+
+
+def parse_histograms(text: str) -> dict[str, dict[float, float]]:
+    """Cumulative bucket counts per stage from a /metrics page, summed over MCP servers"""
+    histograms: dict[str, dict[float, float]] = defaultdict(lambda: defaultdict(float))
+    for line in text.splitlines():
+        match = BUCKET_LINE.match(line)
+        if not match or match.group(1) not in STAGE_HISTOGRAMS:
+            continue
+        labels = dict(LABEL.findall(match.group(2)))
+        bound = float(labels.pop("le").replace("+Inf", "inf"))
+        labels.pop("server", None)
+        # Over HTTP the server histograms are one worker's snapshot; with several
+        # MCP_HTTP_WORKERS they only cover whichever worker answered the scrape
+        labels.pop("worker", None)
+        name = STAGE_HISTOGRAMS[match.group(1)]
+        if labels:
+            name += ":" + ",".join(labels.values())
+        histograms[name][bound] += float(match.group(3))
+    return histograms
+
+
+def histogram_quantile(buckets: list[tuple[float, float]], q: float) -> float | None:
+    """Prometheus-style quantile estimate from sorted (upper bound, cumulative count) pairs"""
+    total = buckets[-1][1] if buckets else 0
+    if not total:
+        return None
+    rank = q * total
+    lower_bound, lower_count = 0.0, 0.0
+    for bound, count in buckets:
+        if count >= rank:
+            if bound == float("inf"):
+                return lower_bound
+            if count == lower_count:
+                return bound
+            return lower_bound + (bound - lower_bound) * (rank - lower_count) / (count - lower_count)
+        lower_bound, lower_count = bound, count
+    return lower_bound
+
+
+def stage_summary(before: dict, after: dict) -> dict:
+    """Per-stage count and p50/p95/p99 (ms) for the observations made between two scrapes"""
+    stages = {}
+    for name, buckets in sorted(after.items()):
+        previous = before.get(name, {})
+        delta = sorted((bound, count - previous.get(bound, 0.0)) for bound, count in buckets.items())
+        if not delta or not delta[-1][1]:
+            continue
+        stages[name] = {"count": int(delta[-1][1])}
+        for label, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+            stages[name][label] = round(histogram_quantile(delta, q) * 1000, 3)
+    return stages
+
+
+def process_tree_rss(pid: int) -> float | None:
+    """Resident memory in MB of ``pid`` and all its descendants (Linux /proc only)"""
+    if not os.path.isdir("/proc"):
+        return None
+    children: dict[int, list[int]] = defaultdict(list)
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as stat:
+                parent = int(stat.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children[parent].append(int(entry))
+    total_kb, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        try:
+            with open(f"/proc/{current}/status") as status:
+                for line in status:
+                    if line.startswith("VmRSS:"):
+                        total_kb += int(line.split()[1])
+                        break
+        except OSError:
+            pass
+        stack.extend(children.get(current, ()))
+    return round(total_kb / 1024, 2)
+
+
+def mcp_server_env(stub_url: str) -> dict[str, str]:
+    return dict(
+        os.environ,
+        FAKER_API_URL=stub_url,
+        RECORD_SOURCE="remote",
+        # Keep the persistent record store out of the repo and start every run cold
+        RECORD_STORE_PATH="",
+    )
+
+
+def spawn(args, script: str, directory: str, env: dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, script],
+        cwd=os.path.join(ROOT, directory),
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=None if args.verbose else subprocess.DEVNULL,
+    )
+
+
+def start_mcp_server(args, stub_url: str) -> subprocess.Popen:
+    """The MCP server in HTTP mode, with ``--pool-size`` workers"""
+    env = dict(
+        mcp_server_env(stub_url),
+        MCP_TRANSPORT="http",
+        MCP_HTTP_HOST="127.0.0.1",
+        MCP_HTTP_PORT=str(args.port + 1),
+        MCP_HTTP_WORKERS=str(args.pool_size),
+    )
+    return spawn(args, "mcp_server.py", "MCP_Server", env)
+
+
+def start_api_server(args, stub_url: str, **env_overrides: str) -> subprocess.Popen:
+    if args.transport == "http":
+        mcp_server_url = f"http://127.0.0.1:{args.port + 1}"
+    else:
+        mcp_server_url = os.path.join(ROOT, "MCP_Server", "mcp_server.py")
+    env = dict(
+        mcp_server_env(stub_url),
+        API_PORT=str(args.port),
+        MCP_SERVER_URL=mcp_server_url,
+        MCP_POOL_SIZE=str(args.pool_size),
+        BEDROCK_MODE="fake",
+        FAKE_BEDROCK_LATENCY=str(args.model_latency),
+        FAKE_BEDROCK_TOKEN_LATENCY=str(args.token_latency),
+        FAKE_BEDROCK_SCRIPT=os.path.join(os.path.dirname(os.path.abspath(__file__)), "bedrock_script.json"),
+        # One client drives all the load, so per-client rate limiting would only get in the way
+        ADMISSION_CLIENT_RATE="0",
+    )
+    if not args.cached:
+        env.update(RESPONSE_CACHE_TTL="0", RESPONSE_CACHE_MYKAD_TTL="0")
+    env.update(env_overrides)
+    return spawn(args, "api_server.py", "MCP_Client", env)
+
+
+def stop(server: subprocess.Popen):
+    server.terminate()
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        server.kill()
+
+
+async def wait_ready(url: str, server: subprocess.Popen, timeout: float = 60.0, path: str = "/health", interval: float = 0.2):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as http:
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise RuntimeError(f"{url} exited with status {server.returncode}")
+            try:
+                if (await http.get(f"{url}{path}")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(interval)
+    raise RuntimeError(f"{url}{path} did not become ready")
+
+
+def build_query(template: str, rng: random.Random, mykads: list[str]) -> str:
+    return template.replace("{mykad}", rng.choice(mykads)).replace("{mykads}", ", ".join(rng.sample(mykads, 3)))
+
+
+async def send(http: httpx.AsyncClient, endpoint: str, query: str) -> tuple[bool, float | None]:
+    """Send one query; returns success and, for streams, the time to the first event"""
+    if endpoint != "/query/stream":
+        response = await http.post(endpoint, json={"query": query})
+        return response.status_code == 200, None
+    start = time.perf_counter()
+    first_event, failed = None, False
+    async with http.stream("POST", endpoint, json={"query": query}) as response:
+        if response.status_code != 200:
+            return False, None
+        async for line in response.aiter_lines():
+            if line.startswith("event:"):
+                first_event = first_event or time.perf_counter() - start
+                failed = failed or line == "event: error"
+    return not failed, first_event
+
+
+async def run_level(http: httpx.AsyncClient, servers: list[subprocess.Popen], concurrency: int, args, mykads: list[str]) -> dict:
+    scenarios = [(name, *SCENARIOS[name]) for name in args.scenarios]
+    latencies: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, int] = defaultdict(int)
+    first_events: list[float] = []
+    memory: list[list[float]] = []
+    before = parse_histograms((await http.get("/metrics")).text)
+    started = time.perf_counter()
+    stop_at = time.monotonic() + args.duration
+
+    async def sample_memory():
+        while True:
+            rss = [process_tree_rss(server.pid) for server in servers]
+            if None not in rss:
+                memory.append([round(time.perf_counter() - started, 2), round(sum(rss), 2)])
+            await asyncio.sleep(args.memory_interval)
+
+    async def worker(worker_id: int):
+        rng = random.Random(f"{args.seed}-{concurrency}-{worker_id}")
+        turn = worker_id
+        while time.monotonic() < stop_at:
+            name, endpoint, template = scenarios[turn % len(scenarios)]
+            turn += 1
+            request_start = time.perf_counter()
+            try:
+                ok, first_event = await send(http, endpoint, build_query(template, rng, mykads))
+            except httpx.HTTPError:
+                ok, first_event = False, None
+            if not ok:
+                errors[name] += 1
+                continue
+            latencies[name].append(time.perf_counter() - request_start)
+            if first_event is not None:
+                first_events.append(first_event)
+
+    sampler = asyncio.create_task(sample_memory())
+    try:
+        await asyncio.gather(*(worker(worker_id) for worker_id in range(concurrency)))
+    finally:
+        sampler.cancel()
+    elapsed = time.perf_counter() - started
+    after = parse_histograms((await http.get("/metrics")).text)
+
+    everything = [latency for values in latencies.values() for latency in values]
+    rss_values = [rss for _, rss in memory]
+    return {
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 3),
+        "requests": len(everything),
+        "errors": sum(errors.values()),
+        "throughput_rps": round(len(everything) / elapsed, 2),
+        "latency_ms": summarize(everything),
+        "scenarios": {
+            name: {**summarize(latencies[name]), "errors": errors[name]} for name in args.scenarios
+        },
+        "stream_first_event_ms": summarize(first_events),
+        "stages_ms": stage_summary(before, after),
+        "memory_mb": {
+            "start": rss_values[0] if rss_values else None,
+            "peak": max(rss_values) if rss_values else None,
+            "end": rss_values[-1] if rss_values else None,
+            "samples": memory,
+        },
+    }
+
+
+def print_level(level: dict, verbose_stages: bool):
+    latency = level["latency_ms"]
+    memory = level["memory_mb"]
+    print(
+        f"concurrency={level['concurrency']:<4} {level['throughput_rps']:8.1f} req/s  "
+        f"requests={level['requests']:<6} errors={level['errors']:<4} "
+        f"p50={latency.get('p50', 0):8.1f}ms p95={latency.get('p95', 0):8.1f}ms p99={latency.get('p99', 0):8.1f}ms  "
+        f"rss start/peak/end={memory['start']}/{memory['peak']}/{memory['end']} MB"
+    )
+    for name, stats in level["scenarios"].items():
+        if stats["count"] or stats["errors"]:
+            print(f"    {name:<16} n={stats['count']:<6} err={stats['errors']:<4} "
+                  f"p50={stats.get('p50', 0):8.1f} p95={stats.get('p95', 0):8.1f} p99={stats.get('p99', 0):8.1f} ms")
+    first_event = level["stream_first_event_ms"]
+    if first_event["count"]:
+        print(f"    {'stream 1st event':<16} n={first_event['count']:<6} {'':8} "
+              f"p50={first_event['p50']:8.1f} p95={first_event['p95']:8.1f} p99={first_event['p99']:8.1f} ms")
+    if verbose_stages:
+        for name, stats in level["stages_ms"].items():
+            print(f"    {name:<40} n={stats['count']:<6} p50={stats['p50']:8.2f} p95={stats['p95']:8.2f} p99={stats['p99']:8.2f} ms")
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Regressions beyond ``tolerance`` (a fraction) against a baseline run, matched by concurrency"""
+    regressions = []
+    previous_levels = {level["concurrency"]: level for level in baseline.get("levels", [])}
+    for level in results["levels"]:
+        previous = previous_levels.get(level["concurrency"])
+        if previous is None:
+            continue
+        label = f"concurrency={level['concurrency']}"
+        if level["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{label}: throughput {previous['throughput_rps']} -> {level['throughput_rps']} req/s")
+        for metric in ("p95", "p99"):
+            old, new = previous["latency_ms"].get(metric), level["latency_ms"].get(metric)
+            if old and new and new > old * (1 + tolerance):
+                regressions.append(f"{label}: {metric} {old} -> {new} ms")
+        for name, stats in level["stages_ms"].items():
+            old = previous.get("stages_ms", {}).get(name, {}).get("p95")
+            # Sub-millisecond stages are dominated by bucket resolution, not real change
+            if old and old >= 1 and stats["p95"] > old * (1 + tolerance):
+                regressions.append(f"{label}: {name} p95 {old} -> {stats['p95']} ms")
+    return regressions
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main(args) -> int:
+    stub = await StubUpstream(latency=args.upstream_latency).start()
+    mykads = [f"{random.Random(index).randint(500101, 991231)}14{index:04d}" for index in range(args.mykads)]
+    servers = []
+    levels = []
+    try:
+        if args.transport == "http":
+            servers.append(start_mcp_server(args, stub.url))
+            await wait_ready(f"http://127.0.0.1:{args.port + 1}", servers[-1])
+        servers.append(start_api_server(args, stub.url))
+        await wait_ready(f"http://127.0.0.1:{args.port}", servers[-1])
+        limits = httpx.Limits(max_connections=max(args.concurrency) + 2, max_keepalive_connections=max(args.concurrency) + 2)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits, timeout=args.timeout) as http:
+            print(
+                f"transport={args.transport} cores={os.cpu_count()} duration={args.duration}s "
+                f"model_latency={args.model_latency}s upstream_latency={args.upstream_latency}s "
+                f"cached={args.cached} scenarios={','.join(args.scenarios)}"
+            )
+            for concurrency in args.concurrency:
+                level = await run_level(http, servers, concurrency, args, mykads)
+                print_level(level, args.stages)
+                levels.append(level)
+    finally:
+        # The API server first, so it stops calling the MCP server before that goes away
+        for server in reversed(servers):
+            stop(server)
+        await stub.stop()
+
+    results = {
+        "suite": "e2e",
+        "format_version": 1,
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "upstream_requests": stub.requests,
+            "args": vars(args),
+        },
+        "levels": levels,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"e2e-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{results['meta']['git_commit'] or 'local'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as results_file:
+        json.dump(results, results_file, indent=2)
+    print(f"results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print(f"no regressions beyond {args.tolerance:.0%} against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transport", choices=["stdio", "http"], default="stdio", help="how the client reaches the MCP server")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per concurrency level")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--model-latency", type=float, default=0.2, help="fake Bedrock latency per call (s)")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="fake Bedrock delay per streamed word (s)")
+    parser.add_argument("--upstream-latency", type=float, default=0.02, help="stub record API latency (s)")
+    parser.add_argument("--mykads", type=int, default=500, help="distinct MyKads to draw queries from")
+    parser.add_argument("--pool-size", type=int, default=2, help="MCP server processes (stdio children or HTTP workers)")
+    parser.add_argument("--cached", action="store_true", help="keep the response cache on")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--memory-interval", type=float, default=0.5, help="seconds between RSS samples")
+    parser.add_argument("--port", type=int, default=18180, help="API server port; the HTTP MCP server uses the next one")
+    parser.add_argument("--seed", default="govlink")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/e2e-<time>-<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression as a fraction")
+    parser.add_argument("--stages", action="store_true", help="print per-stage percentiles")
+    parser.add_argument("--verbose", action="store_true", help="show the API server's stderr")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,176 @@
+"""Micro-benchmarks for the response formatter.
+
+Times ``ResponseFormatter.format`` on typical, large and pathological
+inputs (long tables, nested asterisks, unclosed markup) and checks that
+doubling an input no more than roughly doubles the time, which catches
+catastrophic backtracking. The regex cascade the formatter replaced is kept
+below as a baseline.
+
+    python benchmarks/bench_formatter.py          # exits non-zero on a regression
+    python benchmarks/bench_formatter.py --legacy # also time the old cascade
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "MCP_Client"))
+
+from formatter import ResponseFormatter
+
+TYPICAL = """<reasoning>
+The user wants their saman details, call the tool.
+</reasoning>
+### Saman details for **900101-14-5001**
+
+| Field | Information |
+|---|---|
+| **Summon ID** | 488527 |
+| Offense | *Running a red light* |
+| Amount | RM 300 |
+| Location | 62 Jalan Ampang<br>Kuala Lumpur |
+
+You can pay it online at `https://www.myeg.com.my/services/jpj`:
+- Use the MyEG app
+- Or visit the nearest JPJ office
+
+---
+Let me know if you need anything elseâ€¦
+"""
+
+# name -> builder taking a size multiplier
+CASES = {
+    "typical": lambda n: TYPICAL * n,
+    "long_table": lambda n: "| Field | Value |\n|---|---|\n" + "| **Row** | *value* `x` |\n" * (40 * n),
+    "nested_asterisks": lambda n: "***a** *b* **c*** " * (40 * n),
+    "lone_asterisks": lambda n: "*" * (400 * n),
+    "unclosed_markup": lambda n: "<" * (200 * n) + "`" * (200 * n) + "{'result': '" * (20 * n),
+    "blank_lines": lambda n: " \n\t\n" * (200 * n),
+}
+
+
+
+# Previous implementation (MCPClient.clean_response before the formatter), kept as a baseline
+def legacy_clean_response_formatting(response: str) -> str:
+    """Clean and format the AI response for messaging applications"""
+    if not response:
+            return response
+
+    # Remove any raw JSON objects at the beginning and anywhere in the text
+    response = re.sub(r"\{'result':\s*'[^']*'\}", '', response, flags=re.MULTILINE | re.DOTALL)
+    response = re.sub(r'\{"result":\s*"[^"]*"\}', '', response, flags=re.MULTILINE | re.DOTALL)
+    response = re.sub(r"^\{'result':\s*\".*?\"\}\s*", '', response, flags=re.MULTILINE | re.DOTALL)
+
+    # Convert HTML tags to proper formatting
+    response = re.sub(r'<br\s*/?>|<br>', '\n', response, flags=re.IGNORECASE)  # Convert <br> to newlines
+    response = re.sub(r'<[^>]+>', '', response)  # Remove any other HTML tags
+
+    # Convert markdown tables to Field: Value format
+    table_pattern = r'\|([^|]+)\|([^|]+)\|[\s\S]*?(?=\n\n|\n[^|]|\Z)'
+
+    def convert_table(match):
+        lines = match.group(0).split('\n')
+        formatted_lines = []
+
+        for line in lines:
+            if '|' in line and not line.strip().startswith('|---'):
+                cells = [cell.strip() for cell in line.split('|') if cell.strip()]
+                if len(cells) >= 2:
+                    field = cells[0].replace('**', '').strip()  # Remove bold from field names
+                    value = cells[1].strip()  # Keep bold formatting in values
+                    if field and value and field != 'Field' and value != 'Information':
+                        formatted_lines.append(f"{field}: {value}")
+
+        return '\n'.join(formatted_lines) if formatted_lines else ''
+
+    response = re.sub(table_pattern, convert_table, response)
+
+    # Remove markdown formatting (but keep bold text)
+    # Keep bold text as **text** - this line is commented out to preserve bold formatting
+    response = re.sub(r'(?<!\*)\*(?!\*)([^*]+?)(?<!\*)\*(?!\*)', r'\1', response)  # Remove single * (italic) but not **
+    response = re.sub(r'`(.*?)`', r'\1', response)        # Remove code formatting
+    response = re.sub(r'#{1,6}\s*', '', response)         # Remove headers
+    response = re.sub(r'---+', '', response)              # Remove horizontal rules
+    response = re.sub(r'^\s*[\*\-\+]\s+', '', response, flags=re.MULTILINE)  # Remove bullet points
+
+    # Clean up encoding issues
+    replacements = {
+        'â¯': ' ', 'â': '-', 'â': "'", 'â': "'", 
+        'â': '"', 'â': '"', 'â¦': '...', 'â': '-', 'â': '--',
+    }
+    for bad_char, good_char in replacements.items():
+        response = response.replace(bad_char, good_char)
+
+    # Clean up extra whitespace and empty lines
+    response = re.sub(r'\n\s*\n\s*\n', '\n\n', response)  # Multiple empty lines
+    response = re.sub(r'[ \t]+', ' ', response)           # Multiple spaces
+    response = response.strip()
+
+    return response
+
+def legacy_clean_response(content: str) -> str:
+    """Remove reasoning sections and clean up the response for messaging"""
+    if not content:
+        return content
+
+    # Remove reasoning sections
+    lines = content.split('\n')
+    cleaned_lines = []
+    skip_reasoning = False
+
+    for line in lines:
+        # Check for reasoning tags or patterns
+        if '<reasoning>' in line.lower() or line.strip().startswith('**Reasoning'):
+            skip_reasoning = True
+            continue
+        elif '</reasoning>' in line.lower() or (skip_reasoning and line.strip() == ''):
+            skip_reasoning = False
+            continue
+        elif skip_reasoning:
+            continue
+
+        cleaned_lines.append(line)
+
+    response = '\n'.join(cleaned_lines).strip()
+
+    # Apply additional formatting cleanup
+    return legacy_clean_response_formatting(response)
+
+
+def best_time(fn, text: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(args) -> int:
+    formatter = ResponseFormatter()
+    new = lambda text: formatter.format(text, strip_reasoning=True)
+    failures = 0
+    print(f"{'case':<18}{'chars':>10}{'format':>12}{'2x size':>12}{'ratio':>8}" + (f"{'legacy':>12}" if args.legacy else ""))
+    for name, build in CASES.items():
+        text, doubled = build(args.scale), build(args.scale * 2)
+        small = best_time(new, text, args.repeat)
+        large = best_time(new, doubled, args.repeat)
+        ratio = large / small if small else 0.0
+        # Linear work doubles; anything well past that means super-linear behaviour
+        ok = ratio < args.max_ratio
+        failures += not ok
+        line = f"{name:<18}{len(text):>10,}{small * 1000:>10.2f}ms{large * 1000:>10.2f}ms{ratio:>7.1f}x"
+        if args.legacy:
+            line += f"{best_time(legacy_clean_response, text, args.repeat) * 1000:>10.2f}ms"
+        print(line + ("" if ok else "  <-- super-linear"))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=50, help="size multiplier for every case")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-ratio", type=float, default=3.0)
+    parser.add_argument("--legacy", action="store_true", help="also time the old regex cascade")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,71 @@
+"""Parallel /query requests against a fake Bedrock with fixed latency.
+
+Drives ``api_server.app`` in-process with N concurrent requests. Each query
+needs two model turns, so with model calls off the event loop the whole
+batch should finish in about two model latencies, not 2 x N. ``--blocking``
+runs the old inline ``invoke_model`` for comparison.
+
+The intent router and the response cache are switched off: either would
+answer most of the batch without the model and leave nothing to measure.
+The default query is one the router would hand to the model anyway.
+
+    python benchmarks/bench_query_concurrency.py --parallel 16 --latency 0.5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "MCP_Client"))
+os.environ["BEDROCK_MODE"] = "fake"
+# Every request must reach the model, and one client sends the whole batch
+os.environ.update(ROUTER_ENABLED="0", RESPONSE_CACHE_TTL="0", RESPONSE_CACHE_MYKAD_TTL="0", ADMISSION_CLIENT_RATE="0")
+
+import httpx
+
+import api_server
+from client import MCPClient
+
+
+async def main(args):
+    os.environ["FAKE_BEDROCK_LATENCY"] = str(args.latency)
+    client = MCPClient()
+    await client.connect_to_server(os.path.join(ROOT, "MCP_Server", "mcp_server.py"))
+    if args.blocking:
+        async def invoke_inline(body, timeout=None):
+            return client._invoke_model_sync(body)
+        client.invoke_model = invoke_inline
+    api_server.mcp_client = client
+
+    transport = httpx.ASGITransport(app=api_server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+        async def one():
+            start = time.perf_counter()
+            response = await http.post("/query", json={"query": args.query})
+            response.raise_for_status()
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(one() for _ in range(args.parallel)))
+        wall = time.perf_counter() - start
+
+    model_calls = client.bedrock_client.calls
+    print(
+        f"mode={'blocking' if args.blocking else 'executor'} parallel={args.parallel} "
+        f"model_latency={args.latency:.2f}s model_calls={model_calls} (expected {2 * args.parallel})\n"
+        f"wall={wall:.2f}s ({wall / args.latency:.1f} model latencies) "
+        f"slowest_request={max(latencies):.2f}s"
+    )
+    await client.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--parallel", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.5)
+    # The fake model answers it with pay_saman and a follow-up: two model turns
+    parser.add_argument("--query", default="Why should I pay my saman on time?")
+    parser.add_argument("--blocking", action="store_true")
+    asyncio.run(main(parser.parse_args()))
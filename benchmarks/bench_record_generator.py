@@ -0,0 +1,51 @@
+"""Throughput of the local record generator.
+
+Reports records/second for per-MyKad generation (the tool hot path) and for
+the bulk mode used to build load-test fixtures. Both bulk figures cover
+drawing and rendering every field of every record: "columns" consumes the
+batch as rendered column chunks, "dicts" as one dict per record. The
+integer draws alone are shown separately and are not a record rate.
+
+    python benchmarks/bench_record_generator.py --count 1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "MCP_Server"))
+
+import generator
+from mcp_server import RECORD_FIELDS
+
+
+def rate(count: int, elapsed: float) -> str:
+    return f"{count / elapsed:>14,.0f} records/s ({elapsed * 1000:8.1f}ms for {count:,})"
+
+
+def main(args):
+    backend = "numpy" if generator.np is not None else "stdlib"
+    for tool, fields in RECORD_FIELDS.items():
+        start = time.perf_counter()
+        for i in range(args.single):
+            generator.generate_record(str(900101140000 + i), fields)
+        print(f"{tool:<17} single          {rate(args.single, time.perf_counter() - start)}")
+
+        start = time.perf_counter()
+        batch = generator.generate_bulk(fields, args.count, seed=1)
+        drawn = time.perf_counter() - start
+        rendered = sum(len(next(iter(chunk.values()))) for chunk in batch.iter_columns())
+        print(f"{tool:<17} columns[{backend}] {rate(rendered, time.perf_counter() - start)}")
+
+        start = time.perf_counter()
+        batch = generator.generate_bulk(fields, args.count, seed=1)
+        rendered = sum(1 for _ in batch)
+        print(f"{tool:<17} dicts[{backend}]   {rate(rendered, time.perf_counter() - start)}")
+        print(f"{tool:<17}   draws only    {drawn * 1000:8.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=1_000_000, help="records per bulk batch")
+    parser.add_argument("--single", type=int, default=20_000, help="records for the per-MyKad path")
+    main(parser.parse_args())
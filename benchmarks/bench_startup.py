@@ -0,0 +1,154 @@
+"""Startup benchmark: how long until the API server is live, ready and fast.
+
+Each run starts ``api_server.py`` from scratch (fake Bedrock, stdio MCP
+servers, stub upstream, as in bench_e2e.py) and measures from the moment
+the process is spawned:
+
+* ``import_s``: ``import api_server`` alone, in a fresh interpreter
+* ``live_s``: until ``/health`` answers
+* ``ready_s``: until ``/ready`` answers, i.e. the warm-up has finished
+* ``first_lookup_ms`` / ``first_model_ms``: the first routed lookup and the
+  first model query once the server reports ready (``/health`` without warm-up)
+* ``second_lookup_ms`` / ``second_model_ms``: the same queries again, for
+  the steady-state comparison
+
+Runs alternate between warm-up on and off (``WARMUP_ENABLED``) so the
+first-request penalty the warm-up removes shows up side by side. The
+canary model call is off by default here because the fake model's latency
+would dominate ``ready_s``; pass ``--model-canary`` to include it.
+
+    python benchmarks/bench_startup.py --runs 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from bench_e2e import RESULTS_DIR, ROOT, git_commit, start_api_server, stop, wait_ready
+from stub_upstream import StubUpstream
+
+
+def import_time() -> float:
+    """Seconds for a fresh interpreter to import api_server (interpreter startup subtracted)"""
+    def run(code: str) -> float:
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=os.path.join(ROOT, "MCP_Client"), check=True,
+                       env=dict(os.environ, BEDROCK_MODE="fake"), capture_output=True)
+        return time.perf_counter() - started
+    return max(run("import api_server") - run("pass"), 0.0)
+
+
+async def timed_query(http: httpx.AsyncClient, query: str) -> float:
+    started = time.perf_counter()
+    response = await http.post("/query", json={"query": query})
+    response.raise_for_status()
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
+async def measure(args, stub: StubUpstream, warm: bool, run: int) -> dict:
+    env = dict(WARMUP_ENABLED="1" if warm else "0", WARMUP_MODEL_CALL="1" if args.model_canary else "0")
+    url = f"http://127.0.0.1:{args.port}"
+    started = time.perf_counter()
+    server = start_api_server(args, stub.url, **env)
+    try:
+        await wait_ready(url, server, path="/health", interval=0.02)
+        live = time.perf_counter() - started
+        if warm:
+            await wait_ready(url, server, path="/ready", interval=0.02)
+        ready = time.perf_counter() - started
+        # A different MyKad per run so no cache outlives its server
+        lookup = f"check licence 9001011{run:05d}"
+        model = f"tell me something about road safety, run {run}"
+        async with httpx.AsyncClient(base_url=url, timeout=60) as http:
+            return {
+                "warmup": warm,
+                "live_s": round(live, 3),
+                "ready_s": round(ready, 3),
+                "first_lookup_ms": await timed_query(http, lookup),
+                "first_model_ms": await timed_query(http, model),
+                "second_lookup_ms": await timed_query(http, lookup.replace("licence", "license")),
+                "second_model_ms": await timed_query(http, model + "!"),
+            }
+    finally:
+        stop(server)
+
+
+def medians(runs: list[dict]) -> dict:
+    fields = [field for field in runs[0] if field != "warmup"]
+    return {field: round(statistics.median(run[field] for run in runs), 3) for field in fields}
+
+
+async def main(args) -> int:
+    stub = await StubUpstream(latency=args.upstream_latency).start()
+    runs = []
+    try:
+        for run in range(args.runs):
+            for warm in (True, False):
+                result = await measure(args, stub, warm, run * 2 + warm)
+                print(json.dumps(result))
+                runs.append(result)
+    finally:
+        await stub.stop()
+
+    imports = [import_time() for _ in range(args.runs)]
+    summary = {
+        "import_s": round(statistics.median(imports), 3),
+        "warmup": medians([run for run in runs if run["warmup"]]),
+        "no_warmup": medians([run for run in runs if not run["warmup"]]),
+    }
+    print(f"import api_server: {summary['import_s'] * 1000:.0f} ms (median of {args.runs})")
+    for mode in ("warmup", "no_warmup"):
+        result = summary[mode]
+        print(
+            f"{mode:10} live={result['live_s']:.2f}s ready={result['ready_s']:.2f}s "
+            f"first lookup={result['first_lookup_ms']:.1f}ms (then {result['second_lookup_ms']:.1f}) "
+            f"first model={result['first_model_ms']:.1f}ms (then {result['second_model_ms']:.1f})"
+        )
+
+    results = {
+        "suite": "startup",
+        "format_version": 1,
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "summary": summary,
+        "runs": runs,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"startup-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{results['meta']['git_commit'] or 'local'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as results_file:
+        json.dump(results, results_file, indent=2)
+    print(f"results written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="server starts per mode")
+    parser.add_argument("--pool-size", type=int, default=2, help="stdio MCP server processes")
+    parser.add_argument("--model-latency", type=float, default=0.2, help="fake Bedrock latency per call (s)")
+    parser.add_argument("--token-latency", type=float, default=0.0)
+    parser.add_argument("--upstream-latency", type=float, default=0.02, help="stub record API latency (s)")
+    parser.add_argument("--model-canary", action="store_true", help="include the canary model call in the warm-up")
+    parser.add_argument("--port", type=int, default=18280)
+    parser.add_argument("--output", help="results file (default: benchmarks/results/startup-<time>-<commit>.json)")
+    parser.add_argument("--verbose", action="store_true", help="show the API server's stderr")
+    args = parser.parse_args()
+    # start_api_server reads these bench_e2e options
+    args.transport, args.cached = "stdio", False
+    sys.exit(asyncio.run(main(args)))
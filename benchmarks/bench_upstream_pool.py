@@ -0,0 +1,83 @@
+"""Compare per-call httpx clients against the shared UpstreamClient pool.
+
+Runs against the local stub upstream and prints p50/p99 latency for:
+
+  * cold   - a fresh ``httpx.AsyncClient`` per request (the old behaviour)
+  * pooled - the shared ``UpstreamClient`` on its first batch (cold pool)
+  * warm   - the same ``UpstreamClient`` once connections are kept alive
+
+    python benchmarks/bench_upstream_pool.py --requests 500 --concurrency 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "MCP_Server"))
+
+from stub_upstream import StubUpstream
+from upstream import UpstreamClient
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def report(label: str, samples: list[float], connections: int):
+    print(
+        f"{label:<7} n={len(samples):<5} "
+        f"p50={percentile(samples, 50) * 1000:7.2f}ms "
+        f"p99={percentile(samples, 99) * 1000:7.2f}ms "
+        f"mean={statistics.mean(samples) * 1000:7.2f}ms "
+        f"new_connections={connections}"
+    )
+
+
+async def run_batch(fetch, urls: list[str], concurrency: int) -> list[float]:
+    gate = asyncio.Semaphore(concurrency)
+    samples = []
+
+    async def one(url):
+        async with gate:
+            start = time.perf_counter()
+            await fetch(url)
+            samples.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(url) for url in urls))
+    return samples
+
+
+async def main(args):
+    stub = await StubUpstream(latency=args.latency_ms / 1000).start()
+    urls = [f"{stub.url}?_seed={900101145000 + i}&_quantity=1&summonId=number&amount=number" for i in range(args.requests)]
+
+    async def fresh_client(url):
+        async with httpx.AsyncClient() as client:
+            response = await client.get(url, timeout=30.0)
+            response.raise_for_status()
+            return response.json()
+
+    before = stub.connections
+    report("cold", await run_batch(fresh_client, urls, args.concurrency), stub.connections - before)
+
+    upstream = UpstreamClient(per_host_limit=args.concurrency)
+    before = stub.connections
+    report("pooled", await run_batch(upstream.get_json, urls, args.concurrency), stub.connections - before)
+    before = stub.connections
+    report("warm", await run_batch(upstream.get_json, urls, args.concurrency), stub.connections - before)
+
+    await upstream.aclose()
+    await stub.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=2.0)
+    asyncio.run(main(parser.parse_args()))
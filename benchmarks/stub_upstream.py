@@ -0,0 +1,105 @@
+"""Local stand-in for the fakerapi.it custom endpoint.
+
+Speaks just enough HTTP/1.1 (with keep-alive) to serve the record shapes the
+MCP server asks for, so benchmarks can run without network access.
+
+    python benchmarks/stub_upstream.py --port 8900 --latency-ms 20
+"""
+import argparse
+import asyncio
+import json
+import random
+from urllib.parse import parse_qsl, urlsplit
+
+FIELD_FACTORIES = {
+    "email": lambda rng: f"user{rng.randint(1000, 9999)}@example.my",
+    "phone": lambda rng: f"+601{rng.randint(10000000, 99999999)}",
+    "address": lambda rng: f"{rng.randint(1, 200)} Jalan Ampang, Kuala Lumpur",
+    "streetAddress": lambda rng: f"{rng.randint(1, 200)} Jalan Ampang",
+    "number": lambda rng: rng.randint(100000, 999999),
+    "dateTime": lambda rng: f"20{rng.randint(20, 30)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}T00:00:00+00:00",
+    "boolean": lambda rng: rng.random() < 0.5,
+}
+
+
+class StubUpstream:
+    """Minimal keep-alive HTTP server returning faker-shaped JSON."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.requests = 0
+        self.connections = 0
+        self._server: asyncio.AbstractServer | None = None
+        self._connections: dict[asyncio.Task, asyncio.StreamWriter] = {}
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}/api/v2/custom"
+
+    def render(self, target: str) -> bytes:
+        params = dict(parse_qsl(urlsplit(target).query))
+        rng = random.Random(params.pop("_seed", "0"))
+        quantity = int(params.pop("_quantity", "1"))
+        records = [
+            {field: FIELD_FACTORIES.get(kind, FIELD_FACTORIES["number"])(rng) for field, kind in params.items()}
+            for _ in range(quantity)
+        ]
+        return json.dumps({"status": "OK", "code": 200, "total": quantity, "data": records}).encode()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        self._connections[asyncio.current_task()] = writer
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                # Drain headers; the stub only serves GET so there is no body
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                self.requests += 1
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                body = self.render(request_line.split()[1].decode())
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    + f"Content-Length: {len(body)}\r\nConnection: keep-alive\r\n\r\n".encode()
+                    + body
+                )
+                await writer.drain()
+        except (ConnectionError, IndexError):
+            pass
+        finally:
+            self._connections.pop(asyncio.current_task(), None)
+            writer.close()
+
+    async def start(self) -> "StubUpstream":
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            # Close idle keep-alive connections and let their handlers finish
+            handlers = list(self._connections)
+            for writer in self._connections.values():
+                writer.close()
+            await asyncio.gather(*handlers, return_exceptions=True)
+            await self._server.wait_closed()
+
+
+async def _serve(args):
+    stub = await StubUpstream(args.host, args.port, args.latency_ms / 1000).start()
+    print(f"Stub upstream listening on {stub.url}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    asyncio.run(_serve(parser.parse_args()))
@@ -0,0 +1,48 @@
+"""Copy the shared modules into the packages that vendor them.
+
+MCP_Client and MCP_Server are deployed as separate directories, so code both
+need lives here once and each package ships a byte-identical copy.
+
+    python shared/sync.py          # write the copies
+    python shared/sync.py --check  # exit 1 if any copy differs from its source
+"""
+import argparse
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SHARED = os.path.join(ROOT, "shared")
+# shared module -> packages that vendor it
+VENDORED = {
+    "tracing.py": ("MCP_Client", "MCP_Server"),
+}
+
+
+def main(check: bool) -> int:
+    stale = []
+    for module, packages in VENDORED.items():
+        with open(os.path.join(SHARED, module), "rb") as source_file:
+            source = source_file.read()
+        for package in packages:
+            path = os.path.join(ROOT, package, module)
+            try:
+                with open(path, "rb") as copy_file:
+                    current = copy_file.read()
+            except FileNotFoundError:
+                current = None
+            if current == source:
+                continue
+            stale.append(f"{package}/{module}")
+            if not check:
+                with open(path, "wb") as copy_file:
+                    copy_file.write(source)
+    if stale:
+        print(f"{'Out of date' if check else 'Updated'}: {', '.join(stale)}")
+        return 1 if check else 0
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="only report copies that differ from shared/")
+    sys.exit(main(parser.parse_args().check))
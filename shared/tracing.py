@@ -0,0 +1,256 @@
+"""Distributed tracing with W3C trace context, exported as OTLP/JSON lines.
+
+Every request gets a trace id that follows it through the MCP transport
+(``traceparent`` in the tool call's ``_meta`` or HTTP headers) into the MCP
+server, whose tool spans continue the client's trace and follow its
+sampling decision. Only a TRACE_SAMPLE_RATE fraction of traces record
+spans; the rest just carry ids, so tracing can stay on in production.
+Sampled spans are appended to TRACE_EXPORT_PATH in the OTLP/JSON file
+format, which an OpenTelemetry Collector ``otlpjsonfile`` receiver (or jq)
+reads offline.
+
+The single source is shared/tracing.py; MCP_Client and MCP_Server each ship
+an identical copy written by ``python shared/sync.py``. Edit it there.
+"""
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator, Optional
+
+SPAN_KINDS = {"internal": 1, "server": 2, "client": 3}
+
+
+class Span:
+    """One timed operation; attributes are only kept when the trace is sampled"""
+    __slots__ = ("name", "kind", "trace_id", "span_id", "parent_id", "sampled", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, kind: str, trace_id: str, parent_id: Optional[str], sampled: bool):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes: dict[str, Any] = {}
+        self.error: Optional[str] = None
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def set_attribute(self, key: str, value: Any):
+        if self.sampled:
+            self.attributes[key] = value
+
+    def record_error(self, error: BaseException):
+        if self.sampled:
+            self.error = f"{type(error).__name__}: {error}"
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": SPAN_KINDS[self.kind],
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in self.attributes.items()],
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.error:
+            span["status"] = {"code": 2, "message": self.error}
+        return span
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[tuple[str, str, bool]]:
+    """``(trace_id, parent_span_id, sampled)`` from a W3C traceparent, or None if malformed"""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or len(parts[3]) != 2:
+        return None
+    try:
+        flags = int(parts[3], 16)
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+
+class FileExporter:
+    """Append sampled spans to a file, one OTLP/JSON ``resourceSpans`` document per line
+
+    Spans are buffered and written in one append when ``batch_size`` spans
+    are waiting or ``flush_interval`` seconds have passed, so several
+    processes can share the file. Inside an event loop the append runs on a
+    worker thread so a slow disk never stalls requests.
+    """
+
+    def __init__(self, path: str, service_name: str, batch_size: int = 256, flush_interval: float = 1.0):
+        self.path = path
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending: list[dict] = []
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self.exported = 0
+        self.errors = 0
+
+    def export(self, span: Span):
+        with self._lock:
+            self._pending.append(span.to_otlp())
+            if len(self._pending) < self.batch_size and time.monotonic() - self._last_flush < self.flush_interval:
+                return
+            spans, self._pending = self._pending, []
+            self._last_flush = time.monotonic()
+        try:
+            asyncio.get_running_loop().run_in_executor(None, self._write, spans)
+        except RuntimeError:  # no event loop in this thread
+            self._write(spans)
+
+    def flush(self):
+        with self._lock:
+            spans, self._pending = self._pending, []
+            self._last_flush = time.monotonic()
+        if spans:
+            self._write(spans)
+
+    def _write(self, spans: list[dict]):
+        resource = {"attributes": [
+            {"key": "service.name", "value": {"stringValue": self.service_name}},
+            {"key": "process.pid", "value": {"intValue": str(os.getpid())}},
+        ]}
+        line = json.dumps({"resourceSpans": [{
+            "resource": resource,
+            "scopeSpans": [{"scope": {"name": "govlink"}, "spans": spans}],
+        }]}, separators=(",", ":")) + "\n"
+        try:
+            # A single O_APPEND write keeps lines from different processes intact
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line.encode())
+            finally:
+                os.close(fd)
+            self.exported += len(spans)
+        except OSError as e:
+            self.errors += 1
+            # Not stdout: in the stdio MCP server that is the JSON-RPC channel
+            print(f"Could not export {len(spans)} spans to {self.path}: {e}", file=sys.stderr)
+
+
+_current: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def current_traceparent() -> Optional[str]:
+    """traceparent header value for an outgoing call from the current span"""
+    span = _current.get()
+    return span.traceparent if span is not None else None
+
+
+class Tracer:
+    """Creates spans, makes the head sampling decision and hands finished spans to the exporter"""
+
+    def __init__(self, exporter: Optional[FileExporter] = None, sample_rate: float = 0.1):
+        self.exporter = exporter
+        self.sample_rate = sample_rate if exporter is not None else 0.0
+        self.started = 0
+        self.sampled = 0
+
+    @classmethod
+    def from_env(cls, service_name: str = "govlink") -> "Tracer":
+        """Build a tracer from TRACE_EXPORT_PATH (unset disables export) and TRACE_SAMPLE_RATE"""
+        path = os.getenv("TRACE_EXPORT_PATH")
+        exporter = FileExporter(path, service_name) if path else None
+        return cls(exporter, sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "0.1")))
+
+    def name_service(self, service_name: str):
+        """Set the ``service.name`` exported spans carry; each package's entry module calls this"""
+        if self.exporter is not None:
+            self.exporter.service_name = service_name
+
+    @contextmanager
+    def span(self, name: str, kind: str = "internal", traceparent: Optional[str] = None, **attributes) -> Iterator[Span]:
+        """Run the block in a child of the current span, or of ``traceparent`` if given
+
+        Without either a new trace starts and is sampled at ``sample_rate``.
+        Exceptions are recorded on the span and re-raised.
+        """
+        remote = parse_traceparent(traceparent)
+        parent = _current.get()
+        if remote is not None:
+            # Follow the caller's sampling decision so traces are complete or absent
+            trace_id, parent_id, sampled = remote
+        elif parent is not None:
+            trace_id, parent_id, sampled = parent.trace_id, parent.span_id, parent.sampled
+        else:
+            trace_id, parent_id = f"{random.getrandbits(128):032x}", None
+            sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+            self.started += 1
+            self.sampled += sampled
+
+        span = Span(name, kind, trace_id, parent_id, sampled)
+        if sampled:
+            span.attributes.update(attributes)
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            try:
+                _current.reset(token)
+            except ValueError:
+                _current.set(parent)  # ended in another context (async generator closed elsewhere)
+            if sampled and self.exporter is not None:
+                self.exporter.export(span)
+
+    def flush(self):
+        if self.exporter is not None:
+            self.exporter.flush()
+
+    async def flush_periodically(self):
+        """Write buffered spans out even when traffic stops; run as a background task"""
+        while self.exporter is not None:
+            await asyncio.sleep(self.exporter.flush_interval)
+            await asyncio.to_thread(self.flush)
+
+    def stats(self) -> dict:
+        return {
+            "sample_rate": self.sample_rate,
+            "traces_started": self.started,
+            "traces_sampled": self.sampled,
+            "spans_exported": self.exporter.exported if self.exporter else 0,
+            "export_errors": self.exporter.errors if self.exporter else 0,
+        }
+
+
+# Named by the importing package through name_service
+tracer = Tracer.from_env()